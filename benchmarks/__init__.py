@@ -0,0 +1 @@
+# Бенчмарки MyTasks (без дисплея: страницы строятся на поддельной странице Flet)
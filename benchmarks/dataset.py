@@ -0,0 +1,90 @@
+"""
+Генератор синтетических данных app_data.json для бенчмарков
+
+Пример:
+    python -m benchmarks.dataset --tasks 100000 --output data/app_data.json
+"""
+import argparse
+import json
+import random
+import time
+import uuid
+from datetime import date
+from pathlib import Path
+
+WORDS = (
+    "отчёт встреча звонок купить молоко проект дизайн код ревью тест релиз письмо "
+    "бюджет план клиент договор счёт оплата презентация документ задача исправить "
+    "обновить проверить подготовить отправить согласовать report meeting review deploy"
+).split()
+
+SIZES = (1_000, 10_000, 100_000, 1_000_000)
+
+
+def _text(rng, words):
+    return " ".join(rng.choice(WORDS) for _ in range(words))
+
+
+def _id(rng):
+    return str(uuid.UUID(int=rng.getrandbits(128), version=4))
+
+
+def generate_data(tasks=1_000, max_subtasks=5, habits=20, history_days=730, seed=1):
+    """Данные приложения: задачи с подзадачами (0..max_subtasks), привычки с историей отметок"""
+    rng = random.Random(seed)
+    now = int(time.time())
+    today = date.today().toordinal()
+    data = {"tasks": [], "habits": [], "theme": "light"}
+    for _ in range(tasks):
+        completed = rng.random() < 0.3
+        data["tasks"].append({
+            "id": _id(rng),
+            "title": _text(rng, rng.randint(2, 6)),
+            "description": _text(rng, rng.randint(0, 30)),
+            "completed": completed,
+            "completed_at": now - rng.randint(0, history_days * 86400) if completed else None,
+            "coefficient": rng.randint(1, 4),
+            "subtasks": [
+                {"id": _id(rng), "title": _text(rng, rng.randint(1, 4)), "completed": rng.random() < 0.5}
+                for _ in range(rng.randint(0, max_subtasks))
+            ],
+        })
+    for index in range(habits):
+        rate = rng.uniform(0.2, 0.9)
+        days = [today - offset for offset in range(history_days, -1, -1) if rng.random() < rate]
+        data["habits"].append({
+            "id": _id(rng),
+            "name": f"Привычка {index + 1}",
+            "count": len(days),
+            "days": days,
+        })
+    return data
+
+
+def write_dataset(path, **params):
+    """Пишет app_data.json с синтетическими данными"""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(generate_data(**params), f, ensure_ascii=False, indent=2)
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Генератор app_data.json для бенчмарков")
+    parser.add_argument("--tasks", type=int, default=1_000)
+    parser.add_argument("--max-subtasks", type=int, default=5)
+    parser.add_argument("--habits", type=int, default=20)
+    parser.add_argument("--history-days", type=int, default=730)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", default="data/app_data.json")
+    args = parser.parse_args()
+    path = write_dataset(
+        args.output, tasks=args.tasks, max_subtasks=args.max_subtasks, habits=args.habits,
+        history_days=args.history_days, seed=args.seed,
+    )
+    print(f"{path}: {args.tasks} задач, {args.habits} привычек")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+"""
+Поддельная страница Flet для запуска построителей страниц без окна
+"""
+import threading
+
+
+class FakePage:
+    """Минимум ft.Page, который используют страницы приложения.
+
+    update() только считает вызовы; run_thread запускает настоящий поток
+    (как Flet), а run_task не выполняет корутину — фоновые циклы не нужны.
+    """
+
+    def __init__(self):
+        self.updates = 0
+        self.theme_mode = None
+        self.threads = []
+
+    def update(self, *controls):
+        self.updates += 1
+
+    def run_task(self, handler, *args, **kwargs):
+        coroutine = handler(*args, **kwargs)
+        coroutine.close()
+        return _DoneTask()
+
+    def run_thread(self, handler, *args, **kwargs):
+        thread = threading.Thread(target=handler, args=args, kwargs=kwargs, daemon=True)
+        self.threads.append(thread)
+        thread.start()
+
+    def join_threads(self):
+        """Дожидается фоновых потоков (вне замеров)"""
+        while self.threads:
+            self.threads.pop().join()
+
+
+class _DoneTask:
+    def done(self):
+        return False
+
+    def cancel(self):
+        pass
@@ -0,0 +1,330 @@
+"""
+Бенчмарки MyTasks: загрузка и сохранение данных, построение и обновление страниц,
+переключение вкладок. Flet-окно не нужно — используется FakePage.
+
+Примеры:
+    python -m benchmarks.run --sizes 1000 10000 --output bench.json
+    python -m benchmarks.run --sizes 1000 --baseline bench.json   # сравнение p50 с прошлым запуском
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from benchmarks.dataset import write_dataset
+from benchmarks.fake_page import FakePage
+
+DEFAULT_SIZES = (1_000, 10_000, 100_000)
+# Во сколько раз p50 может вырасти относительно базового запуска, прежде чем это регрессия
+DEFAULT_THRESHOLD = 1.25
+
+
+def percentiles(samples):
+    """Сводка по замерам в миллисекундах"""
+    ordered = sorted(samples)
+
+    def pick(q):
+        return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+    return {
+        "n": len(ordered),
+        "mean": sum(ordered) / len(ordered),
+        "min": ordered[0],
+        "p50": pick(0.5),
+        "p90": pick(0.9),
+        "p99": pick(0.99),
+        "max": ordered[-1],
+    }
+
+
+def measure(run, repeat, after=None):
+    """Замеряет run() repeat раз; after() выполняется после каждого замера вне времени"""
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        run()
+        samples.append((time.perf_counter() - started) * 1000)
+        if after is not None:
+            after()
+    return percentiles(samples)
+
+
+def undo_step_bytes(history, data):
+    """Средний размер шага истории отмены (оба стека) в байтах.
+
+    Каждый объект считается один раз и только если его держит сама история:
+    общие с данными (модели, их поля и строки), интернированные имена методов
+    и полей, подписи шагов и кешированные числа не учитываются.
+    """
+    from module.history import STEP_LABELS
+    from module.models import Record
+
+    shared = {id(None), id(True), id(False)}
+    shared.update(id(number) for number in range(-5, 257))
+    shared.update(id(label) for label in STEP_LABELS.values())
+    names = set(dir(type(history.data_manager)))
+    for cls in Record.__subclasses__():
+        names.update(cls.FIELDS)
+    shared.update(id(sys.intern(name)) for name in names)
+    stack = [data]
+    while stack:
+        value = stack.pop()
+        if id(value) in shared:
+            continue
+        shared.add(id(value))
+        if isinstance(value, Record):
+            stack.extend(value.shallow_dict().values())
+        elif isinstance(value, dict):
+            stack.extend(value.values())
+        elif isinstance(value, (list, tuple)):
+            stack.extend(value)
+
+    seen = set()
+
+    def size(value):
+        if id(value) in shared or id(value) in seen:
+            return 0
+        seen.add(id(value))
+        total = sys.getsizeof(value)
+        if isinstance(value, (list, tuple)):
+            total += sum(size(item) for item in value)
+        elif isinstance(value, dict):
+            total += sum(size(k) + size(v) for k, v in value.items())
+        return total
+
+    steps = list(history.undo_stack) + list(history.redo_stack)
+    total = sum(
+        sys.getsizeof(step) + size(step.label) + size(step.undo) + size(step.redo) + size(step.key) + size(step.time)
+        for step in steps
+    )
+    return total // max(1, len(steps))
+
+
+def bench_size(size, repeat, max_subtasks, habits):
+    """Все замеры для набора данных из size задач (в текущей папке)"""
+    from module.data_manager import (
+        DATA_FILE, DATA_REPLACED, SNAPSHOT_FILES, DataManager, Event, JsonStorage, export_pretty, load_data,
+        save_data,
+    )
+    from module.sharded_storage import ShardedStorage
+    from module.eisenhower_matrix import create_eisenhower_matrix_page
+    from module.habit_tracker import create_habit_tracker_page
+    from module.todo_list import create_todo_list_page
+    import main
+
+    write_dataset(DATA_FILE, tasks=size, max_subtasks=max_subtasks, habits=habits)
+    results = {"file_bytes": DATA_FILE.stat().st_size}
+    heavy_repeat = repeat if size < 100_000 else max(1, repeat // 3)
+
+    results["load_data"] = measure(load_data, heavy_repeat)
+    data = load_data()
+    results["save_data"] = measure(lambda: save_data(data), heavy_repeat)
+    # Форматы снимка: компактный JSON и msgpack против JSON с отступами
+    pretty_file = DATA_FILE.with_name("pretty.json")
+    results["save_pretty_json"] = measure(lambda: export_pretty(data, pretty_file), heavy_repeat)
+    results["pretty_json_bytes"] = pretty_file.stat().st_size
+    pretty_file.unlink()
+    for fmt in ("json", "msgpack"):
+        results[f"save_{fmt}"] = measure(lambda: save_data(data, fmt), heavy_repeat)
+        results[f"{fmt}_bytes"] = SNAPSHOT_FILES[fmt].stat().st_size
+        # load_data читает самый свежий снимок — только что записанный
+        results[f"load_{fmt}"] = measure(load_data, heavy_repeat)
+    SNAPSHOT_FILES["msgpack"].unlink()
+    del data
+
+    # Потоковая загрузка: время до темы, до первой порции задач и до конца
+    def stream_until(stop_key=None, storage=JsonStorage, shards=None):
+        dm = DataManager(save_delay=3600, storage=storage(), load=False)
+        for key, _ in dm.stream_load(shards=shards):
+            if key == stop_key:
+                break
+        dm.save_queue.close()
+
+    results["stream_first_section"] = measure(lambda: stream_until("theme"), heavy_repeat)
+    results["stream_first_tasks"] = measure(lambda: stream_until("tasks"), heavy_repeat)
+    results["stream_load"] = measure(stream_until, heavy_repeat)
+
+    # Хранение по разделам: первый запуск переносит снимок в data/shards (вне замеров),
+    # затем — чтение только задач и цена записи маленьких изменений против полного снимка
+    DataManager(save_delay=3600, storage=ShardedStorage()).save_queue.close()
+    results["shards_bytes"] = sum(path.stat().st_size for path in Path("data/shards").iterdir())
+    results["shards_stream_tasks_only"] = measure(
+        lambda: stream_until(storage=ShardedStorage, shards=("tasks",)), heavy_repeat
+    )
+    for name, storage in (("snapshot", JsonStorage), ("shards", ShardedStorage)):
+        dm = DataManager(save_delay=3600, storage=storage())
+        habit_id = dm.data["habits"][0]["id"] if dm.data["habits"] else None
+        themes = iter(["dark", "light"] * repeat)
+        results[f"theme_write_{name}"] = measure(
+            lambda: dm._write([{"op": "set", "key": "theme", "value": next(themes)}]), heavy_repeat
+        )
+        if habit_id is not None:
+            results[f"habit_check_in_write_{name}"] = measure(
+                lambda: dm._write([{"op": "habit_checked_in", "id": habit_id, "day": 1, "count": 1}]),
+                heavy_repeat,
+            )
+        dm.save_queue.close()
+
+    results["data_manager_init"] = measure(lambda: DataManager(save_delay=3600).save_queue.close(), heavy_repeat)
+    # Запись в фоне не должна попадать в замеры — она выполнится при close()
+    dm = DataManager(save_delay=3600)
+    page = FakePage()
+    rng = random.Random(1)
+    task_ids = [t["id"] for t in dm.data["tasks"]]
+    replaced = Event(DATA_REPLACED, None)
+
+    # To-do: построение страницы, полная сверка списка, точечное изменение задачи
+    views = []
+    results["todo_page_build"] = measure(
+        lambda: views.append(create_todo_list_page(page, dm)), heavy_repeat,
+        after=lambda: (page.join_threads(), views.pop().on_dispose()),
+    )
+    todo = create_todo_list_page(page, dm)
+    page.join_threads()
+    results["refresh_tasks_list"] = measure(
+        lambda: dm.events.publish(replaced), repeat, after=page.join_threads
+    )
+    results["task_update"] = measure(
+        lambda: dm.update_task(rng.choice(task_ids), title=f"Задача {rng.random()}"), repeat * 10
+    )
+
+    # Отмена: удаление задачи с возвратом на место и размер шагов истории после серии правок
+    def delete_and_undo():
+        dm.delete_task(rng.choice(task_ids))
+        dm.history.undo()
+
+    results["delete_undo"] = measure(delete_and_undo, repeat * 10)
+    results["undo_step_bytes"] = undo_step_bytes(dm.history, dm.data)
+    todo.on_dispose()
+
+    # Матрица: построение и полная перестройка индекса квадрантов
+    results["matrix_page_build"] = measure(
+        lambda: views.append(create_eisenhower_matrix_page(page, dm)), heavy_repeat,
+        after=lambda: views.pop().on_dispose(),
+    )
+    matrix = create_eisenhower_matrix_page(page, dm)
+    results["refresh_matrix"] = measure(lambda: dm.quadrants.rebuild(dm.data["tasks"]), repeat)
+    matrix.on_dispose()
+
+    # Привычки: построение строк и полная сверка
+    results["habit_page_build"] = measure(
+        lambda: views.append(create_habit_tracker_page(page, dm)), repeat,
+        after=lambda: views.pop().on_dispose(),
+    )
+    habits_view = create_habit_tracker_page(page, dm)
+    results["refresh_habits_list"] = measure(lambda: dm.events.publish(replaced), repeat)
+    habits_view.on_dispose()
+
+    # Навигация: первое открытие каждой вкладки и повторные переключения
+    builders = [main.lazy_builder(*builder) for builder in main.PAGE_BUILDERS]
+    cache = main.PageCache(page, dm, builders, max_pages=len(builders))
+    cold = []
+    for index in range(len(builders)):
+        started = time.perf_counter()
+        cache.get(index)
+        cache.activate(index)
+        cold.append((time.perf_counter() - started) * 1000)
+        page.join_threads()
+    results["navigation_first_open"] = percentiles(cold)
+    switches = iter([rng.randrange(len(builders)) for _ in range(repeat * 10)])
+
+    def switch():
+        index = next(switches)
+        cache.get(index)
+        cache.activate(index)
+
+    results["navigation_switch"] = measure(switch, repeat * 10)
+    for control, _ in cache.pages.values():
+        if getattr(control, "on_dispose", None):
+            control.on_dispose()
+
+    # Архив: перенос давно выполненных задач, загрузка рабочего списка после него и страница архива
+    started = time.perf_counter()
+    results["archived_tasks"] = dm.archive_completed(days=30)
+    results["archive_completed"] = percentiles([(time.perf_counter() - started) * 1000])
+    results["hot_tasks"] = len(dm.data["tasks"])
+    results["archive_bytes"] = dm.archive.path.stat().st_size if dm.archive.path.exists() else 0
+    results["shards_stream_after_archive"] = measure(lambda: stream_until(storage=ShardedStorage), heavy_repeat)
+    results["archive_page"] = measure(lambda: dm.archive.page(len(dm.archive) // 2, 50), repeat)
+
+    dm.save_queue.close()
+    dm.storage.close()
+    return results
+
+
+def compare(results, baseline, threshold):
+    """Регрессии p50 относительно базового запуска"""
+    regressions = []
+    for size, metrics in results["results"].items():
+        base_metrics = baseline.get("results", {}).get(size, {})
+        for name, stats in metrics.items():
+            base = base_metrics.get(name)
+            if not isinstance(stats, dict) or not isinstance(base, dict) or base["p50"] <= 0:
+                continue
+            ratio = stats["p50"] / base["p50"]
+            if ratio > threshold:
+                regressions.append({"size": size, "metric": name, "p50": stats["p50"],
+                                    "baseline_p50": base["p50"], "ratio": ratio})
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарки MyTasks")
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(DEFAULT_SIZES),
+                        help="размеры наборов данных (задач), например 1000 10000 100000 1000000")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--max-subtasks", type=int, default=5)
+    parser.add_argument("--habits", type=int, default=20)
+    parser.add_argument("--output", help="файл для JSON с результатами (по умолчанию stdout)")
+    parser.add_argument("--baseline", help="JSON прошлого запуска для сравнения")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+    args = parser.parse_args()
+
+    root = Path(__file__).resolve().parent.parent
+    sys.path.insert(0, str(root))
+    report = {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "repeat": args.repeat,
+            "max_subtasks": args.max_subtasks,
+            "habits": args.habits,
+            "started": int(time.time()),
+        },
+        "results": {},
+    }
+    cwd = os.getcwd()
+    for size in args.sizes:
+        with tempfile.TemporaryDirectory() as workdir:
+            # Данные приложения лежат в ./data — каждый размер в своей временной папке
+            os.chdir(workdir)
+            try:
+                report["results"][str(size)] = bench_size(size, args.repeat, args.max_subtasks, args.habits)
+            finally:
+                os.chdir(cwd)
+        print(f"{size} задач: готово", file=sys.stderr)
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            report["regressions"] = compare(report, json.load(f), args.threshold)
+
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        Path(args.output).write_text(text, encoding="utf-8")
+    else:
+        print(text)
+
+    if report.get("regressions"):
+        for item in report["regressions"]:
+            print(f"регрессия: {item['size']} {item['metric']} p50 {item['p50']:.2f} мс "
+                  f"(было {item['baseline_p50']:.2f} мс, x{item['ratio']:.2f})", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
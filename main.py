@@ -1,44 +1,123 @@
 """
 Приложение MyTasks
 """
+import time
+
+_PROCESS_STARTED = time.perf_counter()
+
+import importlib
+from collections import OrderedDict
+
 import flet as ft
-from module.data_manager import load_data, save_data
-from module.todo_list import create_todo_list_page
-from module.habit_tracker import create_habit_tracker_page
-from module.eisenhower_matrix import create_eisenhower_matrix_page
-from module.pomodoro import create_pomodoro_page
-from module.settings import create_settings_page
-
-
-class DataManager:
-    """Класс для управления данными приложения"""
-    def __init__(self):
-        self.data = load_data()
+from module.data_manager import THEME_CHANGED, DataManager
+from module.perf import instrument_page, recorder, span
+from module.ui import update_controls
+
+# Сколько построенных страниц держать в памяти (редко открываемые вытесняются)
+MAX_CACHED_PAGES = 4
+# Страницы, которые не вытесняются: To-do держит карточки и поисковый индекс по всем задачам,
+# и его перестройка на больших списках дороже любой другой страницы
+PINNED_PAGES = (0,)
+
+# Модули страниц импортируются при первом открытии вкладки;
+# третий элемент — разделы данных, которые нужны странице (догружаются перед построением)
+PAGE_BUILDERS = [
+    ("module.todo_list", "create_todo_list_page", ("tasks",)),
+    ("module.habit_tracker", "create_habit_tracker_page", ("habits",)),
+    ("module.eisenhower_matrix", "create_eisenhower_matrix_page", ("tasks",)),
+    ("module.pomodoro", "create_pomodoro_page", ("tasks",)),
+    ("module.statistics", "create_statistics_page", ("tasks", "habits")),
+    ("module.archive", "create_archive_page", ()),
+    ("module.settings", "create_settings_page", ()),
+]
+
+
+def lazy_builder(module_name, function_name, shards=()):
+    """Построитель страницы, который импортирует её модуль только при первом вызове"""
+    def build(page, data_manager):
+        data_manager.ensure_loaded(*shards)
+        module = importlib.import_module(module_name)
+        with span(f"build.{function_name}"):
+            return getattr(module, function_name)(page, data_manager)
+    return build
+
+
+class StartupTimer:
+    """Замер запуска: время до первого кадра и до готовности к работе"""
+    def __init__(self, started=_PROCESS_STARTED):
+        self.started = started
+        self.marks = {}
     
-    def get_data(self):
-        return self.data
+    def mark(self, name):
+        self.marks[name] = (time.perf_counter() - self.started) * 1000
     
-    def save(self):
-        save_data(self.data)
+    def report(self):
+        """Передаёт метки в сборщик замеров (startup.<метка>), если сбор включён"""
+        if not recorder.enabled:
+            return
+        for name, ms in self.marks.items():
+            recorder.record(f"startup.{name}", ms)
+
+
+class PageCache:
+    """Кэш страниц: каждая страница строится один раз и показывается повторно.
+
+    При повторном показе вызывается on_activate(changes) страницы с изменениями,
+    сделанными, пока она была скрыта (None — изменения не восстановить).
+    При скрытии вызывается on_deactivate() страницы (остановка фоновой отрисовки).
+    При вытеснении из кэша вызывается on_dispose() страницы (отписка от данных);
+    страницы из pinned не вытесняются и не занимают места в max_pages.
+    """
+    def __init__(self, page, data_manager, builders, max_pages=MAX_CACHED_PAGES, pinned=PINNED_PAGES):
+        self.page = page
+        self.data_manager = data_manager
+        self.builders = builders
+        self.max_pages = max_pages
+        self.pinned = frozenset(pinned)
+        self.pages = OrderedDict()  # индекс -> [control, ревизия при скрытии]
+        self.current = None
+    
+    def get(self, index):
+        """Возвращает страницу: из кэша или построенную впервые"""
+        if self.current is not None and self.current in self.pages:
+            # Запоминаем, до какой ревизии была актуальна скрываемая страница
+            hidden = self.pages[self.current]
+            hidden[1] = self.data_manager.revision
+            on_deactivate = getattr(hidden[0], "on_deactivate", None)
+            if index != self.current and on_deactivate is not None:
+                on_deactivate()
+        entry = self.pages.get(index)
+        if entry is None:
+            entry = [self.builders[index](self.page, self.data_manager), None]
+            self.pages[index] = entry
+        self.pages.move_to_end(index)
+        self.current = index
+        evictable = [key for key in self.pages if key not in self.pinned]
+        for key in evictable[:max(0, len(evictable) - self.max_pages)]:
+            control, _ = self.pages.pop(key)
+            on_dispose = getattr(control, "on_dispose", None)
+            if on_dispose is not None:
+                on_dispose()
+        return entry[0]
     
-    def update_data(self, new_data):
-        self.data.update(new_data)
-        self.save()
+    def activate(self, index):
+        """Применяет к уже показанной странице изменения, сделанные без неё"""
+        control, revision = self.pages[index]
+        on_activate = getattr(control, "on_activate", None)
+        if revision is not None and on_activate is not None:
+            on_activate(self.data_manager.changes_since(revision))
+        self.pages[index][1] = None
 
 
 def main(page: ft.Page):
     """Главная приложения"""
     # Настройка страницы
     page.title = "MyTasks"
+    instrument_page(page)
     page.theme_mode = ft.ThemeMode.LIGHT
-    
-    # Инициализация менеджера данных
-    data_manager = DataManager()
-    
-    # Загрузка темы
-    theme = data_manager.get_data().get("theme", "light")
-    if theme == "dark":
-        page.theme_mode = ft.ThemeMode.DARK
+    startup = StartupTimer()
+    # Состояние, которое появляется после фоновой загрузки данных
+    app = {"data_manager": None, "page_cache": None}
     
     # Заголовок приложения
     header = ft.Container(
@@ -53,27 +132,26 @@ def main(page: ft.Page):
         border=ft.Border(bottom=ft.BorderSide(1, ft.Colors.GREY_400))
     )
     
-    # Контентная область
+    # Прогресс потоковой загрузки задач
+    load_progress = ft.ProgressBar(value=0, visible=False)
+    
+    # Контентная область (до загрузки данных — индикатор)
     content_area = ft.Container(
-        content=create_todo_list_page(page, data_manager),
+        content=ft.ProgressRing(),
+        alignment=ft.Alignment.CENTER,
         expand=True,
         padding=20
     )
     
     # Функция для переключения вкладок
     def on_navigation_change(e):
+        page_cache = app["page_cache"]
+        if page_cache is None:
+            return
         selected_index = e.control.selected_index
-        if selected_index == 0:
-            content_area.content = create_todo_list_page(page, data_manager)
-        elif selected_index == 1:
-            content_area.content = create_habit_tracker_page(page, data_manager)
-        elif selected_index == 2:
-            content_area.content = create_eisenhower_matrix_page(page, data_manager)
-        elif selected_index == 3:
-            content_area.content = create_pomodoro_page(page, data_manager)
-        elif selected_index == 4:
-            content_area.content = create_settings_page(page, data_manager)
-        page.update()
+        content_area.content = page_cache.get(selected_index)
+        update_controls(content_area)
+        page_cache.activate(selected_index)
     
     # NavigationRail
     nav_rail = ft.NavigationRail(
@@ -109,6 +187,16 @@ def main(page: ft.Page):
                 selected_icon=ft.Icons.TIMER,
                 label="Помодоро",
             ),
+            ft.NavigationRailDestination(
+                icon=ft.Icons.INSIGHTS,
+                selected_icon=ft.Icons.INSIGHTS,
+                label="Статистика",
+            ),
+            ft.NavigationRailDestination(
+                icon=ft.Icons.ARCHIVE,
+                selected_icon=ft.Icons.ARCHIVE,
+                label="Архив",
+            ),
             ft.NavigationRailDestination(
                 icon=ft.Icons.SETTINGS,
                 selected_icon=ft.Icons.SETTINGS,
@@ -116,11 +204,13 @@ def main(page: ft.Page):
             ),
         ],
         on_change=on_navigation_change,
+        disabled=True,
     )
     
-    # Основной layout
+    # Основной layout: шапка и навигация показываются сразу, до загрузки данных
     page.add(
         header,
+        load_progress,
         ft.Row(
             [
                 nav_rail,
@@ -130,6 +220,91 @@ def main(page: ft.Page):
             expand=True,
         ),
     )
+    startup.mark("первый кадр")
+    
+    def apply_theme(theme):
+        page.theme_mode = ft.ThemeMode.DARK if theme == "dark" else ft.ThemeMode.LIGHT
+    
+    def show_first_page(page_cache):
+        content_area.content = page_cache.get(nav_rail.selected_index or 0)
+        content_area.alignment = None
+    
+    def load_app():
+        """Фоновая потоковая загрузка: сначала тема и помодоро, затем привычки и задачи порциями"""
+        data_manager = DataManager(load=False)
+        app["data_manager"] = data_manager
+        
+        # Дописываем отложенные изменения при закрытии окна/сессии
+        async def on_window_event(e):
+            if e.type == ft.WindowEventType.CLOSE:
+                data_manager.close()
+                await page.window.destroy()
+        
+        page.window.prevent_close = True
+        page.window.on_event = on_window_event
+        page.on_disconnect = lambda e: data_manager.close()
+        page.on_close = lambda e: data_manager.close()
+        
+        # Ctrl+Z — отменить, Ctrl+Shift+Z (или Ctrl+Y) — повторить последнее действие
+        def on_keyboard(e):
+            if not (e.ctrl or e.meta) or e.key.upper() not in ("Z", "Y"):
+                return
+            if e.key.upper() == "Z" and not e.shift:
+                step, verb = data_manager.history.undo(), "Отменено"
+            else:
+                step, verb = data_manager.history.redo(), "Повторено"
+            if step is not None:
+                page.show_dialog(ft.SnackBar(ft.Text(f"{verb}: {step.label}"), duration=2000))
+        
+        page.on_keyboard_event = on_keyboard
+        # Тема может смениться не только в настройках, но и отменой
+        data_manager.subscribe(
+            lambda events: (apply_theme(data_manager.get_data().get("theme", "light")), page.update()),
+            THEME_CHANGED,
+        )
+        
+        # Страницы строятся один раз и хранятся в кэше
+        page_cache = PageCache(
+            page, data_manager, [lazy_builder(*builder) for builder in PAGE_BUILDERS]
+        )
+        loaded = set()
+        # Читаются только разделы первой вкладки, остальные — при первом открытии своей вкладки
+        first_shards = PAGE_BUILDERS[nav_rail.selected_index or 0][2]
+        for key, progress in data_manager.stream_load(shards=first_shards):
+            loaded.add(key)
+            if key == "theme":
+                # Тема — в начале снимка: окно сразу перерисовывается в нужной теме
+                apply_theme(data_manager.get_data().get("theme", "light"))
+                page.update()
+                startup.mark("тема")
+            elif key == "tasks" and app["page_cache"] is None:
+                # Первая порция задач: показываем список, остальные порции допишутся в него
+                app["page_cache"] = page_cache
+                show_first_page(page_cache)
+                load_progress.value = progress
+                load_progress.visible = True
+                # Если привычки уже прочитаны (или читаются отдельно при открытии вкладки),
+                # остальные вкладки доступны до конца загрузки задач
+                nav_rail.disabled = "habits" not in loaded and "habits" not in data_manager.unloaded_shards()
+                page.update()
+                startup.mark("первые задачи")
+            elif key == "tasks":
+                load_progress.value = progress
+                update_controls(load_progress)
+        
+        if app["page_cache"] is None:
+            app["page_cache"] = page_cache
+            show_first_page(page_cache)
+        apply_theme(data_manager.get_data().get("theme", "light"))
+        load_progress.visible = False
+        nav_rail.disabled = False
+        page.update()
+        startup.mark("готов к работе")
+        startup.report()
+        # Давно выполненные задачи уходят в архив уже после показа, не задерживая запуск
+        data_manager.archive_completed()
+    
+    page.run_thread(load_app)
 
 
 if __name__ == "__main__":
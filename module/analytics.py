@@ -0,0 +1,188 @@
+"""
+Аналитика привычек и задач: векторные вычисления NumPy по компактным массивам дней
+"""
+from datetime import date
+
+import numpy as np
+
+from module.data_manager import (
+    DATA_REPLACED, HABIT_ADDED, HABIT_CHECKED_IN, HABIT_REMOVED, HABIT_UPDATED,
+    TASK_ADDED, TASK_REMOVED, TASK_UPDATED, TASKS_LOADED,
+)
+
+# Ключ результатов для всех привычек сразу (корреляции)
+ALL_HABITS = "*"
+
+
+def weekday_of(ordinals):
+    """День недели (0 — понедельник) для массива порядковых номеров дней"""
+    return (ordinals - 1) % 7
+
+
+def day_of_timestamp(ts):
+    return date.fromtimestamp(ts).toordinal()
+
+
+class Analytics:
+    """Аналитика по данным DataManager с кэшем результатов.
+
+    Дни хранятся как отсортированные массивы int32 порядковых номеров (date.toordinal());
+    ряды по дням строятся срезом через searchsorted, без прохода по всей истории.
+    Кэш результатов сбрасывается только для затронутой привычки и диапазона дат.
+    """
+
+    def __init__(self, data_manager):
+        self.data_manager = data_manager
+        self._habit_days = {}  # habit_id -> np.ndarray различных дней
+        self._task_days = None  # дни выполнения задач (с повторами)
+        # (вид, habit_id, start, end, параметр) -> результат
+        self._results = {}
+
+    # Исходные массивы
+
+    def habit_days(self, habit_id):
+        days = self._habit_days.get(habit_id)
+        if days is None:
+            habit = self.data_manager.get_habit(habit_id)
+            raw = habit.get("days", []) if habit else []
+            days = np.unique(np.asarray(raw, dtype=np.int32))
+            self._habit_days[habit_id] = days
+        return days
+
+    def task_days(self):
+        if self._task_days is None:
+            stamps = [
+                t["completed_at"] for t in self.data_manager.data["tasks"]
+                if t.get("completed") and t.get("completed_at")
+            ]
+            days = np.fromiter((day_of_timestamp(ts) for ts in stamps), dtype=np.int32, count=len(stamps))
+            # Задачи в архиве хранятся только счётчиками по дням
+            archived, counts = self.data_manager.archive.completion_days()
+            if archived:
+                days = np.concatenate([days, np.repeat(np.asarray(archived, dtype=np.int32), counts)])
+            days.sort()
+            self._task_days = days
+        return self._task_days
+
+    def habit_series(self, habit_id, start, end):
+        """Ряд 0/1 по дням [start, end] для привычки"""
+        days = self.habit_days(habit_id)
+        lo, hi = np.searchsorted(days, [start, end + 1])
+        series = np.zeros(end - start + 1, dtype=np.int8)
+        series[days[lo:hi] - start] = 1
+        return series
+
+    def task_series(self, start, end):
+        """Число выполненных задач по дням [start, end]"""
+        days = self.task_days()
+        lo, hi = np.searchsorted(days, [start, end + 1])
+        return np.bincount(days[lo:hi] - start, minlength=end - start + 1)
+
+    # Кэш
+
+    def _cached(self, key, compute):
+        result = self._results.get(key)
+        if result is None:
+            result = self._results[key] = compute()
+        return result
+
+    def invalidate(self, habit_id=None, day=None, tasks=False):
+        """Сбрасывает результаты привычки (или всех — habit_id=None) на дату day (None — любую)"""
+        if tasks:
+            self._task_days = None
+        elif habit_id is None:
+            self._habit_days.clear()
+        else:
+            self._habit_days.pop(habit_id, None)
+        for key in list(self._results):
+            kind, key_habit, start, end, window = key
+            if kind == "rolling":
+                # Скользящее окно захватывает дни до начала диапазона
+                start -= window - 1
+            if not tasks and habit_id is not None and key_habit not in (habit_id, ALL_HABITS):
+                continue
+            if tasks and key_habit != ALL_HABITS:
+                continue
+            if day is not None and not start <= day <= end:
+                continue
+            del self._results[key]
+
+    def apply_events(self, events):
+        """Сбрасывает кэш по событиям шины DataManager"""
+        for e in events:
+            change = e.change
+            if e.type == HABIT_CHECKED_IN:
+                self.invalidate(change["id"], change["day"])
+            elif e.type in (HABIT_UPDATED, HABIT_ADDED, HABIT_REMOVED):
+                habit_id = change["habit"]["id"] if e.type == HABIT_ADDED else change["id"]
+                if e.type == HABIT_UPDATED and "days" not in change["fields"]:
+                    continue
+                self.invalidate(habit_id)
+            elif e.type == TASK_UPDATED:
+                if "completed_at" in change["fields"]:
+                    # Отметка выполнения затрагивает только свой день; снятие — неизвестно какой
+                    completed_at = change["fields"]["completed_at"]
+                    self.invalidate(tasks=True, day=day_of_timestamp(completed_at) if completed_at else None)
+            elif e.type == TASK_ADDED:
+                if change["task"].get("completed"):
+                    self.invalidate(tasks=True)
+            elif e.type in (TASK_REMOVED, TASKS_LOADED):
+                self.invalidate(tasks=True)
+            elif e.type == DATA_REPLACED:
+                self._habit_days.clear()
+                self._task_days = None
+                self._results.clear()
+
+    # Метрики
+
+    def heatmap(self, habit_id, start, end):
+        """Календарь 7 × недели: 1 — отметка, 0 — нет, -1 — вне диапазона"""
+        def compute():
+            offset = int(weekday_of(start))
+            series = self.habit_series(habit_id, start, end)
+            cells = np.full(offset + len(series), -1, dtype=np.int8)
+            cells[offset:] = series
+            weeks = -(-len(cells) // 7)
+            grid = np.full(weeks * 7, -1, dtype=np.int8)
+            grid[:len(cells)] = cells
+            return grid.reshape(weeks, 7).T
+        return self._cached(("heatmap", habit_id, start, end, None), compute)
+
+    def rolling_rate(self, habit_id, start, end, window=7):
+        """Доля дней с отметкой в скользящем окне window дней, для каждого дня [start, end]"""
+        def compute():
+            series = self.habit_series(habit_id, start - window + 1, end)
+            sums = np.cumsum(np.concatenate(([0], series)), dtype=np.int64)
+            return (sums[window:] - sums[:-window]) / window
+        return self._cached(("rolling", habit_id, start, end, window), compute)
+
+    def weekday_profile(self, habit_id, start, end):
+        """Доля выполнения по дням недели (понедельник … воскресенье)"""
+        def compute():
+            series = self.habit_series(habit_id, start, end)
+            weekdays = weekday_of(np.arange(start, end + 1))
+            done = np.bincount(weekdays, weights=series, minlength=7)
+            total = np.bincount(weekdays, minlength=7)
+            return np.divide(done, total, out=np.zeros(7), where=total > 0)
+        return self._cached(("weekday", habit_id, start, end, None), compute)
+
+    def task_correlations(self, start, end):
+        """Корреляция Пирсона каждой привычки с числом выполненных задач по дням.
+
+        Возвращает {habit_id: r} (None — у ряда нет разброса).
+        """
+        def compute():
+            habit_ids = [h["id"] for h in self.data_manager.data["habits"]]
+            if not habit_ids:
+                return {}
+            matrix = np.stack([self.habit_series(h, start, end) for h in habit_ids]).astype(np.float64)
+            tasks = self.task_series(start, end).astype(np.float64)
+            matrix -= matrix.mean(axis=1, keepdims=True)
+            tasks -= tasks.mean()
+            denominator = np.sqrt((matrix ** 2).sum(axis=1) * (tasks ** 2).sum())
+            numerator = matrix @ tasks
+            result = {}
+            for habit_id, num, den in zip(habit_ids, numerator, denominator):
+                result[habit_id] = float(num / den) if den > 0 else None
+            return result
+        return self._cached(("correlation", ALL_HABITS, start, end, None), compute)
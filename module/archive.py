@@ -0,0 +1,130 @@
+"""
+Модуль архива выполненных задач
+"""
+import time
+
+import flet as ft
+
+from module.archive_store import ARCHIVE_AFTER_DAYS
+from module.data_manager import TASKS_ARCHIVED
+from module.ui import update_controls
+
+# Сколько задач архива показывать за раз
+ARCHIVE_PAGE_SIZE = 50
+
+ARCHIVE_PERIODS = {"7": "7 дней", "30": "30 дней", "90": "90 дней", "365": "Год", "0": "Никогда"}
+
+
+def create_archive_page(page, data_manager):
+    """Создает страницу архива: задачи читаются страницами по мере прокрутки, их можно восстановить"""
+    archive = data_manager.archive
+    state = {"loaded": 0, "revision": None, "visible": True, "dirty": False}
+
+    period_dropdown = ft.Dropdown(
+        label="Архивировать выполненные старше",
+        width=300,
+        value=str(data_manager.get_data().get("archive_days", ARCHIVE_AFTER_DAYS)),
+        options=[ft.dropdown.Option(key=k, text=v) for k, v in ARCHIVE_PERIODS.items()],
+    )
+    count_text = ft.Text("", size=14)
+    status_text = ft.Text("", size=12)
+    archive_list = ft.ListView(spacing=5, expand=True)
+    more_button = ft.OutlinedButton("Показать ещё", icon=ft.Icons.EXPAND_MORE)
+
+    def create_archive_row(number, task):
+        completed_at = task.get("completed_at")
+        done = time.strftime("%d.%m.%Y", time.localtime(completed_at)) if completed_at else "давно"
+        row = ft.Row([
+            ft.Icon(ft.Icons.CHECK_CIRCLE, color=ft.Colors.GREEN_600),
+            ft.Column([
+                ft.Text(task.get("title", ""), size=16),
+                ft.Text(f"Выполнена: {done}", size=12),
+            ], spacing=2, expand=True),
+        ], vertical_alignment=ft.CrossAxisAlignment.CENTER)
+
+        def restore_click(e):
+            if data_manager.restore_archived(number, task) is None:
+                status_text.value = "Задача уже есть в списке"
+            else:
+                status_text.value = f"Восстановлена: {task.get('title', '')}"
+                archive_list.controls.remove(row)
+                state["loaded"] -= 1
+            state["revision"] = archive.revision
+            render_counts()
+            update_controls(archive_list, status_text)
+
+        row.controls.append(ft.IconButton(icon=ft.Icons.UNARCHIVE, tooltip="Восстановить", on_click=restore_click))
+        return row
+
+    def render_counts():
+        total = len(archive)
+        count_text.value = f"В архиве: {total}" if total else "Архив пуст"
+        more_button.visible = state["loaded"] < total
+        update_controls(count_text, more_button)
+
+    def load_more(e=None):
+        """Следующая страница архива (распаковываются только нужные сегменты)"""
+        items = archive.page(state["loaded"], ARCHIVE_PAGE_SIZE)
+        archive_list.controls.extend(create_archive_row(number, task) for number, task in items)
+        state["loaded"] += len(items)
+        render_counts()
+        update_controls(archive_list)
+
+    def reload():
+        """Показывает архив с начала"""
+        state["dirty"] = False
+        state["revision"] = archive.revision
+        state["loaded"] = 0
+        archive_list.controls = []
+        load_more()
+
+    more_button.on_click = load_more
+
+    def change_period(e):
+        data_manager.set_value("archive_days", int(e.control.value))
+
+    period_dropdown.on_select = change_period
+
+    def archive_now_click(e):
+        moved = data_manager.archive_completed()
+        status_text.value = f"Перенесено в архив: {moved}" if moved else "Нет задач для архива"
+        update_controls(status_text)
+
+    def on_archived(events):
+        if archive.revision == state["revision"]:
+            return
+        if state["visible"]:
+            reload()
+        else:
+            state["dirty"] = True
+
+    unsubscribe = data_manager.subscribe(on_archived, TASKS_ARCHIVED)
+
+    def on_activate(changes):
+        state["visible"] = True
+        if state["dirty"]:
+            reload()
+
+    def on_deactivate():
+        state["visible"] = False
+
+    reload()
+
+    view = ft.Container(
+        content=ft.Column([
+            ft.Text("Архив", size=28, weight=ft.FontWeight.BOLD),
+            ft.Row([
+                period_dropdown,
+                ft.OutlinedButton("Архивировать сейчас", icon=ft.Icons.ARCHIVE, on_click=archive_now_click),
+            ], spacing=10, vertical_alignment=ft.CrossAxisAlignment.CENTER),
+            ft.Row([count_text, status_text], spacing=20),
+            archive_list,
+            more_button,
+        ], spacing=15, expand=True),
+        padding=20,
+        expand=True
+    )
+    view.on_activate = on_activate
+    view.on_deactivate = on_deactivate
+    view.on_dispose = unsubscribe
+    return view
@@ -0,0 +1,150 @@
+"""
+Архив выполненных задач: холодное хранилище, в которое задачи только дописываются.
+
+Каждый перенос в архив — сегменты gzip (компактный JSON-список задач) в конце
+archive.jsonl.gz. Небольшой индекс archive_index.json хранит смещения сегментов,
+id восстановленных задач и число выполненных задач по дням (для статистики),
+поэтому страница архива распаковывает только сегменты, попавшие в окно.
+"""
+import gzip
+import json
+import os
+import threading
+from collections import Counter
+from datetime import date
+
+from module.data_manager import DATA_DIR, ensure_data_dir
+from module.models import json_default
+
+ARCHIVE_FILE = DATA_DIR / "archive.jsonl.gz"
+ARCHIVE_INDEX_FILE = DATA_DIR / "archive_index.json"
+
+# Через сколько дней после выполнения задача уходит в архив (0 — не архивировать)
+ARCHIVE_AFTER_DAYS = int(os.environ.get("MYTASKS_ARCHIVE_DAYS", "30"))
+# Задач в одном сегменте: страница архива распаковывает не больше пары сегментов
+SEGMENT_SIZE = 500
+# Степень сжатия gzip: 6 почти не уступает 9 по размеру и сжимает в несколько раз быстрее
+COMPRESS_LEVEL = 6
+
+
+class ArchiveStore:
+    """Сегменты gzip с выполненными задачами и индекс к ним"""
+
+    def __init__(self, path=ARCHIVE_FILE, index_path=ARCHIVE_INDEX_FILE):
+        self.path = path
+        self.index_path = index_path
+        self.segments = []  # [{"offset", "length", "count", "restored": [id, ...]}]
+        self.days = Counter()  # день выполнения (date.toordinal()) -> число задач в архиве
+        self.revision = 0  # растёт при каждом изменении архива
+        self._lock = threading.Lock()
+        self._load_index()
+
+    def _load_index(self):
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                index = json.load(f)
+        except (ValueError, IOError):
+            return
+        size = self.path.stat().st_size if self.path.exists() else 0
+        if not size:
+            return
+        # Сегмент за концом файла (файл обрезан или подменён) в индекс не попадает
+        self.segments = [s for s in index.get("segments", []) if s["offset"] + s["length"] <= size]
+        self.days = Counter({int(day): count for day, count in index.get("days", {}).items()})
+
+    def _save_index(self):
+        index = {
+            "segments": self.segments,
+            "days": {str(day): count for day, count in self.days.items() if count > 0},
+        }
+        tmp_file = self.index_path.with_name(self.index_path.name + ".tmp")
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump(index, f, separators=(",", ":"))
+        os.replace(tmp_file, self.index_path)
+
+    def __len__(self):
+        return sum(s["count"] - len(s["restored"]) for s in self.segments)
+
+    def append(self, tasks):
+        """Дописывает задачи новыми сегментами по SEGMENT_SIZE; False — если записать не удалось"""
+        if not tasks:
+            return True
+        segments = []
+        for start in range(0, len(tasks), SEGMENT_SIZE):
+            chunk = tasks[start:start + SEGMENT_SIZE]
+            raw = json.dumps(chunk, ensure_ascii=False, separators=(",", ":"), default=json_default)
+            segments.append((gzip.compress(raw.encode("utf-8"), compresslevel=COMPRESS_LEVEL), len(chunk)))
+        with self._lock:
+            ensure_data_dir()
+            written = []
+            try:
+                with open(self.path, 'ab') as f:
+                    for payload, count in segments:
+                        written.append({"offset": f.tell(), "length": len(payload), "count": count, "restored": []})
+                        f.write(payload)
+                self.segments.extend(written)
+                for task in tasks:
+                    day = completion_day(task)
+                    if day is not None:
+                        self.days[day] += 1
+                self._save_index()
+            except IOError:
+                return False
+            self.revision += 1
+        return True
+
+    def _read_segment(self, segment):
+        with open(self.path, 'rb') as f:
+            f.seek(segment["offset"])
+            return json.loads(gzip.decompress(f.read(segment["length"])))
+
+    def page(self, offset=0, limit=50):
+        """Задачи архива от новых к старым: список (номер сегмента, задача).
+
+        Сегменты целиком до окна пропускаются по счётчикам, без распаковки.
+        """
+        result = []
+        skip = offset
+        for number in range(len(self.segments) - 1, -1, -1):
+            segment = self.segments[number]
+            live = segment["count"] - len(segment["restored"])
+            if live <= 0:
+                continue
+            if skip >= live:
+                skip -= live
+                continue
+            restored = set(segment["restored"])
+            for task in reversed(self._read_segment(segment)):
+                if task.get("id") in restored:
+                    continue
+                if skip:
+                    skip -= 1
+                    continue
+                result.append((number, task))
+                if len(result) >= limit:
+                    return result
+        return result
+
+    def restore(self, number, task):
+        """Помечает задачу сегмента восстановленной (сам сегмент не переписывается)"""
+        with self._lock:
+            segment = self.segments[number]
+            if task["id"] in segment["restored"]:
+                return False
+            segment["restored"].append(task["id"])
+            day = completion_day(task)
+            if day is not None and self.days[day] > 0:
+                self.days[day] -= 1
+            self._save_index()
+            self.revision += 1
+        return True
+
+    def completion_days(self):
+        """Дни выполнения задач архива: (дни, число задач) по возрастанию дней"""
+        days = sorted(day for day, count in self.days.items() if count > 0)
+        return days, [self.days[day] for day in days]
+
+
+def completion_day(task):
+    completed_at = task.get("completed_at")
+    return date.fromtimestamp(completed_at).toordinal() if completed_at else None
@@ -0,0 +1,70 @@
+"""
+Конвертация данных текущего хранилища (MYTASKS_STORAGE) между форматами снимка
+
+Примеры:
+    python -m module.convert msgpack                      # разделы data/shards/*.msgpack (или app_data.msgpack)
+    python -m module.convert json                         # компактный JSON
+    python -m module.convert pretty --output export.json  # читаемый JSON с отступами
+"""
+import argparse
+import time
+
+from module.data_manager import (
+    SNAPSHOT_FILES, STORAGE_MODE, JournalStorage, create_storage, export_pretty, save_data, snapshot_file,
+)
+
+
+def convert(storage, mode, fmt):
+    """Переписывает данные хранилища в формате fmt; возвращает (данные, записанные файлы).
+
+    Читается то хранилище, с которым работает приложение, — в режиме shards это
+    разделы, а не оставшийся от прежних версий app_data.json.
+    """
+    if mode == "shards":
+        from module.sharded_storage import SHARDS, ShardedStorage
+        storage = ShardedStorage(storage.shards_dir, fmt)
+        data = storage.load()
+        if not storage.write(data, None):
+            return data, None
+        return data, [storage.shard_file(shard) for shard in SHARDS]
+    data = storage.load()
+    if isinstance(storage, JournalStorage):
+        # Журнал сворачивается в снимок нового формата, иначе его записи применились бы дважды
+        ok = storage.compact(data, fmt)
+    else:
+        ok = save_data(data, fmt)
+    return data, [SNAPSHOT_FILES[fmt]] if ok else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Конвертация данных MyTasks")
+    parser.add_argument("format", choices=("json", "msgpack", "pretty"))
+    parser.add_argument("--output", default="data/app_data_pretty.json",
+                        help="файл для экспорта в формате pretty")
+    args = parser.parse_args()
+
+    mode = STORAGE_MODE
+    if mode in ("json", "journal") and snapshot_file() is None:
+        parser.error("снимок данных не найден")
+    if mode == "sqlite" and args.format != "pretty":
+        parser.error("в режиме sqlite данные хранятся в базе: доступен только экспорт pretty")
+    storage = create_storage(mode)
+    started = time.perf_counter()
+    try:
+        if args.format == "pretty":
+            data = storage.load()
+            targets = [export_pretty(data, args.output)]
+        else:
+            data, targets = convert(storage, mode, args.format)
+            if targets is None:
+                parser.error("не удалось записать данные")
+    finally:
+        storage.close()
+    finished = time.perf_counter()
+    size = sum(target.stat().st_size for target in targets)
+    print(f"{mode}: задач {len(data.get('tasks', []))} -> {', '.join(str(t) for t in targets)} "
+          f"({size} байт, {(finished - started) * 1000:.0f} мс)")
+
+
+if __name__ == "__main__":
+    main()
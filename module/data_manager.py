@@ -1,25 +1,239 @@
 """
 Менеджер данных для сохранения и загрузки данных приложения
 """
+import atexit
+import bisect
+import itertools
 import json
 import os
+import re
+import threading
+import time
+import zlib
+from collections import deque, namedtuple
+from contextlib import contextmanager
 from pathlib import Path
 
+import msgpack
+
+from module.habit_stats import HabitStatsIndex, today_ordinal
+from module.history import UndoHistory, command
+from module.models import Habit, Subtask, Task, adopt, json_default, to_plain
+from module.perf import span, timed
+
 DATA_DIR = Path("data")
 DATA_FILE = DATA_DIR / "app_data.json"
+MSGPACK_FILE = DATA_DIR / "app_data.msgpack"
+JOURNAL_FILE = DATA_DIR / "app_data.journal"
+POMODORO_HISTORY_FILE = DATA_DIR / "pomodoro_history.jsonl"
+
+# Формат снимка: "json" — компактный JSON в app_data.json, "msgpack" — двоичный app_data.msgpack.
+# При загрузке формат определяется по содержимому файла.
+SNAPSHOT_FORMAT = os.environ.get("MYTASKS_FORMAT", "json")
+SNAPSHOT_FILES = {"json": DATA_FILE, "msgpack": MSGPACK_FILE}
+# Большие списки: в снимке идут после остальных разделов и читаются порциями
+STREAMED_KEYS = ("habits", "tasks")
+# Размер порции при потоковой загрузке
+LOAD_CHUNK = int(os.environ.get("MYTASKS_LOAD_CHUNK", "2000"))
+
+# Режим хранения: "shards" — задачи, привычки, помодоро и настройки в отдельных файлах data/shards,
+# "json" — снимок целиком, "journal" — снимок + журнал изменений, "sqlite" — таблицы в data/app_data.db
+STORAGE_MODE = os.environ.get("MYTASKS_STORAGE", "shards")
+# Размер журнала, после которого он сворачивается в новый снимок (байты)
+JOURNAL_COMPACT_BYTES = int(os.environ.get("MYTASKS_JOURNAL_LIMIT", str(1024 * 1024)))
+
+# Пауза "тишины" перед фоновой записью и максимальная задержка записи (секунды)
+SAVE_DELAY = float(os.environ.get("MYTASKS_SAVE_DELAY", "0.5"))
+SAVE_MAX_DELAY = float(os.environ.get("MYTASKS_SAVE_MAX_DELAY", "5"))
+
+
+class _Deferred:
+    """Ответ хранилища «запись отложена» (идёт загрузка): ложный, как неудача, но не ошибка"""
+    __slots__ = ()
+
+    def __bool__(self):
+        return False
+
+    def __repr__(self):
+        return "DEFERRED"
+
+
+DEFERRED = _Deferred()
+
+# Сколько последних изменений помнить для догоняющего обновления скрытых страниц
+CHANGE_LOG_SIZE = 2000
+
+# Ключи верхнего уровня, изменения которых не попадают в историю отмены
+UNDO_SKIP_KEYS = ("pomodoro",)
 
 def ensure_data_dir():
     """Создает папку data, если её нет"""
     DATA_DIR.mkdir(exist_ok=True)
 
+def detect_format(raw):
+    """Формат снимка по первому значащему байту: JSON-объект начинается с "{" """
+    head = raw.lstrip()[:1]
+    if head in (b"{", b"\xef"):  # \xef — начало BOM UTF-8
+        return "json"
+    return "msgpack"
+
+
+def ordered_sections(data):
+    """Разделы в порядке записи: сначала маленькие (theme, pomodoro), затем привычки и задачи"""
+    ordered = {key: value for key, value in data.items() if key not in STREAMED_KEYS}
+    for key in STREAMED_KEYS:
+        if key in data:
+            ordered[key] = data[key]
+    return ordered
+
+
+def encode_snapshot(data, fmt=None):
+    """Снимок данных в байтах: компактный JSON или msgpack"""
+    fmt = fmt or SNAPSHOT_FORMAT
+    data = ordered_sections(data)
+    if fmt == "msgpack":
+        return msgpack.packb(data, default=json_default, use_bin_type=True)
+    return json.dumps(
+        data, ensure_ascii=False, separators=(",", ":"), default=json_default
+    ).encode("utf-8")
+
+
+def decode_snapshot(raw):
+    """Читает снимок любого поддерживаемого формата"""
+    if detect_format(raw) == "msgpack":
+        return msgpack.unpackb(raw, raw=False, strict_map_key=False)
+    return json.loads(raw.decode("utf-8-sig"))
+
+
+def iter_sections(data, chunk_size=LOAD_CHUNK):
+    """Разделы уже загруженных данных в том же виде, что и stream_data()"""
+    for key, value in ordered_sections(data).items():
+        if key in STREAMED_KEYS:
+            for start in range(0, len(value), chunk_size):
+                yield key, value[start:start + chunk_size], 1.0
+            if not value:
+                yield key, [], 1.0
+        else:
+            yield key, value, 1.0
+
+
+_WHITESPACE = re.compile(r"[ \t\n\r]*")
+
+
+def _stream_json(text, chunk_size):
+    """Разбор JSON-объекта верхнего уровня по разделам; списки STREAMED_KEYS — порциями"""
+    decode = json.JSONDecoder().raw_decode
+    skip = _WHITESPACE.match
+    total = max(1, len(text))
+
+    def expect(index, char):
+        index = skip(text, index).end()
+        if text[index:index + 1] != char:
+            raise ValueError(f"ожидался {char!r} в позиции {index}")
+        return skip(text, index + 1).end()
+
+    index = expect(0, "{")
+    if text[index:index + 1] == "}":
+        return
+    while True:
+        key, index = decode(text, index)
+        index = expect(index, ":")
+        if key in STREAMED_KEYS:
+            index = expect(index, "[")
+            chunk = []
+            if text[index:index + 1] == "]":
+                index += 1
+            else:
+                while True:
+                    item, index = decode(text, index)
+                    chunk.append(item)
+                    if len(chunk) >= chunk_size:
+                        yield key, chunk, index / total
+                        chunk = []
+                    index = skip(text, index).end()
+                    char = text[index:index + 1]
+                    index = skip(text, index + 1).end()
+                    if char == "]":
+                        break
+                    if char != ",":
+                        raise ValueError(f"ожидался ',' или ']' в позиции {index}")
+            yield key, chunk, index / total
+        else:
+            value, index = decode(text, index)
+            yield key, value, index / total
+        index = skip(text, index).end()
+        char = text[index:index + 1]
+        if char == "}":
+            return
+        if char != ",":
+            raise ValueError(f"ожидался ',' или '}}' в позиции {index}")
+        index = skip(text, index + 1).end()
+
+
+def _stream_msgpack(raw, chunk_size):
+    """То же для msgpack: Unpacker читает заголовки словаря и списков без разбора всего файла"""
+    unpacker = msgpack.Unpacker(raw=False, strict_map_key=False, max_buffer_size=max(len(raw), 1))
+    unpacker.feed(raw)
+    total = max(1, len(raw))
+    for _ in range(unpacker.read_map_header()):
+        key = unpacker.unpack()
+        if key in STREAMED_KEYS:
+            chunk = []
+            for _ in range(unpacker.read_array_header()):
+                chunk.append(unpacker.unpack())
+                if len(chunk) >= chunk_size:
+                    yield key, chunk, unpacker.tell() / total
+                    chunk = []
+            yield key, chunk, unpacker.tell() / total
+        else:
+            yield key, unpacker.unpack(), unpacker.tell() / total
+
+
+def stream_data(chunk_size=LOAD_CHUNK):
+    """Потоковое чтение снимка: (ключ, значение или порция списка, доля прочитанного).
+
+    Маленькие разделы (theme, pomodoro) записываются первыми, поэтому приходят
+    раньше, чем начнётся разбор больших списков. Ошибка формата — ValueError.
+    """
+    ensure_data_dir()
+    path = snapshot_file()
+    if path is None:
+        yield from iter_sections({"tasks": [], "habits": [], "theme": "light"}, chunk_size)
+        return
+    yield from stream_file(path, chunk_size)
+
+
+def stream_file(path, chunk_size=LOAD_CHUNK):
+    """Потоковое чтение одного файла в формате снимка (JSON или msgpack)"""
+    raw = Path(path).read_bytes()
+    if detect_format(raw) == "msgpack":
+        yield from _stream_msgpack(raw, chunk_size)
+    else:
+        yield from _stream_json(raw.decode("utf-8-sig"), chunk_size)
+
+
+def newest_file(paths):
+    """Самый свежий из существующих файлов (или None)"""
+    existing = [path for path in paths if path.exists()]
+    if not existing:
+        return None
+    return max(existing, key=lambda path: path.stat().st_mtime_ns)
+
+
+def snapshot_file():
+    """Самый свежий из существующих файлов снимка (или None)"""
+    return newest_file(SNAPSHOT_FILES.values())
+
+
+@timed("load_data")
 def load_data():
-    """Загружает данные из JSON файла"""
+    """Загружает данные из снимка (JSON или msgpack — определяется по содержимому)"""
     ensure_data_dir()
-    if DATA_FILE.exists():
+    path = snapshot_file()
+    if path is not None:
         try:
-            with open(DATA_FILE, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        except (json.JSONDecodeError, IOError):
+            return decode_snapshot(path.read_bytes())
+        except (ValueError, IOError, msgpack.UnpackException):
             pass
     # Возвращаем структуру по умолчанию
     return {
@@ -28,12 +242,1077 @@ def load_data():
         "theme": "light"
     }
 
-def save_data(data):
-    """Сохраняет данные в JSON файл"""
+@timed("save_data")
+def save_data(data, fmt=None):
+    """Сохраняет снимок в выбранном формате (через временный файл, чтобы не оставить обрывок)"""
     ensure_data_dir()
+    fmt = fmt or SNAPSHOT_FORMAT
+    path = SNAPSHOT_FILES[fmt]
+    raw = encode_snapshot(data, fmt)
+    tmp_file = path.with_name(path.name + ".tmp")
     try:
-        with open(DATA_FILE, 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
+        with open(tmp_file, 'wb') as f:
+            f.write(raw)
+        os.replace(tmp_file, path)
         return True
     except IOError:
         return False
+
+
+def export_pretty(data, path):
+    """Экспорт в читаемый JSON с отступами (только по явному запросу)"""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=2, default=json_default)
+    return path
+
+
+def insert_record(records, record, index, change):
+    """Вставляет запись на место index (None — в конец); id следующей записи — в change["before"]"""
+    if index is None or index >= len(records):
+        records.append(record)
+        return
+    change["before"] = records[index]["id"]
+    records.insert(index, record)
+
+
+def remove_record(records, record):
+    """Удаляет запись из списка; возвращает её место (для отмены)"""
+    index = records.index(record)
+    del records[index]
+    return index
+
+
+def insert_before(records, record, before):
+    """Вставляет запись перед записью с id before (или в конец)"""
+    if before is not None:
+        for index, item in enumerate(records):
+            if item["id"] == before:
+                records.insert(index, record)
+                return
+    records.append(record)
+
+
+def apply_changes(data, changes):
+    """Применяет записи изменений к данным (повторное применение безопасно)"""
+    tasks = data.setdefault("tasks", [])
+    habits = data.setdefault("habits", [])
+    tasks_by_id = {t["id"]: t for t in tasks}
+    habits_by_id = {h["id"]: h for h in habits}
+    for change in changes:
+        op = change["op"]
+        if op == "set":
+            data[change["key"]] = change["value"]
+        elif op == "task_added":
+            task = change["task"]
+            if task["id"] not in tasks_by_id:
+                insert_before(tasks, task, change.get("before"))
+                tasks_by_id[task["id"]] = task
+        elif op == "task_updated":
+            task = tasks_by_id.get(change["id"])
+            if task is not None:
+                task.update(change["fields"])
+        elif op == "task_removed":
+            task = tasks_by_id.pop(change["id"], None)
+            if task is not None:
+                tasks.remove(task)
+        elif op.startswith("subtask_"):
+            task = tasks_by_id.get(change["task_id"])
+            if task is None:
+                continue
+            subtasks = task.setdefault("subtasks", [])
+            if op == "subtask_added":
+                if not any(st["id"] == change["subtask"]["id"] for st in subtasks):
+                    insert_before(subtasks, change["subtask"], change.get("before"))
+            elif op == "subtask_updated":
+                for st in subtasks:
+                    if st["id"] == change["id"]:
+                        st.update(change["fields"])
+                        break
+            elif op == "subtask_removed":
+                task["subtasks"] = [st for st in subtasks if st["id"] != change["id"]]
+        elif op == "habit_added":
+            habit = change["habit"]
+            if habit["id"] not in habits_by_id:
+                insert_before(habits, habit, change.get("before"))
+                habits_by_id[habit["id"]] = habit
+        elif op == "habit_updated":
+            habit = habits_by_id.get(change["id"])
+            if habit is not None:
+                habit.update(change["fields"])
+        elif op == "habit_checked_in":
+            habit = habits_by_id.get(change["id"])
+            # count в записи — итог после отметки, поэтому повторное применение пропускается
+            if habit is not None and habit.get("count", 0) < change["count"]:
+                bisect.insort(habit.setdefault("days", []), change["day"])
+                habit["count"] = change["count"]
+        elif op == "habit_removed":
+            habit = habits_by_id.pop(change["id"], None)
+            if habit is not None:
+                habits.remove(habit)
+    return data
+
+
+def changed_task_ids(changes):
+    """id задач, затронутых изменениями (None — изменён весь список задач)"""
+    if changes is None:
+        return None
+    task_ids = {}
+    for change in changes:
+        op = change["op"]
+        if op == "set" and change["key"] == "tasks":
+            return None
+        if op == "task_added":
+            task_ids[change["task"]["id"]] = True
+        elif op in ("task_updated", "task_removed"):
+            task_ids[change["id"]] = True
+        elif op.startswith("subtask_"):
+            task_ids[change["task_id"]] = True
+        elif op == TASKS_LOADED:
+            task_ids.update(dict.fromkeys(change["ids"], True))
+    return list(task_ids)
+
+
+# Типы событий шины изменений
+TASK_ADDED = "task_added"
+TASK_UPDATED = "task_updated"
+TASK_REMOVED = "task_removed"
+SUBTASK_ADDED = "subtask_added"
+SUBTASK_UPDATED = "subtask_updated"
+SUBTASK_REMOVED = "subtask_removed"
+HABIT_ADDED = "habit_added"
+HABIT_UPDATED = "habit_updated"
+HABIT_CHECKED_IN = "habit_checked_in"
+HABIT_REMOVED = "habit_removed"
+POMODORO_STATE = "pomodoro_state"
+POMODORO_SESSION = "pomodoro_session"
+THEME_CHANGED = "theme_changed"
+SETTING_CHANGED = "setting_changed"
+DATA_REPLACED = "data_replaced"
+# Порция задач пришла при потоковой загрузке ({"op": "tasks_loaded", "ids": [...]})
+TASKS_LOADED = "tasks_loaded"
+# Выполненные задачи перенесены в архив: {"op": "tasks_archived", "ids": [...]}
+TASKS_ARCHIVED = "tasks_archived"
+
+TASK_EVENTS = (TASK_ADDED, TASK_UPDATED, TASK_REMOVED, SUBTASK_ADDED, SUBTASK_UPDATED, SUBTASK_REMOVED)
+HABIT_EVENTS = (HABIT_ADDED, HABIT_UPDATED, HABIT_CHECKED_IN, HABIT_REMOVED)
+
+# Событие: тип и запись изменения ({"op": ..., "id": ..., "fields": ...})
+Event = namedtuple("Event", "type change")
+
+
+def event_type(change):
+    """Тип события для записи изменения"""
+    if change is None:
+        return DATA_REPLACED
+    if change["op"] == "set":
+        if change["key"] == "theme":
+            return THEME_CHANGED
+        if change["key"] == "pomodoro":
+            return POMODORO_STATE
+        if change["key"] in ("tasks", "habits"):
+            return DATA_REPLACED
+        return SETTING_CHANGED
+    return change["op"]
+
+
+class EventBus:
+    """Шина изменений: подписчики получают списки событий нужных им типов.
+
+    Внутри batch() события копятся и доставляются каждому подписчику одним
+    списком по выходу из самого внешнего batch().
+    """
+
+    def __init__(self):
+        self._subscribers = []
+        self._batch_depth = 0
+        self._pending = []
+
+    def subscribe(self, handler, *types):
+        """Подписывает handler(events) на события указанных типов (без типов — на все).
+
+        Возвращает функцию отписки.
+        """
+        entry = (handler, frozenset(types))
+        self._subscribers.append(entry)
+        return lambda: self.unsubscribe(handler)
+
+    def unsubscribe(self, handler):
+        self._subscribers = [s for s in self._subscribers if s[0] is not handler]
+
+    def publish(self, event):
+        if self._batch_depth:
+            self._pending.append(event)
+        else:
+            self._deliver([event])
+
+    @contextmanager
+    def batch(self):
+        self._batch_depth += 1
+        try:
+            yield
+        finally:
+            self._batch_depth -= 1
+            if not self._batch_depth and self._pending:
+                events, self._pending = self._pending, []
+                self._deliver(events)
+
+    def _deliver(self, events):
+        for handler, types in list(self._subscribers):
+            selected = [e for e in events if not types or e.type in types]
+            if selected:
+                handler(selected)
+
+
+class JsonStorage:
+    """Хранение снимком: каждая запись переписывает app_data.json целиком"""
+
+    def load(self):
+        return load_data()
+
+    def stream(self, chunk_size=LOAD_CHUNK, shards=None):
+        # Снимок читается целиком: shards (см. ShardedStorage) здесь не нужен
+        return stream_data(chunk_size)
+
+    def replay(self):
+        """Изменения, которые применяются поверх снимка после потоковой загрузки"""
+        return []
+
+    def write(self, data, changes):
+        return save_data(data)
+
+    def close(self):
+        pass
+
+
+class JournalStorage(JsonStorage):
+    """Снимок + журнал: изменения дописываются в конец журнала, журнал периодически сворачивается"""
+
+    def __init__(self, journal_file=JOURNAL_FILE, compact_bytes=JOURNAL_COMPACT_BYTES):
+        self.journal_file = Path(journal_file)
+        self.compact_bytes = compact_bytes
+        self.dropped_records = 0
+        self.compactions = 0
+
+    def load(self):
+        data = load_data()
+        return apply_changes(data, self._read_journal())
+
+    def replay(self):
+        return self._read_journal()
+
+    def _read_journal(self):
+        """Читает журнал; оборванная или испорченная запись в конце отбрасывается"""
+        if not self.journal_file.exists():
+            return []
+        changes = []
+        good_offset = 0
+        with open(self.journal_file, 'rb') as f:
+            for line in f:
+                try:
+                    if not line.endswith(b"\n"):
+                        raise ValueError("оборванная запись")
+                    crc, payload = line[:-1].split(b" ", 1)
+                    if int(crc, 16) != zlib.crc32(payload):
+                        raise ValueError("неверная контрольная сумма")
+                    changes.append(json.loads(payload))
+                except ValueError:
+                    self.dropped_records += 1
+                    break
+                good_offset += len(line)
+        if self.dropped_records:
+            # Обрезаем хвост, чтобы новые записи не склеились с обрывком
+            with open(self.journal_file, 'r+b') as f:
+                f.truncate(good_offset)
+        return changes
+
+    def write(self, data, changes):
+        if changes is None:
+            return self.compact(data)
+        ensure_data_dir()
+        lines = []
+        for change in changes:
+            payload = json.dumps(change, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+            lines.append(b"%08x %s\n" % (zlib.crc32(payload), payload))
+        try:
+            with open(self.journal_file, 'ab') as f:
+                f.write(b"".join(lines))
+                size = f.tell()
+        except IOError:
+            return False
+        if size > self.compact_bytes:
+            return self.compact(data)
+        return True
+
+    def compact(self, data, fmt=None):
+        """Сворачивает журнал в свежий снимок (fmt — формат снимка, по умолчанию MYTASKS_FORMAT)"""
+        if not save_data(data, fmt):
+            return False
+        try:
+            with open(self.journal_file, 'wb'):
+                pass
+        except IOError:
+            return False
+        self.compactions += 1
+        return True
+
+
+def create_storage(mode=None):
+    """Создаёт хранилище по имени режима"""
+    mode = mode or STORAGE_MODE
+    if mode == "journal":
+        return JournalStorage()
+    if mode == "sqlite":
+        from module.sqlite_storage import SqliteStorage
+        return SqliteStorage()
+    if mode == "shards":
+        from module.sharded_storage import ShardedStorage
+        return ShardedStorage()
+    return JsonStorage()
+
+
+class SaveQueue:
+    """Отложенная запись: копит запросы на сохранение и пишет один раз после паузы"""
+
+    def __init__(self, writer, delay=SAVE_DELAY, max_delay=SAVE_MAX_DELAY):
+        self._writer = writer
+        self.delay = delay
+        self.max_delay = max_delay
+        self._cond = threading.Condition()
+        self._write_lock = threading.Lock()
+        self._dirty = False
+        self._full = False
+        self._pending = []
+        self._closed = False
+        self._held = 0
+        self._deadline = 0.0
+        self._first_dirty = 0.0
+        self._thread = None
+        # Метрики
+        self.saves_requested = 0
+        self.writes_performed = 0
+        self.writes_deferred = 0
+        self.write_errors = 0
+        self.last_write_ms = 0.0
+
+    def request(self, change=None):
+        """Помечает данные изменёнными и откладывает запись до паузы.
+
+        change — запись об изменении; без неё при записи сохраняется снимок целиком.
+        """
+        with self._cond:
+            self.saves_requested += 1
+            if change is None:
+                self._full = True
+            else:
+                self._pending.append(change)
+            now = time.monotonic()
+            if not self._dirty:
+                self._dirty = True
+                self._first_dirty = now
+            self._deadline = min(now + self.delay, self._first_dirty + self.max_delay)
+            if self._thread is None and not self._closed:
+                self._thread = threading.Thread(target=self._run, name="SaveQueue", daemon=True)
+                self._thread.start()
+            self._cond.notify()
+
+    def _run(self):
+        """Фоновый поток: ждёт паузу после последнего запроса и пишет"""
+        while True:
+            with self._cond:
+                while (not self._dirty or self._held) and not self._closed:
+                    self._cond.wait()
+                if self._closed:
+                    return
+                remaining = self._deadline - time.monotonic()
+                if remaining > 0:
+                    self._cond.wait(remaining)
+                    continue
+            self.flush()
+
+    def flush(self):
+        """Немедленно записывает данные, если есть несохранённые изменения"""
+        with self._write_lock:
+            with self._cond:
+                if not self._dirty:
+                    return True
+                changes = None if self._full else self._pending
+                self._dirty = False
+                self._full = False
+                self._pending = []
+            started = time.perf_counter()
+            try:
+                ok = self._writer(changes)
+            except RuntimeError:
+                # Данные поменялись во время сериализации — повторим позже снимком
+                with self._cond:
+                    self._dirty = True
+                    self._full = True
+                    self._deadline = time.monotonic() + self.delay
+                    self._cond.notify()
+                return False
+            if ok is DEFERRED:
+                # Хранилище ещё загружается: изменения возвращаются в очередь без потерь
+                self.writes_deferred += 1
+                with self._cond:
+                    self._dirty = True
+                    if changes is None:
+                        self._full = True
+                    else:
+                        self._pending[:0] = changes
+                    self._deadline = time.monotonic() + self.delay
+                return ok
+            self.last_write_ms = (time.perf_counter() - started) * 1000
+            if ok:
+                self.writes_performed += 1
+            else:
+                self.write_errors += 1
+                # Записи изменений потеряны для журнала — при следующей попытке пишем снимок
+                with self._cond:
+                    self._dirty = True
+                    self._full = True
+                    self._first_dirty = time.monotonic()
+                    self._deadline = self._first_dirty + self.max_delay
+            return ok
+
+    @contextmanager
+    def hold(self):
+        """Откладывает фоновую запись до выхода из блока: пакет изменений пишется один раз"""
+        with self._cond:
+            self._held += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._held -= 1
+                self._cond.notify()
+
+    def close(self):
+        """Записывает остаток и останавливает фоновый поток"""
+        self.flush()
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+
+    @property
+    def dirty(self):
+        return self._dirty
+
+    def stats(self):
+        """Метрики очереди: сколько сохранений запрошено и сколько записей сделано.
+
+        writes_deferred — записи, отложенные до конца загрузки; write_errors — только сбои записи.
+        """
+        return {
+            "saves_requested": self.saves_requested,
+            "writes_performed": self.writes_performed,
+            "writes_deferred": self.writes_deferred,
+            "coalesced": max(0, self.saves_requested - self.writes_performed - self.write_errors),
+            "write_errors": self.write_errors,
+            "last_write_ms": round(self.last_write_ms, 3),
+            "pending": self._dirty,
+        }
+
+
+class QuadrantIndex:
+    """Незавершённые задачи по квадрантам матрицы Эйзенхауэра (коэффициент 1–4).
+
+    Обновляется за O(1) при каждом изменении задачи; подписчики получают
+    callback(moves) — список (task_id, old_quadrant, new_quadrant), где None — «не в матрице».
+    callback(None) означает, что индекс перестроен целиком.
+    """
+    QUADRANTS = (1, 2, 3, 4)
+
+    def __init__(self):
+        self.quadrants = {q: {} for q in self.QUADRANTS}
+        self._where = {}
+        self._listeners = []
+
+    @classmethod
+    def quadrant_of(cls, task):
+        if task.get("completed", False):
+            return None
+        coefficient = task.get("coefficient", 1)
+        return coefficient if coefficient in cls.QUADRANTS else None
+
+    def rebuild(self, tasks):
+        self.quadrants = {q: {} for q in self.QUADRANTS}
+        self._where = {}
+        for task in tasks:
+            quadrant = self.quadrant_of(task)
+            if quadrant is not None:
+                self.quadrants[quadrant][task["id"]] = task
+                self._where[task["id"]] = quadrant
+        self._notify(None)
+
+    def place(self, task):
+        """Переносит задачу в квадрант по её текущим коэффициенту и статусу"""
+        self._notify([self._move(task)])
+
+    def place_many(self, tasks):
+        """Расставляет пачку задач (порция загрузки, импорт) с одним уведомлением"""
+        moves = [self._move(task) for task in tasks]
+        if moves:
+            self._notify(moves)
+
+    def _move(self, task):
+        task_id = task["id"]
+        old = self._where.get(task_id)
+        new = self.quadrant_of(task)
+        if old != new:
+            if old is not None:
+                del self.quadrants[old][task_id]
+                del self._where[task_id]
+            if new is not None:
+                self.quadrants[new][task_id] = task
+                self._where[task_id] = new
+        return task_id, old, new
+
+    def remove(self, task_id):
+        old = self._where.pop(task_id, None)
+        if old is not None:
+            del self.quadrants[old][task_id]
+            self._notify([(task_id, old, None)])
+
+    def tasks(self, quadrant):
+        return list(self.quadrants[quadrant].values())
+
+    def subscribe(self, callback):
+        """Подписка на перемещения задач; возвращает функцию отписки"""
+        self._listeners.append(callback)
+        return lambda: self._listeners.remove(callback) if callback in self._listeners else None
+
+    def _notify(self, moves):
+        for callback in list(self._listeners):
+            callback(moves)
+
+
+class SessionHistory:
+    """История завершённых сессий помодоро: одна компактная JSON-строка на сессию.
+
+    Файл только дописывается, поэтому запись сессии не трогает задачи и привычки.
+    """
+    def __init__(self, path=POMODORO_HISTORY_FILE):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+
+    def append(self, session):
+        line = json.dumps(session, ensure_ascii=False, separators=(",", ":")) + "\n"
+        with self._lock:
+            self.path.parent.mkdir(exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line)
+
+    def load(self, since=None):
+        """Сессии по порядку (с началом не раньше since); битые строки пропускаются"""
+        if not self.path.exists():
+            return []
+        sessions = []
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    session = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                if since is None or session.get("start", 0) >= since:
+                    sessions.append(session)
+        return sessions
+
+
+class DataManager:
+    """Класс для управления данными приложения.
+
+    Хранит индексы id → запись для задач, подзадач и привычек, поэтому
+    get_*/update_*/delete_* работают без полного прохода по спискам.
+    """
+    def __init__(self, save_delay=SAVE_DELAY, storage=None, load=True):
+        """load=False — данные не читаются сразу, а загружаются по частям через stream_load()"""
+        self.storage = storage or create_storage()
+        if load:
+            with span("storage.load"):
+                self.data = self.storage.load()
+        else:
+            self.data = {"tasks": [], "habits": [], "theme": "light"}
+        # Задачи и привычки в памяти — компактные модели (module/models.py)
+        adopt(self.data)
+        self._rebuild_indexes()
+        # Номер ревизии растёт с каждым изменением; журнал хранит последние изменения
+        self.revision = 0
+        self._change_log = deque(maxlen=CHANGE_LOG_SIZE)
+        self.events = EventBus()
+        # Отмена и повтор: обратные команды вместо копий данных
+        self.history = UndoHistory(self)
+        self.pomodoro_history = SessionHistory()
+        from module.archive_store import ArchiveStore
+        self.archive = ArchiveStore()
+        self.save_queue = SaveQueue(self._write, delay=save_delay)
+        # Сколько потоковых загрузок идёт сейчас: пока список дочитан не до конца, его не пишем
+        self._loading = 0
+        self._loading_lock = threading.Lock()
+        atexit.register(self.close)
+
+    def _write(self, changes):
+        """Запись накопленных изменений (вызывается SaveQueue в фоне)"""
+        if self._loading:
+            # Снимок из недочитанных данных затёр бы непрочитанный остаток —
+            # SaveQueue повторит запись после загрузки
+            return DEFERRED
+        with span("storage.write"):
+            return self.storage.write(self.data, changes)
+
+    def _rebuild_indexes(self):
+        """Строит индексы по текущим данным"""
+        tasks = self.data["tasks"]
+        self._tasks_by_id = {t["id"]: t for t in tasks}
+        self._subtasks_by_id = {
+            (t["id"], st["id"]): st for t in tasks for st in t.get("subtasks", [])
+        }
+        self._habits_by_id = {h["id"]: h for h in self.data["habits"]}
+        if not hasattr(self, "quadrants"):
+            self.quadrants = QuadrantIndex()
+            self.habit_stats = HabitStatsIndex()
+        self.quadrants.rebuild(tasks)
+        self.habit_stats.rebuild(self.data["habits"])
+
+    def get_data(self):
+        return self.data
+
+    def stream_load(self, chunk_size=LOAD_CHUNK, shards=None):
+        """Загружает данные по частям (генератор для DataManager(load=False)).
+
+        Сначала приходят маленькие разделы (theme, pomodoro), затем привычки и задачи
+        порциями по chunk_size. После каждой части отдаётся (ключ, доля прочитанного).
+        Задачи порции сразу попадают в индексы, подписчики получают событие tasks_loaded.
+        shards — какие разделы читать (хранилище по разделам); остальные догружает ensure_loaded().
+        """
+        with self._loading_lock:
+            self._loading += 1
+        try:
+            # Фоновая запись ждёт конца загрузки: правки, сделанные по ходу, пишутся потом целиком
+            with self.save_queue.hold():
+                yield from self._stream_parts(chunk_size, shards)
+        finally:
+            with self._loading_lock:
+                self._loading -= 1
+
+    def _stream_parts(self, chunk_size, shards):
+        """Части из хранилища: разбор порций, при повреждении — пустые списки, затем журнал"""
+        stream = getattr(self.storage, "stream", None)
+        parts = stream(chunk_size, shards) if stream else iter_sections(self.storage.load(), chunk_size)
+        streamed = set()
+        try:
+            with span("storage.stream"):
+                for key, value, progress in parts:
+                    streamed.add(key)
+                    if key == "tasks":
+                        self._load_tasks(value)
+                    elif key == "habits":
+                        self._load_habits(value)
+                    else:
+                        self.data[key] = value
+                    yield key, progress
+        except (ValueError, IOError, msgpack.UnpackException):
+            # Снимок повреждён — как и load_data(), недочитанные списки начинаются с пустых;
+            # разделы, прочитанные раньше, не трогаются
+            for key in streamed & set(STREAMED_KEYS):
+                self.data[key] = []
+            self._rebuild_indexes()
+            self.events.publish(Event(DATA_REPLACED, None))
+            yield "tasks", 1.0
+            return
+        changes = self.storage.replay() if hasattr(self.storage, "replay") else []
+        if changes:
+            # Журнал поверх снимка: записи применяются к словарям, затем всё снова переводится в модели
+            apply_changes(self.data, [to_plain(change) for change in changes])
+            adopt(self.data)
+            self._rebuild_indexes()
+            self.revision += 1
+            self._change_log.append((self.revision, None))
+            self.events.publish(Event(DATA_REPLACED, None))
+
+    def unloaded_shards(self):
+        """Разделы хранилища, которые ещё не прочитаны"""
+        unloaded = getattr(self.storage, "unloaded_shards", None)
+        return unloaded() if unloaded else ()
+
+    def ensure_loaded(self, *shards):
+        """Догружает нужные разделы (например, привычки при первом открытии их вкладки)"""
+        pending = self.unloaded_shards()
+        missing = [shard for shard in shards if shard in pending]
+        if missing:
+            for _ in self.stream_load(shards=missing):
+                pass
+
+    def _load_tasks(self, items):
+        if not items:
+            return
+        tasks = [Task.from_dict(task) for task in items]
+        self.data["tasks"].extend(tasks)
+        for task in tasks:
+            task_id = task["id"]
+            self._tasks_by_id[task_id] = task
+            for st in task.get("subtasks", []):
+                self._subtasks_by_id[(task_id, st["id"])] = st
+        # Матрица получает всю порцию одним уведомлением
+        self.quadrants.place_many(tasks)
+        # Загрузка — не изменение: в хранилище ничего не пишется, но скрытые страницы
+        # при показе перестраиваются целиком
+        self.revision += 1
+        self._change_log.append((self.revision, None))
+        change = {"op": TASKS_LOADED, "ids": [task["id"] for task in tasks]}
+        self.events.publish(Event(TASKS_LOADED, change))
+
+    def _load_habits(self, items):
+        habits = [Habit.from_dict(habit) for habit in items]
+        self.data["habits"].extend(habits)
+        for habit in habits:
+            self._habits_by_id[habit["id"]] = habit
+            self.habit_stats.place(habit)
+        self.revision += 1
+        self._change_log.append((self.revision, None))
+        if habits:
+            self.events.publish(Event(DATA_REPLACED, None))
+
+    def save(self, change=None):
+        """Планирует фоновую запись; серия вызовов сливается в одну запись.
+
+        change — запись вида {"op": "task_updated", "id": ..., "fields": {...}};
+        журнальное хранилище дописывает только её, а не весь файл.
+        """
+        if change is not None:
+            # Копия в словарях: запись не меняется вместе с моделями и сразу готова для JSON
+            change = to_plain(change)
+        self.revision += 1
+        self._change_log.append((self.revision, change))
+        self.save_queue.request(change)
+        self.events.publish(Event(event_type(change), change))
+
+    def subscribe(self, handler, *types):
+        """Подписка на события изменений; возвращает функцию отписки"""
+        return self.events.subscribe(handler, *types)
+
+    def batch(self):
+        """Группирует события нескольких изменений в одну доставку"""
+        return self.events.batch()
+
+    @contextmanager
+    def transaction(self):
+        """Пакет изменений: одна доставка событий, одна фоновая запись и один шаг отмены"""
+        with self.save_queue.hold(), self.events.batch(), self.history.group():
+            yield
+
+    def changes_since(self, revision):
+        """Изменения после указанной ревизии или None, если их уже не восстановить"""
+        if revision == self.revision:
+            return []
+        if not self._change_log or self._change_log[0][0] > revision + 1:
+            return None
+        changes = []
+        for change_revision, change in self._change_log:
+            if change_revision <= revision:
+                continue
+            if change is None:
+                return None
+            changes.append(change)
+        return changes
+
+    def flush(self):
+        """Сохраняет данные немедленно"""
+        return self.save_queue.flush()
+
+    def close(self):
+        """Сохраняет несохранённое при закрытии приложения"""
+        self.save_queue.close()
+        self.storage.close()
+
+    def update_data(self, new_data):
+        for key, value in new_data.items():
+            self.set_value(key, value)
+
+    def set_value(self, key, value):
+        """Меняет значение верхнего уровня (theme, pomodoro, ...)"""
+        self.ensure_loaded(key)
+        # Состояние таймера помодоро — не действие пользователя, его не отменяют;
+        # ключ, которого ещё не было, вернуть «как было» нечем
+        if key not in UNDO_SKIP_KEYS and key in self.data and self.data[key] != value:
+            self.history.record(command("set_value", key, self.data[key]), command("set_value", key, value),
+                                ("set", key))
+        if key == "tasks":
+            value = [Task.from_dict(task) for task in value]
+        elif key == "habits":
+            value = [Habit.from_dict(habit) for habit in value]
+        self.data[key] = value
+        if key in ("tasks", "habits"):
+            self._rebuild_indexes()
+        self.save({"op": "set", "key": key, "value": value})
+
+    def log_pomodoro_session(self, kind, start, end, task_id=None):
+        """Дописывает завершённую сессию помодоро в историю"""
+        session = {"start": int(start), "end": int(end), "kind": kind, "task_id": task_id}
+        self.pomodoro_history.append(session)
+        self.events.publish(Event(POMODORO_SESSION, session))
+        return session
+
+    # Задачи
+
+    def get_task(self, task_id):
+        return self._tasks_by_id.get(task_id)
+
+    def add_task(self, task, index=None):
+        """Добавляет задачу в конец списка или на место index (отмена удаления)"""
+        self.ensure_loaded("tasks")
+        task = Task.from_dict(task)
+        task.setdefault("subtasks", [])
+        change = {"op": "task_added", "task": task}
+        insert_record(self.data["tasks"], task, index, change)
+        self._tasks_by_id[task["id"]] = task
+        for st in task["subtasks"]:
+            self._subtasks_by_id[(task["id"], st["id"])] = st
+        self.quadrants.place(task)
+        self.history.record(command("delete_task", task["id"]), command("add_task", task))
+        self.save(change)
+        return task
+
+    def add_tasks(self, tasks, indexes=None):
+        """Добавляет пачку задач (импорт): индексы пополняются разом, события приходят одним списком.
+
+        indexes — места задач в итоговом списке по возрастанию (отмена пакетного удаления).
+        """
+        self.ensure_loaded("tasks")
+        tasks = [Task.from_dict(task) for task in tasks]
+        task_list = self.data["tasks"]
+        if indexes is None:
+            task_list.extend(tasks)
+        else:
+            # Слияние за один проход вместо вставки по одной
+            rest = iter(task_list)
+            merged = []
+            for index, task in zip(indexes, tasks):
+                merged.extend(itertools.islice(rest, index - len(merged)))
+                merged.append(task)
+            merged.extend(rest)
+            task_list[:] = merged
+        # Возвращённые на места задачи записываются с конца: у каждой "before" уже на месте
+        order = range(len(tasks)) if indexes is None else range(len(tasks) - 1, -1, -1)
+        with self.transaction():
+            for number in order:
+                task = tasks[number]
+                task_id = task["id"]
+                self._tasks_by_id[task_id] = task
+                for st in task.setdefault("subtasks", []):
+                    self._subtasks_by_id[(task_id, st["id"])] = st
+                change = {"op": "task_added", "task": task}
+                if indexes is not None and indexes[number] + 1 < len(task_list):
+                    change["before"] = task_list[indexes[number] + 1]["id"]
+                self.save(change)
+            self.quadrants.place_many(tasks)
+            self.history.record(command("delete_tasks", [task["id"] for task in tasks]),
+                                command("add_tasks", tasks, indexes))
+        return tasks
+
+    def update_task(self, task_id, **fields):
+        task = self._tasks_by_id.get(task_id)
+        if task is None:
+            return None
+        if "completed" in fields and "completed_at" not in fields:
+            # Время выполнения нужно для аналитики по дням
+            fields["completed_at"] = int(time.time()) if fields["completed"] else None
+        old = {key: task.get(key) for key in fields}
+        if old != fields:
+            self.history.record(command("update_task", task_id, **old), command("update_task", task_id, **fields),
+                                ("task_updated", task_id, *sorted(fields)))
+        task.update(fields)
+        if {"completed", "coefficient", "title"} & fields.keys():
+            self.quadrants.place(task)
+        self.save({"op": "task_updated", "id": task_id, "fields": fields})
+        return task
+
+    def delete_task(self, task_id):
+        task = self._tasks_by_id.pop(task_id, None)
+        if task is None:
+            return None
+        for st in task.get("subtasks", []):
+            self._subtasks_by_id.pop((task_id, st["id"]), None)
+        index = remove_record(self.data["tasks"], task)
+        self.quadrants.remove(task_id)
+        # Отмена вернёт ту же модель на то же место — копия задачи не нужна
+        self.history.record(command("add_task", task, index), command("delete_task", task_id))
+        self.save({"op": "task_removed", "id": task_id})
+        return task
+
+    def delete_tasks(self, task_ids):
+        """Удаляет несколько задач одним проходом по списку; возвращает удалённые"""
+        removed = [self._tasks_by_id[i] for i in dict.fromkeys(task_ids) if i in self._tasks_by_id]
+        if not removed:
+            return []
+        gone = {task["id"] for task in removed}
+        tasks = self.data["tasks"]
+        indexes = [index for index, task in enumerate(tasks) if task["id"] in gone]
+        removed = [tasks[index] for index in indexes]
+        tasks[:] = [task for task in tasks if task["id"] not in gone]
+        with self.transaction():
+            self.history.record(command("add_tasks", removed, indexes), command("delete_tasks", list(gone)))
+            for task in removed:
+                task_id = task["id"]
+                del self._tasks_by_id[task_id]
+                for st in task.get("subtasks", []):
+                    self._subtasks_by_id.pop((task_id, st["id"]), None)
+                self.quadrants.remove(task_id)
+                self.save({"op": "task_removed", "id": task_id})
+        return removed
+
+    def archive_completed(self, days=None, now=None):
+        """Переносит в архив задачи, выполненные больше days дней назад; возвращает их число.
+
+        days по умолчанию — настройка archive_days (или MYTASKS_ARCHIVE_DAYS), 0 — не архивировать.
+        Задачи сначала дописываются в архив, затем удаляются из рабочего списка одной записью.
+        """
+        from module.archive_store import ARCHIVE_AFTER_DAYS
+        if days is None:
+            days = int(self.data.get("archive_days", ARCHIVE_AFTER_DAYS))
+        if days <= 0:
+            return 0
+        self.ensure_loaded("tasks")
+        cutoff = (time.time() if now is None else now) - days * 86400
+        tasks = self.data["tasks"]
+        # Архивируются только задачи с известным временем выполнения: у выполненных до
+        # появления completed_at возраст неизвестен, они остаются в списке
+        old = [
+            t for t in tasks
+            if t.get("completed") and t.get("completed_at") and t["completed_at"] <= cutoff
+            and t.get("restored_at", 0) <= cutoff
+        ]
+        if not old or not self.archive.append(old):
+            return 0
+        archived = [t["id"] for t in old]
+        # Архивирование не отменяется: задачи не должны оказаться и в архиве, и в списке
+        with self.history.suspended(), self.transaction():
+            self.delete_tasks(archived)
+            self.events.publish(Event(TASKS_ARCHIVED, {"op": TASKS_ARCHIVED, "ids": archived}))
+        # Задачи уже в архиве — рабочий список записывается сразу, чтобы не остаться в двух местах
+        self.flush()
+        return len(old)
+
+    def restore_archived(self, number, task):
+        """Возвращает задачу из сегмента архива number в рабочий список"""
+        if self._tasks_by_id.get(task["id"]) is not None:
+            return None
+        with self.history.suspended():
+            restored = self.add_task(dict(task, restored_at=int(time.time())))
+        # Сначала задача записывается в рабочий список, потом помечается в архиве:
+        # при сбое между шагами она окажется в двух местах, но не потеряется
+        self.flush()
+        self.archive.restore(number, task)
+        return restored
+
+    # Подзадачи
+
+    def get_subtask(self, task_id, subtask_id):
+        return self._subtasks_by_id.get((task_id, subtask_id))
+
+    def add_subtask(self, task_id, subtask, index=None):
+        task = self._tasks_by_id.get(task_id)
+        if task is None:
+            return None
+        subtask = Subtask.from_dict(subtask)
+        change = {"op": "subtask_added", "task_id": task_id, "subtask": subtask}
+        insert_record(task.setdefault("subtasks", []), subtask, index, change)
+        self._subtasks_by_id[(task_id, subtask["id"])] = subtask
+        self.history.record(command("delete_subtask", task_id, subtask["id"]),
+                            command("add_subtask", task_id, subtask))
+        self.save(change)
+        return subtask
+
+    def update_subtask(self, task_id, subtask_id, **fields):
+        subtask = self._subtasks_by_id.get((task_id, subtask_id))
+        if subtask is None:
+            return None
+        old = {key: subtask.get(key) for key in fields}
+        if old != fields:
+            self.history.record(command("update_subtask", task_id, subtask_id, **old),
+                                command("update_subtask", task_id, subtask_id, **fields),
+                                ("subtask_updated", task_id, subtask_id, *sorted(fields)))
+        subtask.update(fields)
+        self.save({"op": "subtask_updated", "task_id": task_id, "id": subtask_id, "fields": fields})
+        return subtask
+
+    def delete_subtask(self, task_id, subtask_id):
+        subtask = self._subtasks_by_id.pop((task_id, subtask_id), None)
+        if subtask is None:
+            return None
+        index = remove_record(self._tasks_by_id[task_id]["subtasks"], subtask)
+        self.history.record(command("add_subtask", task_id, subtask, index),
+                            command("delete_subtask", task_id, subtask_id))
+        self.save({"op": "subtask_removed", "task_id": task_id, "id": subtask_id})
+        return subtask
+
+    # Привычки
+
+    def get_habit(self, habit_id):
+        return self._habits_by_id.get(habit_id)
+
+    def add_habit(self, habit, index=None):
+        # Новая привычка не должна записаться в раздел поверх ещё не прочитанных
+        self.ensure_loaded("habits")
+        habit = Habit.from_dict(habit)
+        change = {"op": "habit_added", "habit": habit}
+        insert_record(self.data["habits"], habit, index, change)
+        self._habits_by_id[habit["id"]] = habit
+        self.habit_stats.place(habit)
+        self.history.record(command("delete_habit", habit["id"]), command("add_habit", habit))
+        self.save(change)
+        return habit
+
+    def update_habit(self, habit_id, **fields):
+        habit = self._habits_by_id.get(habit_id)
+        if habit is None:
+            return None
+        old = {key: habit.get(key) for key in fields}
+        if old != fields:
+            self.history.record(command("update_habit", habit_id, **old), command("update_habit", habit_id, **fields),
+                                ("habit_updated", habit_id, *sorted(fields)))
+        habit.update(fields)
+        if "days" in fields:
+            self.habit_stats.place(habit)
+        self.save({"op": "habit_updated", "id": habit_id, "fields": fields})
+        return habit
+
+    def check_in_habit(self, habit_id, day=None):
+        """Отмечает выполнение привычки за день (по умолчанию сегодня).
+
+        Дни хранятся отсортированным списком порядковых номеров (date.toordinal()),
+        статистика обновляется инкрементально; в хранилище уходит одна короткая запись.
+        """
+        habit = self._habits_by_id.get(habit_id)
+        if habit is None:
+            return None
+        day = today_ordinal() if day is None else day
+        bisect.insort(habit.setdefault("days", []), day)
+        habit["count"] = habit.get("count", 0) + 1
+        self.habit_stats.check_in(habit, day)
+        self.history.record(command("uncheck_habit", habit_id, day), command("check_in_habit", habit_id, day))
+        self.save({"op": "habit_checked_in", "id": habit_id, "day": day, "count": habit["count"]})
+        return habit
+
+    def uncheck_habit(self, habit_id, day):
+        """Снимает одну отметку привычки за день (отмена check_in_habit)"""
+        habit = self._habits_by_id.get(habit_id)
+        if habit is None:
+            return None
+        days = list(habit.get("days", []))
+        index = bisect.bisect_left(days, day)
+        if index == len(days) or days[index] != day:
+            return None
+        del days[index]
+        return self.update_habit(habit_id, days=days, count=max(0, habit.get("count", 0) - 1))
+
+    def delete_habit(self, habit_id):
+        habit = self._habits_by_id.pop(habit_id, None)
+        if habit is None:
+            return None
+        index = remove_record(self.data["habits"], habit)
+        self.habit_stats.remove(habit_id)
+        self.history.record(command("add_habit", habit, index), command("delete_habit", habit_id))
+        self.save({"op": "habit_removed", "id": habit_id})
+        return habit
@@ -3,42 +3,85 @@
 """
 import flet as ft
 
+from module.perf import timed
+from module.services import TaskService
+from module.ui import update_controls
+
+# Скрытых элементов в квадранте, после которых список точно сжимается
+COMPACT_MIN_HIDDEN = 50
+
 
 def create_eisenhower_matrix_page(page, data_manager):
     """Создает страницу матрицы Эйзенхауэра"""
     
+    tasks = TaskService(data_manager)
+    quadrants = data_manager.quadrants
+    # Элементы матрицы по id задачи и их места в списке квадранта
+    items = {}
+    positions = {}
+    # Элементы ушедших задач не вырезаются из списка, а скрываются (без сдвига мест);
+    # список квадранта сжимается, когда скрытых становится больше половины
+    hidden = {}
+    
+    @timed("matrix.refresh_matrix")
     def refresh_matrix():
-        """Обновляет матрицу на основе текущих задач"""
-        # Загружаем задачи
-        tasks = data_manager.get_data().get("tasks", [])
-        
-        # Группируем задачи по коэффициентам (1-4)
-        quadrant_1 = [t for t in tasks if t.get("coefficient", 1) == 1 and not t.get("completed", False)]
-        quadrant_2 = [t for t in tasks if t.get("coefficient", 1) == 2 and not t.get("completed", False)]
-        quadrant_3 = [t for t in tasks if t.get("coefficient", 1) == 3 and not t.get("completed", False)]
-        quadrant_4 = [t for t in tasks if t.get("coefficient", 1) == 4 and not t.get("completed", False)]
-        
-        # Очищаем контейнеры
-        q1_list.controls.clear()
-        q2_list.controls.clear()
-        q3_list.controls.clear()
-        q4_list.controls.clear()
-        
-        # Заполняем квадранты
-        for task in quadrant_1:
-            q1_list.controls.append(create_task_item(task))
-        for task in quadrant_2:
-            q2_list.controls.append(create_task_item(task))
-        for task in quadrant_3:
-            q3_list.controls.append(create_task_item(task))
-        for task in quadrant_4:
-            q4_list.controls.append(create_task_item(task))
-        
-        page.update()
+        """Строит матрицу целиком по индексу квадрантов (без прохода по всем задачам)"""
+        items.clear()
+        positions.clear()
+        for quadrant, q_list in q_lists.items():
+            q_list.controls.clear()
+            hidden[quadrant] = 0
+            for task in quadrants.tasks(quadrant):
+                add_item(quadrant, task)
+        update_controls(*q_lists.values())
+    
+    def add_item(quadrant, task):
+        item = create_task_item(task)
+        controls = q_lists[quadrant].controls
+        items[task["id"]] = item
+        positions[task["id"]] = len(controls)
+        controls.append(item)
+    
+    def compact(quadrant):
+        """Убирает скрытые элементы и пересчитывает места (амортизированно O(1) на удаление)"""
+        controls = [c for c in q_lists[quadrant].controls if c.visible]
+        q_lists[quadrant].controls = controls
+        for index, control in enumerate(controls):
+            positions[control.data] = index
+        hidden[quadrant] = 0
+    
+    @timed("matrix.on_quadrant_change")
+    def on_quadrant_change(moves):
+        """Переносит элементы между квадрантами; места элементов берутся из positions"""
+        if moves is None:
+            refresh_matrix()
+            return
+        changed = {}
+        for task_id, old_quadrant, new_quadrant in moves:
+            item = items.pop(task_id, None)
+            index = positions.pop(task_id, None)
+            if item is not None and old_quadrant is not None:
+                if new_quadrant == old_quadrant:
+                    # Задача осталась в квадранте — элемент обновляется на прежнем месте
+                    items[task_id] = q_lists[old_quadrant].controls[index] = create_task_item(tasks.get(task_id))
+                    positions[task_id] = index
+                    changed[old_quadrant] = q_lists[old_quadrant]
+                    continue
+                item.visible = False
+                hidden[old_quadrant] += 1
+                changed[old_quadrant] = q_lists[old_quadrant]
+            if new_quadrant is not None:
+                add_item(new_quadrant, tasks.get(task_id))
+                changed[new_quadrant] = q_lists[new_quadrant]
+        for quadrant in changed:
+            if hidden[quadrant] > max(COMPACT_MIN_HIDDEN, len(q_lists[quadrant].controls) // 2):
+                compact(quadrant)
+        update_controls(*changed.values())
     
     def create_task_item(task):
         """Создает элемент задачи для отображения в квадранте"""
         return ft.Container(
+            data=task["id"],
             content=ft.Text(
                 task.get("title", ""),
                 size=12,
@@ -79,6 +122,7 @@ def create_eisenhower_matrix_page(page, data_manager):
         spacing=5,
         expand=True
     )
+    q_lists = {1: q1_list, 2: q2_list, 3: q3_list, 4: q4_list}
     
     # Квадрант 1: Срочно и важно
     quadrant_1 = ft.Container(
@@ -172,20 +216,13 @@ def create_eisenhower_matrix_page(page, data_manager):
         # width=300
     )
     
-    # Кнопка обновления
-    refresh_button = ft.ElevatedButton(
-        "Обновить матрицу",
-        icon=ft.Icons.REFRESH,
-        on_click=lambda e: refresh_matrix()
-    )
-    
-    # Инициализация матрицы
+    # Инициализация матрицы и подписка на живые изменения задач
     refresh_matrix()
+    unsubscribe = quadrants.subscribe(on_quadrant_change)
     
-    return ft.Container(
+    view = ft.Container(
         content=ft.Column([
             title,
-            refresh_button,
             ft.Row([
                 ft.Container(
                     content=ft.Column([
@@ -208,3 +245,5 @@ def create_eisenhower_matrix_page(page, data_manager):
         padding=20,
         expand=True
     )
+    view.on_dispose = unsubscribe
+    return view
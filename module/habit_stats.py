@@ -0,0 +1,107 @@
+"""
+Статистика привычек: серии и доля выполнения, обновляемые при каждой отметке
+"""
+from collections import deque
+from datetime import date
+
+WEEK_DAYS = 7
+MONTH_DAYS = 30
+
+
+def today_ordinal():
+    """Сегодняшний день как порядковый номер (date.toordinal())"""
+    return date.today().toordinal()
+
+
+class HabitStats:
+    """Статистика одной привычки по отсортированному списку дней отметок.
+
+    Отметка за последний отмеченный день или позже обновляет всё за O(1);
+    отметка задним числом требует перестройки по списку дней.
+    """
+    __slots__ = ("total", "last_day", "run", "longest", "_recent")
+
+    def __init__(self, days=()):
+        self.total = 0
+        self.last_day = None
+        self.run = 0  # длина серии, заканчивающейся last_day
+        self.longest = 0
+        self._recent = deque()  # различные дни за последние MONTH_DAYS
+        for day in days:
+            self.add(day)
+
+    def add(self, day):
+        """Учитывает отметку; False — день раньше последнего (нужна перестройка)"""
+        if self.last_day is not None and day < self.last_day:
+            return False
+        self.total += 1
+        if day != self.last_day:
+            self.run = self.run + 1 if self.last_day == day - 1 else 1
+            self.longest = max(self.longest, self.run)
+            self.last_day = day
+            self._recent.append(day)
+            self._trim(day)
+        return True
+
+    def _trim(self, today):
+        while self._recent and self._recent[0] <= today - MONTH_DAYS:
+            self._recent.popleft()
+
+    def current_streak(self, today=None):
+        """Текущая серия: не прервана, если последняя отметка сегодня или вчера"""
+        today = today if today is not None else today_ordinal()
+        if self.last_day is None or self.last_day < today - 1:
+            return 0
+        return self.run
+
+    def rate(self, days, today=None):
+        """Доля дней с отметкой за последние days дней (days <= MONTH_DAYS)"""
+        today = today if today is not None else today_ordinal()
+        self._trim(today)
+        done = 0
+        for day in reversed(self._recent):
+            if day <= today - days:
+                break
+            if day <= today:
+                done += 1
+        return done / days
+
+    def last_done(self):
+        return date.fromordinal(self.last_day) if self.last_day is not None else None
+
+    def summary(self, today=None):
+        today = today if today is not None else today_ordinal()
+        return {
+            "total": self.total,
+            "current_streak": self.current_streak(today),
+            "longest_streak": self.longest,
+            "week_rate": self.rate(WEEK_DAYS, today),
+            "month_rate": self.rate(MONTH_DAYS, today),
+            "last_done": self.last_done(),
+        }
+
+
+class HabitStatsIndex:
+    """Статистика всех привычек по id, поддерживаемая при каждой отметке"""
+
+    def __init__(self):
+        self._stats = {}
+
+    def rebuild(self, habits):
+        self._stats = {h["id"]: HabitStats(h.get("days", ())) for h in habits}
+
+    def place(self, habit):
+        """(Пере)строит статистику привычки по её списку дней"""
+        self._stats[habit["id"]] = HabitStats(habit.get("days", ()))
+
+    def remove(self, habit_id):
+        self._stats.pop(habit_id, None)
+
+    def check_in(self, habit, day):
+        """Учитывает отметку (список дней привычки уже содержит day)"""
+        stats = self._stats.get(habit["id"])
+        if stats is None or not stats.add(day):
+            self.place(habit)
+
+    def get(self, habit_id):
+        return self._stats.get(habit_id) or HabitStats()
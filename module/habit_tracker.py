@@ -2,56 +2,63 @@
 Модуль трекера привычек
 """
 import flet as ft
-import uuid
+
+from module.data_manager import DATA_REPLACED, HABIT_CHECKED_IN, HABIT_EVENTS, HABIT_UPDATED
+from module.perf import timed
+from module.services import HabitService
+from module.ui import update_controls
 
 
 def create_habit_tracker_page(page, data_manager):
     """Создает страницу трекера привычек"""
+    habits = HabitService(data_manager)
     
-    # Загрузка привычек из данных (используем список для обновления)
-    habits_data = data_manager.get_data().get("habits", [])
-    habits_data = list(habits_data)  # Создаем копию для работы
-    
-    # Контейнер для списка привычек
+    # Контейнер для списка привычек и строки привычек по id
     habits_list = ft.Column(
         scroll=ft.ScrollMode.AUTO,
         spacing=10,
         expand=True
     )
+    rows = {}
     
+    @timed("habits.refresh_habits_list")
     def refresh_habits_list():
-        """Обновляет список привычек"""
-        # Обновляем данные из менеджера
-        habits_data.clear()
-        habits_data.extend(data_manager.get_data().get("habits", []))
-        
-        habits_list.controls.clear()
-        
-        for habit in habits_data:
-            habit_row = create_habit_row(habit, data_manager, refresh_habits_list, page)
-            habits_list.controls.append(habit_row)
+        """Сверяет строки с привычками: новые строки создаются только для новых привычек"""
+        new_rows = {}
+        for habit in habits.all():
+            row = rows.get(habit["id"])
+            if row is None:
+                row = create_habit_row(habit, habits, page)
+            else:
+                row.refresh_row()
+            new_rows[habit["id"]] = row
+        rows.clear()
+        rows.update(new_rows)
+        habits_list.controls = list(rows.values())
+    
+    @timed("habits.on_habit_events")
+    def on_habit_events(events):
+        """Обновляет только строки изменившихся привычек"""
+        if all(e.type in (HABIT_UPDATED, HABIT_CHECKED_IN) for e in events):
+            changed_rows = []
+            for e in events:
+                row = rows.get(e.change["id"])
+                if row is None:
+                    continue
+                if e.type == HABIT_CHECKED_IN:
+                    # Отметка меняет только счётчик и серию
+                    row.refresh_stats()
+                elif not any(r is row for r in changed_rows):
+                    row.refresh_row()
+                    changed_rows.append(row)
+            update_controls(*changed_rows)
+        else:
+            refresh_habits_list()
+            update_controls(habits_list)
     
     def create_habit_click(e):
         """Создает новую привычку"""
-        habit_id = str(uuid.uuid4())
-        new_habit = {
-            "id": habit_id,
-            "name": "Новая привычка",
-            "count": 0
-        }
-        
-        # Добавляем напрямую в менеджер данных
-        habits = data_manager.get_data().get("habits", [])
-        habits.append(new_habit)
-        data_manager.data["habits"] = habits
-        data_manager.save()
-        
-        # Обновляем локальный список
-        habits_data.clear()
-        habits_data.extend(habits)
-        
-        refresh_habits_list()
-        page.update()
+        habits.create()
     
     # Кнопка создания привычки
     create_button = ft.ElevatedButton(
@@ -60,10 +67,11 @@ def create_habit_tracker_page(page, data_manager):
         on_click=create_habit_click
     )
     
-    # Инициализация списка привычек
+    # Инициализация списка привычек и подписка на изменения привычек
     refresh_habits_list()
+    unsubscribe = data_manager.subscribe(on_habit_events, *HABIT_EVENTS, DATA_REPLACED)
     
-    return ft.Container(
+    view = ft.Container(
         content=ft.Column([
             # Кнопка создания
             create_button,
@@ -74,43 +82,26 @@ def create_habit_tracker_page(page, data_manager):
         padding=20,
         expand=True
     )
+    view.on_dispose = unsubscribe
+    return view
 
 
-def create_habit_row(habit, data_manager, refresh_callback, page):
+def create_habit_row(habit, habits, page):
     """Создает строку привычки"""
     habit_id = habit["id"]
     name_field_ref = ft.Ref[ft.TextField]()
     
     def toggle_habit_completion(e):
-        """Обрабатывает нажатие на галочку - увеличивает счетчик"""
-        habits = data_manager.get_data().get("habits", [])
-        for h in habits:
-            if h["id"] == habit_id:
-                h["count"] = h.get("count", 0) + 1
-                break
-        data_manager.data["habits"] = habits
-        data_manager.save()
-        refresh_callback()
-        page.update()
+        """Обрабатывает нажатие на галочку - отмечает выполнение за сегодня"""
+        habits.check_in(habit_id)
     
     def update_habit_name(e):
         """Обновляет название привычки"""
-        habits = data_manager.get_data().get("habits", [])
-        for h in habits:
-            if h["id"] == habit_id:
-                h["name"] = e.control.value
-                break
-        data_manager.data["habits"] = habits
-        data_manager.save()
+        habits.rename(habit_id, e.control.value)
     
     def delete_habit(e):
         """Удаляет привычку"""
-        habits = data_manager.get_data().get("habits", [])
-        habits = [h for h in habits if h["id"] != habit_id]
-        data_manager.data["habits"] = habits
-        data_manager.save()
-        refresh_callback()
-        page.update()
+        habits.delete(habit_id)
     
     # Поле названия привычки
     name_field = ft.TextField(
@@ -137,6 +128,9 @@ def create_habit_row(habit, data_manager, refresh_callback, page):
         text_align=ft.TextAlign.CENTER
     )
     
+    # Серия и статистика выполнения
+    streak_text = ft.Text("", size=14, width=110)
+    
     # Кнопка удаления
     delete_btn = ft.IconButton(
         icon=ft.Icons.DELETE,
@@ -144,26 +138,51 @@ def create_habit_row(habit, data_manager, refresh_callback, page):
         on_click=delete_habit
     )
     
-    # Обновление счетчика при изменении данных
+    def render_stats():
+        h = habits.get(habit_id)
+        if h is None:
+            return
+        stats = habits.stats(habit_id)
+        count_text.value = str(h.get("count", 0))
+        streak_text.value = f"серия {stats['current_streak']} дн."
+        last_done = stats["last_done"]
+        streak_text.tooltip = (
+            f"Рекорд: {stats['longest_streak']} дн.\n"
+            f"За 7 дней: {stats['week_rate']:.0%}\n"
+            f"За 30 дней: {stats['month_rate']:.0%}\n"
+            f"Последний раз: {last_done.strftime('%d.%m.%Y') if last_done else '—'}"
+        )
+        # Галочка работает как кнопка: после отметки снова пустая
+        completion_checkbox.value = False
+    
+    # Обновление строки при изменении данных
     def update_count():
-        habits = data_manager.get_data().get("habits", [])
-        for h in habits:
-            if h["id"] == habit_id:
-                count_text.value = str(h.get("count", 0))
-                break
+        h = habits.get(habit_id)
+        if h is not None:
+            name_field.value = h.get("name", "")
+        render_stats()
+    
+    def refresh_stats():
+        """После отметки обновляются только счётчик, серия и галочка"""
+        render_stats()
+        update_controls(count_text, streak_text, completion_checkbox)
     
     update_count()
     
-    return ft.Card(
+    card = ft.Card(
         content=ft.Container(
             content=ft.Row([
                 name_field,
                 completion_checkbox,
                 count_text,
                 ft.Text("раз", size=14),
+                streak_text,
                 delete_btn
             ], spacing=10, vertical_alignment=ft.CrossAxisAlignment.CENTER),
             padding=15
         ),
         margin=ft.Margin(0, 0, 0, 10)
     )
+    card.refresh_row = update_count
+    card.refresh_stats = refresh_stats
+    return card
@@ -0,0 +1,172 @@
+"""
+История отмены и повтора действий.
+
+Шаг истории хранит не копию данных, а короткие команды: как отменить действие
+и как повторить его — вызовы методов DataManager с id и значениями полей.
+Удалённые записи не копируются: шаг держит ссылку на ту же модель, и отмена
+возвращает её на прежнее место. Поэтому шаг занимает сотни байт
+независимо от числа задач.
+"""
+import os
+import threading
+import time
+from collections import deque
+from itertools import chain
+from contextlib import contextmanager
+
+# Сколько шагов хранится для отмены (и для повтора)
+UNDO_LIMIT = int(os.environ.get("MYTASKS_UNDO_LIMIT", "100"))
+# Правки одного и того же поля чаще этого интервала (секунды) сливаются в один шаг
+COALESCE_SECONDS = 1.0
+
+# Название шага по методу DataManager, который его выполняет
+STEP_LABELS = {
+    "add_task": "добавление задачи",
+    "add_tasks": "добавление задач",
+    "update_task": "изменение задачи",
+    "delete_task": "удаление задачи",
+    "delete_tasks": "удаление задач",
+    "add_subtask": "добавление подзадачи",
+    "update_subtask": "изменение подзадачи",
+    "delete_subtask": "удаление подзадачи",
+    "add_habit": "добавление привычки",
+    "update_habit": "изменение привычки",
+    "check_in_habit": "отметка привычки",
+    "uncheck_habit": "снятие отметки привычки",
+    "delete_habit": "удаление привычки",
+    "set_value": "изменение настроек",
+}
+
+
+def command(name, /, *args, **fields):
+    """Команда истории: вызов метода DataManager name(*args, **fields).
+
+    Один плоский кортеж (name, число аргументов, *args, ключ, значение, ...):
+    отдельные кортежи для аргументов и пар полей заняли бы втрое больше.
+    """
+    return (name, len(args), *args, *chain.from_iterable(fields.items()))
+
+
+def run_command(data_manager, cmd):
+    """Выполняет команду command(...) над DataManager"""
+    start = 2 + cmd[1]
+    fields = cmd[start:]
+    getattr(data_manager, cmd[0])(*cmd[2:start], **dict(zip(fields[::2], fields[1::2])))
+
+
+class Step:
+    """Шаг истории: обратные команды (выполняются с конца) и прямые"""
+    __slots__ = ("label", "undo", "redo", "key", "time")
+
+    def __init__(self, label, undo, redo, key=None, at=None):
+        self.label = label
+        self.undo = undo  # [command(...), ...]; у одиночного действия — кортеж из одной команды
+        self.redo = redo
+        self.key = key  # ключ слияния: одно и то же поле одной записи
+        self.time = time.monotonic() if at is None else at
+
+
+def step_label(redo):
+    label = STEP_LABELS.get(redo[0][0], "изменение") if redo else "изменение"
+    return f"{label} ({len(redo)})" if len(redo) > 1 else label
+
+
+class UndoHistory:
+    """Ограниченные стеки отмены и повтора поверх методов DataManager"""
+
+    def __init__(self, data_manager, limit=UNDO_LIMIT):
+        self.data_manager = data_manager
+        self.undo_stack = deque(maxlen=limit)
+        self.redo_stack = deque(maxlen=limit)
+        self._lock = threading.RLock()
+        # Группа и признак воспроизведения — свои у каждого потока (импорт идёт в фоне)
+        self._local = threading.local()
+
+    def record(self, undo, redo, key=None):
+        """Записывает действие: undo и redo — команды command(...)"""
+        local = self._local
+        if getattr(local, "suspended", 0):
+            return
+        group = getattr(local, "group", None)
+        if group is not None:
+            group.undo.append(undo)
+            group.redo.append(redo)
+            return
+        with self._lock:
+            self.redo_stack.clear()
+            now = time.monotonic()
+            last = self.undo_stack[-1] if self.undo_stack else None
+            if key is not None and last is not None and last.key == key and now - last.time < COALESCE_SECONDS:
+                # Та же правка подряд: отмена ведёт к значению до первой правки, повтор — к последнему
+                last.redo = (redo,)
+                last.time = now
+                return
+            self.undo_stack.append(Step(step_label((redo,)), (undo,), (redo,), key, now))
+
+    @contextmanager
+    def group(self, label=None):
+        """Все действия внутри блока — один шаг истории"""
+        local = self._local
+        if getattr(local, "group", None) is not None or getattr(local, "suspended", 0):
+            yield
+            return
+        step = Step(label, [], [])
+        local.group = step
+        try:
+            yield
+        finally:
+            local.group = None
+            if step.undo:
+                step.label = label or step_label(step.redo)
+                with self._lock:
+                    self.redo_stack.clear()
+                    self.undo_stack.append(step)
+
+    @contextmanager
+    def suspended(self):
+        """Действия внутри блока не попадают в историю (архив, воспроизведение шагов)"""
+        local = self._local
+        local.suspended = getattr(local, "suspended", 0) + 1
+        try:
+            yield
+        finally:
+            local.suspended -= 1
+
+    def can_undo(self):
+        return bool(self.undo_stack)
+
+    def can_redo(self):
+        return bool(self.redo_stack)
+
+    def undo(self):
+        """Отменяет последний шаг; возвращает его или None"""
+        with self._lock:
+            if not self.undo_stack:
+                return None
+            step = self.undo_stack.pop()
+            self._run(reversed(step.undo))
+            self.redo_stack.append(step)
+        return step
+
+    def redo(self):
+        """Повторяет последний отменённый шаг; возвращает его или None"""
+        with self._lock:
+            if not self.redo_stack:
+                return None
+            step = self.redo_stack.pop()
+            self._run(step.redo)
+            # Повторённый шаг больше не сливается с новыми правками
+            step.key = None
+            self.undo_stack.append(step)
+        return step
+
+    def _run(self, commands):
+        data_manager = self.data_manager
+        with self.suspended(), data_manager.transaction():
+            for cmd in commands:
+                run_command(data_manager, cmd)
+
+    def clear(self):
+        with self._lock:
+            self.undo_stack.clear()
+            self.redo_stack.clear()
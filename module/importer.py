@@ -0,0 +1,342 @@
+"""
+Импорт задач из CSV, Markdown-чеклистов и JSON
+
+Файл читается потоково, задачи проверяются и получают id пачками по IMPORT_BATCH,
+а в DataManager попадают через add_tasks() — за весь импорт одна фоновая запись.
+
+Примеры:
+    python -m module.importer backlog.csv
+    python -m module.importer notes.md
+    python -m module.importer tasks.json
+"""
+import argparse
+import csv
+import json
+import os
+import re
+import time
+from pathlib import Path
+
+from module.services import normalize_coefficient
+
+# Сколько задач проверяется и добавляется за раз
+IMPORT_BATCH = 5000
+# Размер блока при чтении JSON — массива задач или снимка (символы)
+JSON_BLOCK = 1 << 20
+# Сколько сообщений об ошибках сохранять в результате
+MAX_ERRORS = 20
+
+FORMATS = {
+    ".csv": "csv",
+    ".md": "markdown",
+    ".markdown": "markdown",
+    ".txt": "markdown",
+    ".json": "json",
+}
+
+# Названия колонок CSV (в нижнем регистре) -> поле задачи
+CSV_COLUMNS = {
+    "title": "title", "название": "title", "задача": "title", "task": "title", "name": "title",
+    "description": "description", "описание": "description",
+    "completed": "completed", "done": "completed", "выполнено": "completed", "выполнена": "completed",
+    "coefficient": "coefficient", "priority": "coefficient", "приоритет": "coefficient",
+    "коэффициент": "coefficient",
+    "subtasks": "subtasks", "подзадачи": "subtasks",
+}
+TRUE_VALUES = {"1", "true", "yes", "y", "x", "да", "+", "done", "выполнено"}
+
+CHECKLIST_ITEM = re.compile(r"^(\s*)[-*+]\s+\[([ xX])\]\s*(.*)$")
+
+
+class ImportCancelled(Exception):
+    pass
+
+
+def detect_format(path):
+    fmt = FORMATS.get(Path(path).suffix.lower())
+    if fmt is None:
+        raise ValueError(f"неизвестный формат файла: {Path(path).suffix or path}")
+    return fmt
+
+
+def read_lines(path):
+    """Строки файла и доля прочитанного (по байтам)"""
+    total = max(1, os.path.getsize(path))
+    position = 0
+    with open(path, 'rb') as f:
+        for raw in f:
+            position += len(raw)
+            yield raw.decode("utf-8-sig" if position == len(raw) else "utf-8"), position / total
+
+
+def parse_csv(path):
+    """Записи CSV: первая строка — заголовок; разделитель определяется по ней"""
+    lines = read_lines(path)
+    first = next(lines, None)
+    if first is None:
+        return
+    header_line, progress = first
+    dialect = csv.excel
+    try:
+        dialect = csv.Sniffer().sniff(header_line, delimiters=",;\t")
+    except csv.Error:
+        pass
+    state = {"progress": progress}
+
+    def text_lines():
+        yield header_line
+        for line, state["progress"] in lines:
+            yield line
+
+    reader = csv.reader(text_lines(), dialect)
+    header = [CSV_COLUMNS.get(name.strip().lower()) for name in next(reader)]
+    if "title" not in header:
+        raise ValueError("в CSV нет колонки title (название)")
+    for row in reader:
+        if not any(cell.strip() for cell in row):
+            continue
+        record = {field: value for field, value in zip(header, row) if field}
+        if "subtasks" in record:
+            record["subtasks"] = [
+                {"title": title.strip()} for title in record["subtasks"].split(";") if title.strip()
+            ]
+        yield record, state["progress"]
+
+
+def parse_markdown(path):
+    """Пункты чеклиста "- [ ]" / "- [x]"; вложенные пункты — подзадачи ближайшего верхнего"""
+    current = None
+    top_indent = None
+    for line, progress in read_lines(path):
+        match = CHECKLIST_ITEM.match(line.rstrip("\r\n"))
+        if match is None:
+            continue
+        indent = len(match.group(1).expandtabs(4))
+        item = {"title": match.group(3).strip(), "completed": match.group(2) != " "}
+        if current is not None and indent > top_indent:
+            current["subtasks"].append(item)
+            continue
+        if current is not None:
+            yield current, progress
+        current = dict(item, subtasks=[])
+        top_indent = indent
+    if current is not None:
+        yield current, 1.0
+
+
+def parse_json(path):
+    """JSON-массив задач или снимок приложения с разделом "tasks" (оба читаются блоками)"""
+    with open(path, 'r', encoding='utf-8-sig') as f:
+        blocks = _JsonBlocks(f, max(1, os.path.getsize(path)))
+        if blocks.peek() == "{":
+            yield from _iter_snapshot_tasks(blocks)
+        else:
+            yield from _iter_json_array(blocks)
+
+
+class _JsonBlocks:
+    """JSON из файла блоками по JSON_BLOCK символов: в памяти — блок и недочитанный элемент"""
+
+    def __init__(self, f, total):
+        self.f = f
+        self.total = total
+        self.buffer = ""
+        self.index = 0
+        self.consumed = 0
+        self._decode = json.JSONDecoder().raw_decode
+
+    def _more(self):
+        block = self.f.read(JSON_BLOCK)
+        if not block:
+            return False
+        self.consumed += self.index
+        self.buffer, self.index = self.buffer[self.index:] + block, 0
+        return True
+
+    def peek(self, skip=" \t\r\n"):
+        """Следующий символ после пропуска skip ('' — конец файла)"""
+        while True:
+            buffer, index = self.buffer, self.index
+            while index < len(buffer) and buffer[index] in skip:
+                index += 1
+            self.index = index
+            if index < len(buffer):
+                return buffer[index]
+            if not self._more():
+                return ""
+
+    def take(self, char, message=None):
+        if self.peek() != char:
+            raise ValueError(message or f"ожидался {char!r}")
+        self.index += 1
+
+    def decode(self):
+        """Следующее значение; не поместилось в буфер — дочитываем"""
+        self.peek()
+        while True:
+            try:
+                value, end = self._decode(self.buffer, self.index)
+            except json.JSONDecodeError:
+                if not self._more():
+                    raise
+                continue
+            # Значение у конца буфера могло оборваться (число, literal) — проверяем с продолжением
+            if end == len(self.buffer) and self._more():
+                continue
+            self.index = end
+            return value
+
+    @property
+    def progress(self):
+        return min(1.0, (self.consumed + self.index) / self.total)
+
+
+def _iter_json_array(blocks):
+    blocks.take("[", "ожидался JSON-массив задач")
+    while True:
+        # Пропускаем пробелы и запятые между элементами
+        char = blocks.peek(" \t\r\n,")
+        if not char:
+            raise ValueError("JSON-массив не закрыт")
+        if char == "]":
+            blocks.index += 1
+            return
+        record = blocks.decode()
+        yield record, blocks.progress
+
+
+def _iter_snapshot_tasks(blocks):
+    """Задачи из снимка MyTasks: прочие разделы разбираются и пропускаются"""
+    blocks.take("{")
+    while True:
+        char = blocks.peek(" \t\r\n,")
+        if char in ("}", ""):
+            return
+        key = blocks.decode()
+        blocks.take(":")
+        if key == "tasks":
+            yield from _iter_json_array(blocks)
+            return
+        blocks.decode()
+
+
+PARSERS = {"csv": parse_csv, "markdown": parse_markdown, "json": parse_json}
+
+
+def new_ids(count):
+    """uuid4 пачкой: один блок os.urandom, биты версии и варианта ставятся срезами на весь блок"""
+    raw = bytearray(os.urandom(16 * count))
+    raw[6::16] = bytes((b & 0x0F) | 0x40 for b in raw[6::16])
+    raw[8::16] = bytes((b & 0x3F) | 0x80 for b in raw[8::16])
+    text = raw.hex()
+    return [
+        f"{text[i:i + 8]}-{text[i + 8:i + 12]}-{text[i + 12:i + 16]}-{text[i + 16:i + 20]}-{text[i + 20:i + 32]}"
+        for i in range(0, 32 * count, 32)
+    ]
+
+
+def as_bool(value):
+    if isinstance(value, bool):
+        return value
+    return str(value).strip().lower() in TRUE_VALUES
+
+
+def normalize_task(record, now):
+    """Задача в формате приложения (без id); ValueError — если записи нельзя доверять"""
+    if not isinstance(record, dict):
+        raise ValueError("запись не является объектом")
+    title = str(record.get("title") or "").strip()
+    if not title:
+        raise ValueError("пустое название")
+    completed = as_bool(record.get("completed", False))
+    subtasks = []
+    for subtask in record.get("subtasks") or []:
+        if isinstance(subtask, str):
+            subtask = {"title": subtask}
+        if isinstance(subtask, dict):
+            subtasks.append({
+                "title": str(subtask.get("title") or "").strip(),
+                "completed": as_bool(subtask.get("completed", False)),
+            })
+    completed_at = record.get("completed_at") if completed else None
+    return {
+        "title": title,
+        "description": str(record.get("description") or ""),
+        "completed": completed,
+        "completed_at": completed_at if isinstance(completed_at, int) else (now if completed else None),
+        "coefficient": normalize_coefficient(record.get("coefficient", 1)),
+        "subtasks": subtasks,
+    }
+
+
+def import_tasks(data_manager, path, fmt=None, progress=None, batch_size=IMPORT_BATCH, cancel=None):
+    """Импортирует задачи из файла; возвращает {"imported", "skipped", "errors"}.
+
+    progress(доля, импортировано) вызывается после каждой пачки; cancel() -> True
+    прерывает импорт (уже добавленные пачки остаются). Все пачки уходят в хранилище
+    одной записью после окончания импорта.
+    """
+    parse = PARSERS[fmt or detect_format(path)]
+    result = {"imported": 0, "skipped": 0, "errors": []}
+    now = int(time.time())
+    batch = []
+    position = 0
+
+    def commit(fraction):
+        ids = new_ids(sum(1 + len(task["subtasks"]) for task in batch))
+        for task in batch:
+            task["id"] = ids.pop()
+            for subtask in task["subtasks"]:
+                subtask["id"] = ids.pop()
+        data_manager.add_tasks(batch)
+        result["imported"] += len(batch)
+        batch.clear()
+        if progress is not None:
+            progress(fraction, result["imported"])
+        if cancel is not None and cancel():
+            raise ImportCancelled()
+
+    # Весь импорт — одна запись на диск и один шаг отмены
+    with data_manager.save_queue.hold(), data_manager.history.group("импорт задач"):
+        try:
+            for record, fraction in parse(path):
+                position += 1
+                try:
+                    batch.append(normalize_task(record, now))
+                except ValueError as error:
+                    result["skipped"] += 1
+                    if len(result["errors"]) < MAX_ERRORS:
+                        result["errors"].append(f"запись {position}: {error}")
+                    continue
+                if len(batch) >= batch_size:
+                    commit(fraction)
+            if batch:
+                commit(1.0)
+        except ImportCancelled:
+            result["cancelled"] = True
+    return result
+
+
+def main():
+    from module.data_manager import DataManager
+
+    parser = argparse.ArgumentParser(description="Импорт задач в MyTasks")
+    parser.add_argument("path")
+    parser.add_argument("--format", choices=sorted(PARSERS), help="по умолчанию — по расширению файла")
+    args = parser.parse_args()
+
+    data_manager = DataManager()
+    started = time.perf_counter()
+    try:
+        result = import_tasks(data_manager, args.path, args.format)
+    except (ValueError, IOError, csv.Error) as error:
+        parser.error(str(error))
+    data_manager.close()
+    print(f"импортировано {result['imported']}, пропущено {result['skipped']} "
+          f"за {(time.perf_counter() - started) * 1000:.0f} мс")
+    for message in result["errors"]:
+        print(message)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,190 @@
+"""
+Модели данных: задачи, подзадачи и привычки на __slots__.
+
+Запись занимает почти втрое меньше памяти, чем словарь с теми же полями, но сохраняет
+словарный интерфейс (task["title"], task.get(...), update, items), поэтому
+хранилища и страницы работают с ними как раньше. Поля, которых нет в
+схеме, лежат в _extra, а незаданные поля не попадают в JSON —
+to_dict() возвращает ровно то, что было загружено.
+"""
+
+_MISSING = object()
+
+
+class Record:
+    """Запись со словарным интерфейсом поверх __slots__"""
+    __slots__ = ("_extra",)
+    FIELDS = ()
+    _FIELD_SET = frozenset()
+
+    def __init__(self, **fields):
+        self._extra = None
+        for key, value in fields.items():
+            self[key] = value
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._FIELD_SET = frozenset(cls.FIELDS)
+
+    @classmethod
+    def from_dict(cls, data):
+        """Создаёт запись из словаря (или возвращает уже готовую запись)"""
+        if isinstance(data, cls):
+            return data
+        record = cls.__new__(cls)
+        fields = cls._FIELD_SET
+        extra = None
+        for key, value in data.items():
+            if key in fields:
+                object.__setattr__(record, key, value)
+            elif extra is None:
+                extra = {key: value}
+            else:
+                extra[key] = value
+        record._extra = extra
+        return record
+
+    def shallow_dict(self):
+        """Поля записи в словаре (вложенные записи не копируются)"""
+        result = {}
+        for key in self.FIELDS:
+            value = getattr(self, key, _MISSING)
+            if value is not _MISSING:
+                result[key] = value
+        if self._extra:
+            result.update(self._extra)
+        return result
+
+    def _convert(self, key, value):
+        """Приведение значения поля при записи (вложенные записи)"""
+        return value
+
+    def __getitem__(self, key):
+        if key in self._FIELD_SET:
+            value = getattr(self, key, _MISSING)
+        else:
+            value = self._extra.get(key, _MISSING) if self._extra else _MISSING
+        if value is _MISSING:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key, value):
+        value = self._convert(key, value)
+        if key in self._FIELD_SET:
+            object.__setattr__(self, key, value)
+        else:
+            if self._extra is None:
+                self._extra = {}
+            self._extra[key] = value
+
+    def __delitem__(self, key):
+        if key in self._FIELD_SET:
+            try:
+                object.__delattr__(self, key)
+            except AttributeError:
+                raise KeyError(key) from None
+        elif self._extra and key in self._extra:
+            del self._extra[key]
+        else:
+            raise KeyError(key)
+
+    def __contains__(self, key):
+        if key in self._FIELD_SET:
+            return hasattr(self, key)
+        return bool(self._extra) and key in self._extra
+
+    def get(self, key, default=None):
+        if key in self._FIELD_SET:
+            return getattr(self, key, default)
+        return self._extra.get(key, default) if self._extra else default
+
+    def setdefault(self, key, default=None):
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            self[key] = default
+            value = self[key]
+        return value
+
+    def update(self, fields=(), **kwargs):
+        for key, value in dict(fields, **kwargs).items():
+            self[key] = value
+
+    def keys(self):
+        return list(self.shallow_dict())
+
+    def items(self):
+        return list(self.shallow_dict().items())
+
+    def values(self):
+        return list(self.shallow_dict().values())
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __len__(self):
+        return len(self.keys())
+
+    def to_dict(self):
+        """Копия записи в виде словарей и списков (для JSON и журнала изменений)"""
+        result = self.shallow_dict()
+        for key, value in result.items():
+            # Строки, числа и None копировать не нужно
+            if isinstance(value, (list, dict, tuple, Record)):
+                result[key] = to_plain(value)
+        return result
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.to_dict()!r})"
+
+
+class Subtask(Record):
+    __slots__ = ("id", "title", "completed")
+    FIELDS = __slots__
+
+
+class Task(Record):
+    __slots__ = ("id", "title", "description", "completed", "completed_at", "coefficient", "subtasks")
+    FIELDS = __slots__
+
+    @classmethod
+    def from_dict(cls, data):
+        task = super().from_dict(data)
+        subtasks = getattr(task, "subtasks", None)
+        if subtasks and task is not data:
+            task.subtasks = [Subtask.from_dict(st) for st in subtasks]
+        return task
+
+    def _convert(self, key, value):
+        if key == "subtasks" and value is not None:
+            return [Subtask.from_dict(st) for st in value]
+        return value
+
+
+class Habit(Record):
+    __slots__ = ("id", "name", "count", "days")
+    FIELDS = __slots__
+
+
+def to_plain(value):
+    """Глубокая копия в словарях и списках: записи превращаются в dict"""
+    if isinstance(value, Record):
+        return value.to_dict()
+    if isinstance(value, dict):
+        return {key: to_plain(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [to_plain(item) for item in value]
+    return value
+
+
+def json_default(value):
+    """Хук json.dump для записей (вложенные записи json обработает сам)"""
+    if isinstance(value, Record):
+        return value.shallow_dict()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def adopt(data):
+    """Переводит задачи и привычки загруженных данных в модели (на месте)"""
+    data["tasks"] = [Task.from_dict(task) for task in data.get("tasks", [])]
+    data["habits"] = [Habit.from_dict(habit) for habit in data.get("habits", [])]
+    return data
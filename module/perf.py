@@ -0,0 +1,146 @@
+"""
+Замеры горячих путей: счётчики, гистограммы задержек и кольцевой буфер последних замеров
+"""
+import functools
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from collections import deque
+from contextlib import contextmanager
+from pathlib import Path
+
+# Границы корзин гистограммы (мс); последняя корзина — всё, что дольше
+BUCKET_BOUNDS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+# Сколько последних замеров хранить
+RING_SIZE = 2000
+
+
+class PerfStats:
+    """Счётчик и гистограмма задержек одной операции"""
+    __slots__ = ("count", "total", "max", "buckets")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.buckets = [0] * (len(BUCKET_BOUNDS) + 1)
+
+    def add(self, ms):
+        self.count += 1
+        self.total += ms
+        if ms > self.max:
+            self.max = ms
+        self.buckets[bisect_left(BUCKET_BOUNDS, ms)] += 1
+
+    def percentile(self, q):
+        """Оценка перцентиля по гистограмме (верхняя граница корзины)"""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for index, count in enumerate(self.buckets):
+            seen += count
+            if seen >= rank:
+                return BUCKET_BOUNDS[index] if index < len(BUCKET_BOUNDS) else self.max
+        return self.max
+
+    def summary(self):
+        return {
+            "count": self.count,
+            "mean": self.total / self.count if self.count else 0.0,
+            "p50": self.percentile(0.5),
+            "p95": self.percentile(0.95),
+            "max": self.max,
+            "buckets": list(self.buckets),
+        }
+
+
+class PerfRecorder:
+    """Сборщик замеров. Выключенный сборщик стоит одной проверки флага на вызов."""
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._stats = {}
+        self._recent = deque(maxlen=RING_SIZE)
+
+    def record(self, name, ms):
+        with self._lock:
+            stats = self._stats.get(name)
+            if stats is None:
+                stats = self._stats[name] = PerfStats()
+            stats.add(ms)
+            self._recent.append((time.time(), name, ms))
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+            self._recent.clear()
+
+    def snapshot(self):
+        """Сводка по операциям (по убыванию суммарного времени) и последние замеры"""
+        with self._lock:
+            items = sorted(self._stats.items(), key=lambda item: item[1].total, reverse=True)
+            return {
+                "enabled": self.enabled,
+                "bucket_bounds_ms": list(BUCKET_BOUNDS),
+                "operations": {name: stats.summary() for name, stats in items},
+                "recent": [
+                    {"ts": ts, "name": name, "ms": ms} for ts, name, ms in self._recent
+                ],
+            }
+
+    def export(self, path):
+        """Сохраняет сводку в JSON-файл"""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.snapshot(), f, ensure_ascii=False, indent=2)
+        return path
+
+
+# Общий сборщик приложения (включается MYTASKS_PERF=1 или переключателем в настройках)
+recorder = PerfRecorder(enabled=os.environ.get("MYTASKS_PERF", "") == "1")
+
+
+def set_enabled(enabled):
+    recorder.enabled = bool(enabled)
+
+
+@contextmanager
+def span(name):
+    """Замер блока кода"""
+    if not recorder.enabled:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        recorder.record(name, (time.perf_counter() - started) * 1000)
+
+
+def timed(name):
+    """Декоратор замера функции"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not recorder.enabled:
+                return func(*args, **kwargs)
+            started = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                recorder.record(name, (time.perf_counter() - started) * 1000)
+        return wrapper
+    return decorator
+
+
+def instrument_page(page):
+    """Оборачивает page.update() замером"""
+    if getattr(page, "_perf_instrumented", False):
+        return
+    page.update = timed("page.update")(page.update)
+    page._perf_instrumented = True
@@ -1,32 +1,37 @@
 import flet as ft
 import asyncio
+import math
 import time
 import platform
 
+from module.data_manager import DATA_REPLACED, TASK_ADDED, TASK_REMOVED, TASK_UPDATED, TASKS_LOADED
+from module.perf import timed
+from module.scheduler import get_timer_heap
+from module.services import PHASE_TITLES, WORK, PomodoroService, TaskService
+from module.ui import update_controls
+
 if platform.system() == "Windows":
     import winsound
 else:
     winsound = None
 
+# Сколько незавершённых задач показывать в списке привязки
+TASK_OPTIONS_LIMIT = 100
+
 
 def create_pomodoro_page(page, data_manager):
-    """Создает страницу помодоро (UI обновляется каждую секунду через page.run_task)"""
-
-    # Состояние таймера в data_manager (не теряется при переключении вкладок)
-    pomodoro = data_manager.data.setdefault(
-        "pomodoro",
-        {
-            "running": False,
-            "seconds": 25 * 60,
-            "time_input_value": "25",
-            "end_ts": None,  # timestamp окончания
-        },
-    )
+    """Создает страницу помодоро (таймеры — в общей куче TimerHeap сессии)"""
 
-    # Рантайм на уровне page (чтобы одна фоновая задача на всю сессию)
+    # Логика цикла — в PomodoroService; состояние в data_manager (не теряется при переключении вкладок)
+    service = PomodoroService(data_manager)
+    tasks = TaskService(data_manager)
+    pomodoro = service.state
+
+    # Рантайм на уровне page (таймеры сессии переживают пересоздание страницы)
     if not hasattr(page, "_pomodoro_runtime"):
-        page._pomodoro_runtime = {"task": None, "render": None}
+        page._pomodoro_runtime = {"tick": None, "end": None, "visible": True}
     rt = page._pomodoro_runtime
+    timers = get_timer_heap(page)
 
     def format_time(seconds: int) -> str:
         mins = seconds // 60
@@ -42,10 +47,6 @@ def create_pomodoro_page(page, data_manager):
             except Exception:
                 pass
 
-    def _is_mounted(ctrl: ft.Control) -> bool:
-        # До монтирования ctrl.page может бросать RuntimeError
-        return getattr(ctrl, "_Control__page", None) is not None
-
     # Поле ввода времени
     time_input = ft.TextField(
         hint_text="Введите время в минутах (например, 25)",
@@ -54,6 +55,29 @@ def create_pomodoro_page(page, data_manager):
         text_align=ft.TextAlign.CENTER,
     )
 
+    # Настройки цикла
+    short_break_input = ft.TextField(
+        label="Короткий перерыв",
+        value=str(pomodoro.get("short_break")),
+        width=150,
+        text_align=ft.TextAlign.CENTER,
+    )
+    long_break_input = ft.TextField(
+        label="Длинный перерыв",
+        value=str(pomodoro.get("long_break")),
+        width=150,
+        text_align=ft.TextAlign.CENTER,
+    )
+    long_break_every_input = ft.TextField(
+        label="Длинный каждые N",
+        value=str(pomodoro.get("long_break_every")),
+        width=150,
+        text_align=ft.TextAlign.CENTER,
+    )
+
+    # Привязка сессии к задаче
+    task_dropdown = ft.Dropdown(label="Задача", width=300)
+
     # Отображение таймера
     timer_display = ft.Text(
         "00:00",
@@ -61,6 +85,8 @@ def create_pomodoro_page(page, data_manager):
         weight=ft.FontWeight.BOLD,
         text_align=ft.TextAlign.CENTER,
     )
+    phase_text = ft.Text("", size=18, text_align=ft.TextAlign.CENTER)
+    queue_text = ft.Text("", size=14)
 
     # Кнопки
     start_button = ft.ElevatedButton(
@@ -74,39 +100,58 @@ def create_pomodoro_page(page, data_manager):
         icon=ft.Icons.REFRESH,
         width=200,
     )
+    queue_button = ft.OutlinedButton("В очередь", icon=ft.Icons.QUEUE)
+    clear_queue_button = ft.IconButton(icon=ft.Icons.CLEAR_ALL, tooltip="Очистить очередь")
 
-    def save_time_input_value(value: str):
-        pomodoro["time_input_value"] = str(value)
-        data_manager.save()
+    def save_setting(key, value):
+        """Сохраняет числовую настройку (по потере фокуса, а не на каждую клавишу)"""
+        if service.set_setting(key, value):
+            render_labels()
 
-    time_input.on_change = lambda e: save_time_input_value(e.control.value)
+    time_input.on_blur = lambda e: save_setting("time_input_value", e.control.value)
+    time_input.on_submit = time_input.on_blur
+    short_break_input.on_blur = lambda e: save_setting("short_break", e.control.value)
+    long_break_input.on_blur = lambda e: save_setting("long_break", e.control.value)
+    long_break_every_input.on_blur = lambda e: save_setting("long_break_every", e.control.value)
 
-    def recompute_remaining_if_running():
-        """Пересчитать seconds по end_ts, если таймер запущен."""
-        if pomodoro.get("running") and pomodoro.get("end_ts") is not None:
-            remaining = int(pomodoro["end_ts"] - time.time())
-            if remaining <= 0:
-                pomodoro["seconds"] = 0
-                pomodoro["running"] = False
-                pomodoro["end_ts"] = None
-                data_manager.save()
-                return True  # finished
-            else:
-                pomodoro["seconds"] = remaining
-        return False
+    def refresh_task_options():
+        """Список незавершённых задач для привязки сессии"""
+        task_dropdown.options = [ft.dropdown.Option(key="", text="Без задачи")] + [
+            ft.dropdown.Option(key=task["id"], text=task.get("title", ""))
+            for task in tasks.open_tasks(TASK_OPTIONS_LIMIT)
+        ]
+        if task_dropdown.value and tasks.get(task_dropdown.value) is None:
+            task_dropdown.value = ""
+        update_controls(task_dropdown)
 
-    def render():
-        # Если запущен — поддерживаем seconds актуальным
-        finished = recompute_remaining_if_running()
-        if finished:
-            # звук лучше не блокировать UI
-            try:
-                asyncio.create_task(asyncio.to_thread(play_sound_sync))
-            except Exception:
-                # fallback: синхронно
-                play_sound_sync()
+    def selected_task_id():
+        return task_dropdown.value or None
+
+    def render_labels():
+        """Фаза, позиция в цикле и очередь"""
+        done, every = service.cycle_position()
+        label = f"{PHASE_TITLES.get(pomodoro.get('phase'), '')} · {done}/{every}"
+        title = service.task_title(pomodoro.get("task_id"))
+        if title and pomodoro.get("phase") == WORK and pomodoro.get("started_ts"):
+            label += f" · {title}"
+        phase_text.value = label
+        queue = pomodoro.get("queue", [])
+        queue_text.value = f"В очереди: {len(queue)}" if queue else ""
+        clear_queue_button.visible = bool(queue)
+        update_controls(phase_text, queue_text, clear_queue_button)
 
-        timer_display.value = format_time(int(pomodoro.get("seconds", 0)))
+    def notify_finished():
+        # звук лучше не блокировать UI
+        try:
+            asyncio.create_task(asyncio.to_thread(play_sound_sync))
+        except Exception:
+            # fallback: синхронно
+            play_sound_sync()
+
+    @timed("pomodoro.render")
+    def render():
+        """Полная отрисовка: время, фаза и кнопка старта/паузы"""
+        timer_display.value = format_time(service.remaining())
 
         if pomodoro.get("running"):
             start_button.text = "Пауза"
@@ -115,71 +160,104 @@ def create_pomodoro_page(page, data_manager):
             start_button.text = "Начать"
             start_button.icon = ft.Icons.PLAY_ARROW
 
-        # Обновляем страницу, если контролы уже на странице
-        if _is_mounted(timer_display) and _is_mounted(start_button):
-            page.update()
-
-    # Сохраняем render, чтобы фоновая задача всегда дергала актуальную отрисовку
-    rt["render"] = render
+        # Обновляем только контролы таймера (если они сейчас на странице)
+        update_controls(timer_display, start_button)
+        render_labels()
 
-    async def pomodoro_loop():
-        """Фоновый цикл: тикает раз в секунду и обновляет UI (когда вкладка смонтирована)."""
-        while True:
-            await asyncio.sleep(1)
-            if rt.get("render"):
-                rt["render"]()
-
-    # Запускаем фоновую задачу один раз на page
-    if rt.get("task") is None or (hasattr(rt["task"], "done") and rt["task"].done()):
-        rt["task"] = page.run_task(pomodoro_loop)
+    @timed("pomodoro.tick")
+    def tick():
+        """Тик таймера: меняется только текст времени"""
+        rt["tick"] = None
+        if pomodoro.get("running") and pomodoro.get("end_ts") is not None:
+            value = format_time(service.remaining())
+            if value != timer_display.value:
+                timer_display.value = value
+                update_controls(timer_display)
+        schedule()
 
-    def start_timer_click(e):
-        # Пауза
-        if pomodoro.get("running"):
-            if pomodoro.get("end_ts") is not None:
-                pomodoro["seconds"] = max(0, int(pomodoro["end_ts"] - time.time()))
-            pomodoro["running"] = False
-            pomodoro["end_ts"] = None
-            data_manager.save()
+    def session_end():
+        """Окончание сессии: запись в историю и переход к следующей фазе цикла"""
+        rt["end"] = None
+        # Если дедлайн сдвинулся (пауза и продолжение), сессия не завершается и перепланируется
+        if service.finish_session():
+            notify_finished()
             render()
+        schedule()
+
+    def schedule():
+        """Ставит в кучу таймеров конец сессии и (если вкладка видна) следующий тик"""
+        for slot in ("tick", "end"):
+            if rt.get(slot) is not None:
+                timers.cancel(rt[slot])
+                rt[slot] = None
+        end_ts = pomodoro.get("end_ts")
+        if not pomodoro.get("running") or end_ts is None:
             return
+        rt["end"] = timers.call_at(end_ts, session_end)
+        remaining = end_ts - time.time()
+        if rt.get("visible") and remaining > 1:
+            # Ближайшая граница секунды, отсчитанная от end_ts (без накопления дрейфа)
+            rt["tick"] = timers.call_later(remaining - math.floor(remaining) + 0.005, tick)
 
-        # Старт
-        if int(pomodoro.get("seconds", 0)) <= 0:
-            try:
-                minutes = int(time_input.value or pomodoro.get("time_input_value", "25"))
-                if minutes <= 0:
-                    minutes = 25
-            except ValueError:
-                minutes = 25
-                time_input.value = "25"
-                save_time_input_value("25")
-
-            pomodoro["seconds"] = minutes * 60
-            pomodoro["time_input_value"] = str(minutes)
-
-        pomodoro["running"] = True
-        pomodoro["end_ts"] = time.time() + int(pomodoro["seconds"])
-        data_manager.save()
+    def start_timer_click(e):
+        """Старт, пауза или продолжение"""
+        minutes = service.toggle(time_input.value, selected_task_id())
+        if minutes is not None and time_input.value != str(minutes):
+            time_input.value = str(minutes)
+            update_controls(time_input)
         render()
+        schedule()
 
     def reset_timer_click(e):
-        pomodoro["running"] = False
-        pomodoro["seconds"] = 0
-        pomodoro["end_ts"] = None
-        data_manager.save()
+        service.reset()
         render()
+        schedule()
+
+    def queue_session_click(e):
+        service.enqueue(selected_task_id())
+        render_labels()
+
+    def clear_queue_click(e):
+        service.clear_queue()
+        render_labels()
 
     start_button.on_click = start_timer_click
     reset_button.on_click = reset_timer_click
+    queue_button.on_click = queue_session_click
+    clear_queue_button.on_click = clear_queue_click
+
+    def on_task_events(events):
+        refresh_task_options()
+        render_labels()
+
+    unsubscribe = data_manager.subscribe(
+        on_task_events, TASK_ADDED, TASK_UPDATED, TASK_REMOVED, TASKS_LOADED, DATA_REPLACED
+    )
+
+    def on_activate(changes):
+        rt["visible"] = True
+        render()
+        schedule()
+
+    def on_deactivate():
+        # Вкладка скрыта — в куче остаётся только конец сессии
+        rt["visible"] = False
+        schedule()
 
     # Первичная отрисовка (без падения — update только после mount)
+    rt["visible"] = True
+    refresh_task_options()
+    if pomodoro.get("task_id") and tasks.get(pomodoro["task_id"]):
+        task_dropdown.value = pomodoro["task_id"]
     render()
+    # Сессия, закончившаяся при закрытом приложении, завершится первым же срабатыванием кучи
+    schedule()
 
-    return ft.Container(
+    view = ft.Container(
         content=ft.Column(
             [
                 ft.Text("Помодоро", size=28, weight=ft.FontWeight.BOLD, text_align=ft.TextAlign.CENTER),
+                phase_text,
                 ft.Container(
                     content=timer_display,
                     width=300,
@@ -194,16 +272,32 @@ def create_pomodoro_page(page, data_manager):
                     alignment=ft.MainAxisAlignment.CENTER,
                     spacing=10,
                 ),
+                ft.Row(
+                    [short_break_input, long_break_input, long_break_every_input],
+                    alignment=ft.MainAxisAlignment.CENTER,
+                    spacing=10,
+                ),
                 ft.Row(
                     [start_button, reset_button],
                     alignment=ft.MainAxisAlignment.CENTER,
                     spacing=10,
                 ),
+                ft.Row(
+                    [task_dropdown, queue_button, queue_text, clear_queue_button],
+                    alignment=ft.MainAxisAlignment.CENTER,
+                    vertical_alignment=ft.CrossAxisAlignment.CENTER,
+                    spacing=10,
+                ),
             ],
             horizontal_alignment=ft.CrossAxisAlignment.CENTER,
             spacing=20,
             expand=True,
+            scroll=ft.ScrollMode.AUTO,
         ),
         padding=20,
         expand=True,
-)
+    )
+    view.on_activate = on_activate
+    view.on_deactivate = on_deactivate
+    view.on_dispose = unsubscribe
+    return view
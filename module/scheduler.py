@@ -0,0 +1,97 @@
+"""
+Планировщик таймеров: одна фоновая задача asyncio обслуживает кучу дедлайнов
+"""
+import asyncio
+import heapq
+import itertools
+import threading
+import time
+import traceback
+
+
+class TimerHeap:
+    """Куча отложенных вызовов по времени time.time().
+
+    Одна задача спит до ближайшего дедлайна (или до добавления более раннего),
+    поэтому без запланированных таймеров она не просыпается вовсе.
+    call_at/cancel можно вызывать из любого потока; колбэки выполняются в цикле asyncio.
+    """
+
+    def __init__(self):
+        self._heap = []
+        self._live = set()
+        self._counter = itertools.count(1)
+        self._lock = threading.Lock()
+        self._loop = None
+        self._wake = asyncio.Event()
+
+    def call_at(self, when, callback):
+        """Планирует callback() на момент when; возвращает handle для cancel"""
+        handle = next(self._counter)
+        with self._lock:
+            first = not self._heap or when < self._heap[0][0]
+            heapq.heappush(self._heap, (when, handle, callback))
+            self._live.add(handle)
+        if first:
+            self._notify()
+        return handle
+
+    def call_later(self, delay, callback):
+        return self.call_at(time.time() + delay, callback)
+
+    def cancel(self, handle):
+        """Отменяет таймер (отменённая запись просто пропускается при извлечении)"""
+        with self._lock:
+            self._live.discard(handle)
+
+    def __len__(self):
+        return len(self._live)
+
+    def _notify(self):
+        loop = self._loop
+        if loop is not None:
+            loop.call_soon_threadsafe(self._wake.set)
+
+    def _pop_due(self):
+        """Снимает с кучи наступившие таймеры; возвращает (колбэки, пауза до следующего)"""
+        due = []
+        now = time.time()
+        with self._lock:
+            while self._heap:
+                when, handle, callback = self._heap[0]
+                if handle not in self._live:
+                    heapq.heappop(self._heap)
+                    continue
+                if when > now:
+                    return due, when - now
+                heapq.heappop(self._heap)
+                self._live.discard(handle)
+                due.append(callback)
+        return due, None
+
+    async def run(self):
+        """Фоновый цикл (запускается один раз через page.run_task)"""
+        self._loop = asyncio.get_running_loop()
+        while True:
+            due, delay = self._pop_due()
+            for callback in due:
+                try:
+                    callback()
+                except Exception:
+                    traceback.print_exc()
+            if due:
+                continue
+            try:
+                await asyncio.wait_for(self._wake.wait(), delay)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+
+
+def get_timer_heap(page):
+    """Общая куча таймеров сессии (создаётся и запускается при первом обращении)"""
+    timers = getattr(page, "_timer_heap", None)
+    if timers is None:
+        timers = page._timer_heap = TimerHeap()
+        page.run_task(timers.run)
+    return timers
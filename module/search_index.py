@@ -0,0 +1,264 @@
+"""
+Полнотекстовый поиск по задачам: инвертированный индекс с поиском по префиксу
+"""
+import bisect
+import heapq
+import re
+import threading
+
+from module.perf import timed
+
+TOKEN_RE = re.compile(r"[^\W_]+")
+
+# Вес совпадения по полю задачи
+TITLE_WEIGHT = 3
+SUBTASK_WEIGHT = 2
+DESCRIPTION_WEIGHT = 1
+# Совпадение слова целиком важнее совпадения только по началу слова
+EXACT_BONUS = 2
+# Сколько лучших результатов показывать в списке (выбор «Все» берёт все найденные)
+SEARCH_LIMIT = 1000
+# До скольких кандидатов следующие слова запроса проверяются по словам самих задач
+CANDIDATE_SCAN_LIMIT = 2000
+# Короче этого слово запроса ищется только целиком (одна буква подходит к половине словаря)
+MIN_PREFIX_LENGTH = 2
+# Во сколько слов словаря раскрывается префикс (берутся самые частые)
+PREFIX_TERM_LIMIT = 200
+
+
+def tokenize(text):
+    """Слова текста в нижнем регистре (Unicode, в т.ч. кириллица; «ё» приравнивается к «е»)"""
+    if not text:
+        return []
+    return TOKEN_RE.findall(text.casefold().replace("ё", "е"))
+
+
+def task_terms(task):
+    """Слова задачи с весами: название, описание и названия подзадач"""
+    terms = {}
+    for token in tokenize(task.get("description", "")):
+        terms[token] = max(terms.get(token, 0), DESCRIPTION_WEIGHT)
+    for subtask in task.get("subtasks", []):
+        for token in tokenize(subtask.get("title", "")):
+            terms[token] = max(terms.get(token, 0), SUBTASK_WEIGHT)
+    for token in tokenize(task.get("title", "")):
+        terms[token] = TITLE_WEIGHT
+    return terms
+
+
+class SearchIndex:
+    """Инвертированный индекс: слово -> {id задачи: вес}.
+
+    Словарь слов хранится отсортированным, поэтому поиск по префиксу — это bisect
+    и проход по соседним словам. Индекс строится в фоне (build); изменения,
+    пришедшие во время построения, применяются сразу после него.
+    """
+
+    def __init__(self, get_task):
+        self.get_task = get_task
+        self.ready = threading.Event()
+        self._lock = threading.RLock()
+        self._postings = {}
+        self._vocabulary = []
+        self._terms = {}  # id задачи -> её слова (для удаления из индекса)
+        self._order = {}  # id задачи -> порядковый номер (при равных весах — порядок списка)
+        self._next_order = 0
+        self._pending = set()
+        self._generation = 0
+
+    @timed("search_index.build")
+    def build(self, tasks, on_ready=None):
+        """Строит индекс по снимку списка задач (вызывается в фоновом потоке).
+
+        Пока идёт построение, refresh() только запоминает id; если началось более
+        новое построение, результат этого отбрасывается.
+        """
+        with self._lock:
+            self._generation += 1
+            generation = self._generation
+            self.ready.clear()
+        postings = {}
+        terms_by_id = {}
+        order = {}
+        for position, task in enumerate(tasks):
+            terms = task_terms(task)
+            terms_by_id[task["id"]] = terms
+            order[task["id"]] = position
+            for token, weight in terms.items():
+                postings.setdefault(token, {})[task["id"]] = weight
+        with self._lock:
+            if generation != self._generation:
+                return
+            self._postings = postings
+            self._vocabulary = sorted(postings)
+            self._terms = terms_by_id
+            self._order = order
+            self._next_order = len(tasks)
+            pending, self._pending = self._pending, set()
+            self.ready.set()
+            for task_id in pending:
+                self.refresh(task_id)
+        if on_ready is not None:
+            on_ready()
+
+    def refresh(self, task_id):
+        """Переиндексирует задачу по текущим данным (или удаляет, если её больше нет)"""
+        with self._lock:
+            if not self.ready.is_set():
+                self._pending.add(task_id)
+                return
+            self._remove(task_id)
+            task = self.get_task(task_id)
+            if task is not None:
+                self._add(task)
+
+    def _add(self, task):
+        task_id = task["id"]
+        terms = task_terms(task)
+        self._terms[task_id] = terms
+        if task_id not in self._order:
+            self._order[task_id] = self._next_order
+            self._next_order += 1
+        for token, weight in terms.items():
+            postings = self._postings.get(token)
+            if postings is None:
+                postings = self._postings[token] = {}
+                bisect.insort(self._vocabulary, token)
+            postings[task_id] = weight
+
+    def _remove(self, task_id):
+        terms = self._terms.pop(task_id, None)
+        if not terms:
+            if self.get_task(task_id) is None:
+                self._order.pop(task_id, None)
+            return
+        for token in terms:
+            postings = self._postings.get(token)
+            if postings is None:
+                continue
+            postings.pop(task_id, None)
+            if not postings:
+                del self._postings[token]
+                index = bisect.bisect_left(self._vocabulary, token)
+                if index < len(self._vocabulary) and self._vocabulary[index] == token:
+                    del self._vocabulary[index]
+        if self.get_task(task_id) is None:
+            self._order.pop(task_id, None)
+
+    def _prefix_terms(self, token):
+        """Слова словаря, к которым подходит token: не больше PREFIX_TERM_LIMIT самых частых"""
+        postings = self._postings
+        if len(token) < MIN_PREFIX_LENGTH:
+            return [token] if token in postings else []
+        vocabulary = self._vocabulary
+        start = bisect.bisect_left(vocabulary, token)
+        end = bisect.bisect_left(vocabulary, token[:-1] + chr(ord(token[-1]) + 1), start)
+        if end - start <= PREFIX_TERM_LIMIT:
+            return vocabulary[start:end]
+        terms = heapq.nlargest(PREFIX_TERM_LIMIT, vocabulary[start:end], key=lambda term: len(postings[term]))
+        if token in postings and token not in terms:
+            terms[-1] = token
+        return terms
+
+    def _token_scores(self, token):
+        """Задачи, в которых есть слово, начинающееся с token, с лучшим весом"""
+        postings = self._postings
+        terms = sorted(self._prefix_terms(token), key=lambda term: len(postings[term]), reverse=True)
+        if not terms:
+            return {}
+        # Самый длинный список задач копируется целиком, остальные сливаются с ним
+        bonus = EXACT_BONUS if terms[0] == token else 1
+        scores = {task_id: weight * bonus for task_id, weight in postings[terms[0]].items()}
+        for term in terms[1:]:
+            bonus = EXACT_BONUS if term == token else 1
+            for task_id, weight in postings[term].items():
+                score = weight * bonus
+                if score > scores.get(task_id, 0):
+                    scores[task_id] = score
+        return scores
+
+    def _candidate_scores(self, token, candidates):
+        """То же, что _token_scores, но только среди уже найденных задач"""
+        scores = {}
+        whole_word = len(token) < MIN_PREFIX_LENGTH
+        for task_id in candidates:
+            best = 0
+            for term, weight in self._terms.get(task_id, {}).items():
+                if term == token if whole_word else term.startswith(token):
+                    score = weight * (EXACT_BONUS if term == token else 1)
+                    if score > best:
+                        best = score
+            if best:
+                scores[task_id] = best
+        return scores
+
+    def search(self, query, limit=SEARCH_LIMIT):
+        """id задач, где есть все слова запроса (по префиксу), от лучших к худшим.
+
+        None — в запросе нет слов (фильтровать нечего).
+        """
+        page = self.search_page(query, limit)
+        return None if page is None else page[0]
+
+    def search_page(self, query, limit=SEARCH_LIMIT):
+        """(лучшие limit id, сколько задач найдено всего) или None, если в запросе нет слов"""
+        with self._lock:
+            scores = self._scores(query)
+            if scores is None:
+                return None
+            return self._rank(scores, limit), len(scores)
+
+    def matches(self, query):
+        """Все найденные id без ранжирования и ограничения (для выбора «Все»)"""
+        with self._lock:
+            scores = self._scores(query)
+            return None if scores is None else list(scores)
+
+    def _scores(self, query):
+        """{id задачи: суммарный вес} по всем словам запроса; None — слов нет"""
+        tokens = sorted(set(tokenize(query)), key=len, reverse=True)
+        if not tokens:
+            return None
+        scores = None
+        for token in tokens:
+            if scores is not None and len(scores) <= CANDIDATE_SCAN_LIMIT:
+                token_scores = self._candidate_scores(token, scores)
+            else:
+                token_scores = self._token_scores(token)
+            if scores is None:
+                scores = token_scores
+            else:
+                scores = {
+                    task_id: scores[task_id] + score
+                    for task_id, score in token_scores.items() if task_id in scores
+                }
+            if not scores:
+                break
+        return scores
+
+    def _rank(self, scores, limit):
+        """Лучшие limit задач: по убыванию веса, при равных — в порядке списка.
+
+        Весов немного, поэтому задачи раскладываются по корзинам весов, и
+        упорядочивается только та корзина, которая не помещается целиком.
+        """
+        buckets = {}
+        for task_id, score in scores.items():
+            bucket = buckets.get(score)
+            if bucket is None:
+                buckets[score] = [task_id]
+            else:
+                bucket.append(task_id)
+        order = self._order.get
+        result = []
+        for score in sorted(buckets, reverse=True):
+            bucket = buckets[score]
+            remaining = limit - len(result)
+            if len(bucket) <= remaining:
+                bucket.sort(key=lambda task_id: order(task_id, 0))
+                result.extend(bucket)
+            else:
+                result.extend(heapq.nsmallest(remaining, bucket, key=lambda task_id: order(task_id, 0)))
+            if len(result) >= limit:
+                break
+        return result
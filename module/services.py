@@ -0,0 +1,360 @@
+"""
+Сервисный слой: операции с задачами, привычками и помодоро без Flet.
+
+Страницы только отображают данные и вызывают методы сервисов; сами изменения
+проходят через DataManager (индексы, события, отложенная запись).
+"""
+import time
+import uuid
+
+# Подписи коэффициентов приоритета (квадранты матрицы Эйзенхауэра)
+COEFFICIENTS = {
+    1: "Срочно и важно",
+    2: "Не срочно, но важно",
+    3: "Срочно, но не важно",
+    4: "Не срочно и не важно",
+}
+
+DEFAULT_HABIT_NAME = "Новая привычка"
+
+
+def new_id():
+    return str(uuid.uuid4())
+
+
+class TaskService:
+    """Задачи и подзадачи"""
+
+    def __init__(self, data_manager):
+        self.data_manager = data_manager
+
+    def get(self, task_id):
+        return self.data_manager.get_task(task_id)
+
+    def ids(self):
+        return [task["id"] for task in self.data_manager.data["tasks"]]
+
+    def open_tasks(self, limit=None):
+        """Незавершённые задачи по порядку (не больше limit)"""
+        result = []
+        for task in self.data_manager.data["tasks"]:
+            if not task.get("completed"):
+                result.append(task)
+                if limit is not None and len(result) >= limit:
+                    break
+        return result
+
+    def create(self, title, description="", coefficient=1):
+        """Создаёт задачу; пустое название — None"""
+        if not title or not title.strip():
+            return None
+        return self.data_manager.add_task({
+            "id": new_id(),
+            "title": title.strip(),
+            "description": description,
+            "completed": False,
+            "coefficient": normalize_coefficient(coefficient),
+            "subtasks": [],
+        })
+
+    def set_completed(self, task_id, completed):
+        return self.data_manager.update_task(task_id, completed=bool(completed))
+
+    def rename(self, task_id, title):
+        return self.data_manager.update_task(task_id, title=title)
+
+    def set_description(self, task_id, description):
+        return self.data_manager.update_task(task_id, description=description)
+
+    def set_coefficient(self, task_id, coefficient):
+        return self.data_manager.update_task(task_id, coefficient=normalize_coefficient(coefficient))
+
+    def delete(self, task_id):
+        return self.data_manager.delete_task(task_id)
+
+    def add_subtask(self, task_id, title=""):
+        return self.data_manager.add_subtask(task_id, {
+            "id": new_id(),
+            "title": title,
+            "completed": False,
+        })
+
+    def set_subtask_completed(self, task_id, subtask_id, completed):
+        return self.data_manager.update_subtask(task_id, subtask_id, completed=bool(completed))
+
+    def rename_subtask(self, task_id, subtask_id, title):
+        return self.data_manager.update_subtask(task_id, subtask_id, title=title)
+
+    def delete_subtask(self, task_id, subtask_id):
+        return self.data_manager.delete_subtask(task_id, subtask_id)
+
+    # Пакетные действия: одна транзакция — одна запись и одна доставка событий
+
+    def set_completed_many(self, task_ids, completed):
+        """Отмечает задачи выполненными (или снимает отметку); возвращает число изменённых"""
+        completed = bool(completed)
+        changed = 0
+        with self.data_manager.transaction():
+            for task_id in task_ids:
+                task = self.get(task_id)
+                if task is not None and bool(task.get("completed")) != completed:
+                    self.set_completed(task_id, completed)
+                    changed += 1
+        return changed
+
+    def set_coefficient_many(self, task_ids, coefficient):
+        coefficient = normalize_coefficient(coefficient)
+        changed = 0
+        with self.data_manager.transaction():
+            for task_id in task_ids:
+                task = self.get(task_id)
+                if task is not None and task.get("coefficient") != coefficient:
+                    self.set_coefficient(task_id, coefficient)
+                    changed += 1
+        return changed
+
+    def delete_many(self, task_ids):
+        return len(self.data_manager.delete_tasks(task_ids))
+
+    def clear_completed_subtasks(self, task_ids):
+        """Удаляет выполненные подзадачи у задач; возвращает число удалённых подзадач"""
+        removed = 0
+        with self.data_manager.transaction():
+            for task_id in task_ids:
+                task = self.get(task_id)
+                if task is None:
+                    continue
+                for subtask in [st for st in task.get("subtasks", []) if st.get("completed")]:
+                    self.delete_subtask(task_id, subtask["id"])
+                    removed += 1
+        return removed
+
+
+def normalize_coefficient(value):
+    """Коэффициент 1–4; всё остальное — 1"""
+    try:
+        value = int(value)
+    except (TypeError, ValueError):
+        return 1
+    return value if value in COEFFICIENTS else 1
+
+
+class HabitService:
+    """Привычки и отметки выполнения"""
+
+    def __init__(self, data_manager):
+        self.data_manager = data_manager
+
+    def get(self, habit_id):
+        return self.data_manager.get_habit(habit_id)
+
+    def all(self):
+        return list(self.data_manager.data["habits"])
+
+    def create(self, name=DEFAULT_HABIT_NAME):
+        return self.data_manager.add_habit({"id": new_id(), "name": name, "count": 0})
+
+    def rename(self, habit_id, name):
+        return self.data_manager.update_habit(habit_id, name=name)
+
+    def check_in(self, habit_id, day=None):
+        return self.data_manager.check_in_habit(habit_id, day)
+
+    def delete(self, habit_id):
+        return self.data_manager.delete_habit(habit_id)
+
+    def stats(self, habit_id):
+        """Серия, рекорд и доли выполнения (см. HabitStats.summary)"""
+        return self.data_manager.habit_stats.get(habit_id).summary()
+
+
+WORK = "work"
+SHORT_BREAK = "short_break"
+LONG_BREAK = "long_break"
+
+PHASE_TITLES = {
+    WORK: "Работа",
+    SHORT_BREAK: "Короткий перерыв",
+    LONG_BREAK: "Длинный перерыв",
+}
+
+DEFAULT_POMODORO = {
+    "running": False,
+    "seconds": 25 * 60,
+    "time_input_value": "25",
+    "end_ts": None,  # timestamp окончания
+    "phase": WORK,
+    "started_ts": None,  # начало текущей сессии (для истории)
+    "task_id": None,  # задача, над которой идёт работа
+    "completed_work": 0,  # рабочих сессий в текущем цикле
+    "queue": [],  # очередь рабочих сессий: [{"task_id": ...}]
+    "short_break": 5,
+    "long_break": 15,
+    "long_break_every": 4,
+}
+
+
+def next_phase(pomodoro):
+    """Фаза после завершения текущей: после работы — перерыв, после перерыва — работа"""
+    if pomodoro.get("phase", WORK) != WORK:
+        return WORK
+    every = max(1, int(pomodoro.get("long_break_every", 4)))
+    if pomodoro.get("completed_work", 0) % every == 0:
+        return LONG_BREAK
+    return SHORT_BREAK
+
+
+def phase_minutes(pomodoro, phase):
+    """Длительность фазы в минутах"""
+    key = {SHORT_BREAK: "short_break", LONG_BREAK: "long_break"}.get(phase, "time_input_value")
+    try:
+        minutes = int(pomodoro.get(key) or 0)
+    except ValueError:
+        minutes = 0
+    return minutes if minutes > 0 else int(DEFAULT_POMODORO.get(key))
+
+
+class PomodoroService:
+    """Цикл помодоро: фазы, пауза, очередь сессий и история.
+
+    Состояние хранится в data["pomodoro"] и сохраняется записью {"op": "set"};
+    время передаётся параметром now, поэтому логику можно гонять без таймеров.
+    """
+
+    def __init__(self, data_manager):
+        self.data_manager = data_manager
+        self.state = data_manager.data.setdefault("pomodoro", {})
+        for key, value in DEFAULT_POMODORO.items():
+            self.state.setdefault(key, list(value) if isinstance(value, list) else value)
+
+    def save(self):
+        # Запись {"op": "set", "key": "pomodoro"} — задачи и привычки не переписываются
+        self.data_manager.set_value("pomodoro", self.state)
+
+    def remaining(self, now=None):
+        """Оставшиеся секунды текущей фазы"""
+        state = self.state
+        if state.get("running") and state.get("end_ts") is not None:
+            return max(0, int(state["end_ts"] - (time.time() if now is None else now)))
+        return int(state.get("seconds", 0))
+
+    def cycle_position(self):
+        """(рабочих сессий в цикле, длина цикла)"""
+        every = max(1, int(self.state.get("long_break_every", 4)))
+        return self.state.get("completed_work", 0) % every, every
+
+    def task_title(self, task_id):
+        task = self.data_manager.get_task(task_id) if task_id else None
+        return task.get("title", "") if task else ""
+
+    def set_setting(self, key, value):
+        """Сохраняет числовую настройку; True — если значение изменилось"""
+        try:
+            number = int(value)
+        except (TypeError, ValueError):
+            return False
+        if number <= 0 or str(self.state.get(key)) == str(number):
+            return False
+        self.state[key] = str(number) if key == "time_input_value" else number
+        self.save()
+        return True
+
+    def _start_phase(self, phase, task_id=None, now=None):
+        """Запускает отсчёт фазы с полной длительностью"""
+        state = self.state
+        now = time.time() if now is None else now
+        state["phase"] = phase
+        state["seconds"] = phase_minutes(state, phase) * 60
+        if phase == WORK:
+            state["task_id"] = task_id
+        state["started_ts"] = now
+        state["end_ts"] = now + state["seconds"]
+        state["running"] = True
+
+    def toggle(self, minutes, task_id=None, now=None):
+        """Старт, пауза или продолжение.
+
+        Возвращает длительность работы в минутах, если началась новая сессия, иначе None.
+        """
+        state = self.state
+        now = time.time() if now is None else now
+        started = None
+        if state.get("running"):
+            state["seconds"] = self.remaining(now)
+            state["running"] = False
+            state["end_ts"] = None
+        elif int(state.get("seconds", 0)) <= 0:
+            # Новая сессия
+            try:
+                minutes = int(minutes or state.get("time_input_value", "25"))
+            except ValueError:
+                minutes = 0
+            if minutes <= 0:
+                minutes = 25
+            state["time_input_value"] = str(minutes)
+            started = minutes
+            self._start_phase(state.get("phase", WORK), task_id, now)
+        else:
+            # Продолжение после паузы
+            state["running"] = True
+            state["end_ts"] = now + int(state["seconds"])
+            if state.get("started_ts") is None:
+                state["started_ts"] = now
+                state["task_id"] = task_id
+        self.save()
+        return started
+
+    def reset(self):
+        state = self.state
+        state["running"] = False
+        state["seconds"] = 0
+        state["end_ts"] = None
+        state["started_ts"] = None
+        state["phase"] = WORK
+        state["completed_work"] = 0
+        self.save()
+
+    def finish_session(self, now=None):
+        """Завершает сессию, если её время вышло: запись в историю и следующая фаза цикла.
+
+        Возвращает True, если сессия завершена.
+        """
+        state = self.state
+        now = time.time() if now is None else now
+        end_ts = state.get("end_ts")
+        if not state.get("running") or end_ts is None or end_ts > now:
+            return False
+        phase = state.get("phase", WORK)
+        self.data_manager.log_pomodoro_session(
+            phase, state.get("started_ts") or end_ts, end_ts,
+            state.get("task_id") if phase == WORK else None,
+        )
+        if phase == WORK:
+            state["completed_work"] = state.get("completed_work", 0) + 1
+        elif phase == LONG_BREAK:
+            state["completed_work"] = 0
+
+        following = next_phase(state)
+        queue = state.setdefault("queue", [])
+        if following != WORK:
+            # После работы перерыв начинается сам
+            self._start_phase(following, now=now)
+        elif queue:
+            # Следующая сессия из очереди
+            self._start_phase(WORK, queue.pop(0).get("task_id"), now)
+        else:
+            state["phase"] = WORK
+            state["running"] = False
+            state["seconds"] = 0
+            state["end_ts"] = None
+            state["started_ts"] = None
+        self.save()
+        return True
+
+    def enqueue(self, task_id=None):
+        self.state.setdefault("queue", []).append({"task_id": task_id})
+        self.save()
+
+    def clear_queue(self):
+        self.state["queue"] = []
+        self.save()
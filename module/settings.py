@@ -1,8 +1,20 @@
 """
 Модуль настроек
 """
+import time
+
 import flet as ft
 
+from module import perf
+from module.data_manager import DATA_DIR, THEME_CHANGED
+from module.scheduler import get_timer_heap
+from module.ui import update_controls
+
+# Сколько операций показывать в таблице замеров
+PERF_ROWS_LIMIT = 15
+# Период живого обновления таблицы (секунды)
+PERF_REFRESH_INTERVAL = 1.0
+
 
 def create_settings_page(page, data_manager):
     """Создает страницу настроек"""
@@ -23,12 +35,96 @@ def create_settings_page(page, data_manager):
         page.theme_mode = ft.ThemeMode.DARK if is_dark else ft.ThemeMode.LIGHT
         
         # Сохраняем тему в данные
-        data_manager.data["theme"] = theme
-        data_manager.save()
+        data_manager.set_value("theme", theme)
         
         page.update()
     
-    return ft.Container(
+    def on_theme_changed(events):
+        """Синхронизирует переключатель с текущей темой"""
+        theme_switch.value = data_manager.get_data().get("theme", "light") == "dark"
+        update_controls(theme_switch)
+    
+    unsubscribe = data_manager.subscribe(on_theme_changed, THEME_CHANGED)
+
+    # Производительность: таблица замеров горячих путей
+    perf_state = {"visible": True, "timer": None}
+    timers = get_timer_heap(page)
+    perf_switch = ft.Switch(label="Собирать замеры", value=perf.recorder.enabled)
+    perf_table = ft.Column(spacing=2)
+    perf_status = ft.Text("", size=12)
+
+    def perf_row(cells, bold=False):
+        widths = (260, 70, 80, 80, 80, 80)
+        return ft.Row([
+            ft.Text(cell, width=width, size=12, weight=ft.FontWeight.BOLD if bold else None)
+            for cell, width in zip(cells, widths)
+        ], spacing=5)
+
+    def render_perf():
+        """Перерисовывает таблицу замеров"""
+        operations = perf.recorder.snapshot()["operations"]
+        rows = [perf_row(("Операция", "Вызовов", "Среднее", "p50", "p95", "Макс, мс"), bold=True)]
+        for name, stats in list(operations.items())[:PERF_ROWS_LIMIT]:
+            rows.append(perf_row((
+                name, str(stats["count"]), f"{stats['mean']:.2f}",
+                f"{stats['p50']:.2f}", f"{stats['p95']:.2f}", f"{stats['max']:.2f}",
+            )))
+        if not operations:
+            rows.append(ft.Text("Замеров пока нет", size=12))
+        perf_table.controls = rows
+        update_controls(perf_table, perf_status)
+
+    def schedule_perf():
+        """Живое обновление раз в секунду — только пока страница видна и сбор включён"""
+        if perf_state["timer"] is not None:
+            timers.cancel(perf_state["timer"])
+            perf_state["timer"] = None
+        if perf_state["visible"] and perf.recorder.enabled:
+            perf_state["timer"] = timers.call_later(PERF_REFRESH_INTERVAL, on_perf_timer)
+
+    def on_perf_timer():
+        perf_state["timer"] = None
+        render_perf()
+        schedule_perf()
+
+    def toggle_perf(e):
+        perf.set_enabled(e.control.value)
+        perf_status.value = ""
+        render_perf()
+        schedule_perf()
+
+    def reset_perf(e):
+        perf.recorder.reset()
+        perf_status.value = "Замеры сброшены"
+        render_perf()
+
+    def export_perf(e):
+        path = perf.recorder.export(DATA_DIR / f"perf_{time.strftime('%Y%m%d_%H%M%S')}.json")
+        perf_status.value = f"Сохранено: {path}"
+        render_perf()
+
+    perf_switch.on_change = toggle_perf
+
+    def on_activate(changes):
+        perf_state["visible"] = True
+        perf_switch.value = perf.recorder.enabled
+        update_controls(perf_switch)
+        render_perf()
+        schedule_perf()
+
+    def on_deactivate():
+        perf_state["visible"] = False
+        schedule_perf()
+
+    def dispose():
+        perf_state["visible"] = False
+        schedule_perf()
+        unsubscribe()
+
+    render_perf()
+    schedule_perf()
+    
+    view = ft.Container(
         content=ft.Column([
             # Заголовок
             ft.Text(
@@ -54,6 +150,26 @@ def create_settings_page(page, data_manager):
                 margin=ft.Margin(0, 20, 0, 0)
             ),
             
+            # Производительность
+            ft.Card(
+                content=ft.Container(
+                    content=ft.Column([
+                        ft.Text("Производительность", size=18, weight=ft.FontWeight.BOLD),
+                        ft.Text("Время сохранения, загрузки, построения и обновления страниц", size=14),
+                        perf_switch,
+                        perf_table,
+                        ft.Row([
+                            ft.OutlinedButton("Обновить", icon=ft.Icons.REFRESH, on_click=lambda e: render_perf()),
+                            ft.OutlinedButton("Сбросить", icon=ft.Icons.DELETE_SWEEP, on_click=reset_perf),
+                            ft.OutlinedButton("Экспорт", icon=ft.Icons.SAVE_ALT, on_click=export_perf),
+                        ], spacing=10),
+                        perf_status,
+                    ], spacing=10),
+                    padding=20
+                ),
+                margin=ft.Margin(0, 20, 0, 0)
+            ),
+
             # Информация о приложении
             ft.Card(
                 content=ft.Container(
@@ -69,7 +185,12 @@ def create_settings_page(page, data_manager):
             )
         ], 
         spacing=20,
+        scroll=ft.ScrollMode.AUTO,
         expand=True),
         padding=20,
         expand=True
     )
+    view.on_activate = on_activate
+    view.on_deactivate = on_deactivate
+    view.on_dispose = dispose
+    return view
@@ -0,0 +1,182 @@
+"""
+Хранилище по разделам: задачи, привычки, помодоро и настройки — в отдельных файлах data/shards.
+
+У каждого раздела свой номер версии и свой признак изменения: смена темы
+переписывает только settings, отметка привычки — только habits, а большой
+файл задач не трогается. Разделы можно читать по отдельности — вкладка
+загружает только то, что ей нужно.
+"""
+import os
+import threading
+
+import msgpack
+
+from module.data_manager import (
+    DATA_DIR, DEFERRED, LOAD_CHUNK, SNAPSHOT_FORMAT, encode_snapshot, ensure_data_dir, iter_sections,
+    load_data, newest_file, snapshot_file, stream_file,
+)
+
+SHARDS_DIR = DATA_DIR / "shards"
+
+# Порядок чтения: маленькие разделы первыми
+SHARDS = ("settings", "pomodoro", "habits", "tasks")
+# Разделы, которые читаются всегда (тема нужна до первого кадра)
+SMALL_SHARDS = ("settings", "pomodoro")
+# Ключ версии раздела внутри файла
+VERSION_KEY = "_version"
+
+EXTENSIONS = {"json": ".json", "msgpack": ".msgpack"}
+
+
+def shard_of_key(key):
+    """Раздел для ключа верхнего уровня: всё, кроме задач, привычек и помодоро, — настройки"""
+    return key if key in ("tasks", "habits", "pomodoro") else "settings"
+
+
+def shard_of_change(change):
+    """Раздел, который меняет запись изменения"""
+    op = change.get("op", "")
+    if op == "set":
+        return shard_of_key(change.get("key"))
+    if op.startswith(("task_", "subtask_")):
+        return "tasks"
+    if op.startswith("habit_"):
+        return "habits"
+    return None
+
+
+def dirty_shards(changes):
+    """Разделы, затронутые изменениями (None — все)"""
+    if changes is None:
+        return set(SHARDS)
+    return {shard_of_change(change) for change in changes} - {None}
+
+
+def shard_payload(shard, data):
+    """Содержимое раздела из общих данных"""
+    if shard == "settings":
+        return {key: value for key, value in data.items() if shard_of_key(key) == "settings"}
+    if shard == "pomodoro":
+        return {"pomodoro": data["pomodoro"]} if "pomodoro" in data else {}
+    return {shard: data.get(shard, [])}
+
+
+class ShardedStorage:
+    """Каждый раздел — отдельный файл в формате снимка с номером версии"""
+
+    def __init__(self, shards_dir=SHARDS_DIR, fmt=None):
+        self.shards_dir = shards_dir
+        self.format = fmt or SNAPSHOT_FORMAT
+        self.loaded = set()  # прочитанные до конца разделы: непрочитанные не записываются
+        self.streaming = set()  # разделы, которые читаются прямо сейчас
+        self.versions = dict.fromkeys(SHARDS, 0)
+        self.writes = dict.fromkeys(SHARDS, 0)
+        self._lock = threading.Lock()
+
+    def _files(self, shard):
+        return [self.shards_dir / f"{shard}{ext}" for ext in EXTENSIONS.values()]
+
+    def exists(self):
+        """Есть ли хотя бы один файл раздела (иначе данные ещё в общем снимке)"""
+        return any(path.exists() for shard in SHARDS for path in self._files(shard))
+
+    def shard_file(self, shard):
+        """Файл раздела в формате записи"""
+        return self.shards_dir / f"{shard}{EXTENSIONS[self.format]}"
+
+    def unloaded_shards(self):
+        return [shard for shard in SHARDS if shard not in self.loaded and shard not in self.streaming]
+
+    def load(self):
+        data = {"tasks": [], "habits": [], "theme": "light"}
+        for key, value, _ in self.stream():
+            if key in ("tasks", "habits"):
+                data[key].extend(value)
+            else:
+                data[key] = value
+        return data
+
+    def stream(self, chunk_size=LOAD_CHUNK, shards=None):
+        """Разделы в формате stream_data(); shards — какие читать (None — все непрочитанные).
+
+        Маленькие разделы читаются всегда. При первом запуске данные переносятся
+        из общего снимка app_data.*.
+        """
+        ensure_data_dir()
+        if not self.exists() and snapshot_file() is not None:
+            yield from self._migrate(chunk_size)
+            return
+        wanted = set(SMALL_SHARDS) | set(SHARDS if shards is None else shards)
+        for shard in SHARDS:
+            with self._lock:
+                if shard not in wanted or shard in self.loaded or shard in self.streaming:
+                    continue
+                self.streaming.add(shard)
+            try:
+                yield from self._stream_shard(shard, chunk_size)
+            except (ValueError, IOError, msgpack.UnpackException):
+                # Повреждённый раздел начинается с пустого списка и перезаписывается при сохранении
+                self.loaded.add(shard)
+                raise
+            finally:
+                self.streaming.discard(shard)
+            # Раздел считается прочитанным (и записывается) только когда дочитан до конца
+            self.loaded.add(shard)
+
+    def _stream_shard(self, shard, chunk_size):
+        path = newest_file(self._files(shard))
+        if path is None:
+            if shard in ("tasks", "habits"):
+                yield shard, [], 1.0
+            elif shard == "settings":
+                yield "theme", "light", 1.0
+            return
+        for key, value, progress in stream_file(path, chunk_size):
+            if key == VERSION_KEY:
+                self.versions[shard] = value
+            else:
+                yield key, value, progress
+
+    def _migrate(self, chunk_size):
+        """Переносит общий снимок в разделы"""
+        data = load_data()
+        self.loaded.update(SHARDS)
+        self.write(data, None)
+        yield from iter_sections(data, chunk_size)
+
+    def replay(self):
+        return []
+
+    def write(self, data, changes):
+        """Переписывает только изменённые и уже прочитанные разделы"""
+        ensure_data_dir()
+        self.shards_dir.mkdir(parents=True, exist_ok=True)
+        dirty = dirty_shards(changes)
+        if dirty & self.streaming:
+            # Раздел ещё дочитывается: запись частичного списка потеряла бы остаток
+            return DEFERRED
+        dirty &= self.loaded
+        ok = True
+        with self._lock:
+            for shard in SHARDS:
+                if shard in dirty:
+                    ok = self._write_shard(shard, data) and ok
+        return ok
+
+    def _write_shard(self, shard, data):
+        version = self.versions[shard] + 1
+        payload = {VERSION_KEY: version, **shard_payload(shard, data)}
+        path = self.shard_file(shard)
+        tmp_file = path.with_name(path.name + ".tmp")
+        try:
+            with open(tmp_file, 'wb') as f:
+                f.write(encode_snapshot(payload, self.format))
+            os.replace(tmp_file, path)
+        except IOError:
+            return False
+        self.versions[shard] = version
+        self.writes[shard] += 1
+        return True
+
+    def close(self):
+        pass
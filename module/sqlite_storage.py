@@ -0,0 +1,353 @@
+"""
+Хранилище данных в SQLite: задачи, подзадачи, привычки и настройки в отдельных таблицах
+"""
+import bisect
+import json
+import sqlite3
+import threading
+from pathlib import Path
+
+from module.data_manager import DATA_DIR, DATA_FILE, ensure_data_dir, load_data
+from module.sharded_storage import SHARDS_DIR, ShardedStorage
+
+DB_FILE = DATA_DIR / "app_data.db"
+# Версия базы в PRAGMA user_version: 1 — перенос из JSON завершён
+SCHEMA_VERSION = 1
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    id TEXT PRIMARY KEY,
+    position INTEGER NOT NULL,
+    title TEXT NOT NULL DEFAULT '',
+    description TEXT NOT NULL DEFAULT '',
+    completed INTEGER NOT NULL DEFAULT 0,
+    coefficient INTEGER NOT NULL DEFAULT 1,
+    extra TEXT
+);
+CREATE TABLE IF NOT EXISTS subtasks (
+    id TEXT NOT NULL,
+    task_id TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    title TEXT NOT NULL DEFAULT '',
+    completed INTEGER NOT NULL DEFAULT 0,
+    extra TEXT,
+    PRIMARY KEY (task_id, id)
+);
+CREATE TABLE IF NOT EXISTS habits (
+    id TEXT PRIMARY KEY,
+    position INTEGER NOT NULL,
+    name TEXT NOT NULL DEFAULT '',
+    count INTEGER NOT NULL DEFAULT 0,
+    extra TEXT
+);
+CREATE TABLE IF NOT EXISTS settings (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_tasks_completed ON tasks(completed);
+CREATE INDEX IF NOT EXISTS idx_tasks_coefficient ON tasks(coefficient, completed);
+CREATE INDEX IF NOT EXISTS idx_subtasks_task ON subtasks(task_id, position);
+"""
+
+# Поля записей, у которых есть собственные колонки; остальные хранятся в extra (JSON)
+TASK_COLUMNS = ("title", "description", "completed", "coefficient")
+SUBTASK_COLUMNS = ("title", "completed")
+HABIT_COLUMNS = ("name", "count")
+BOOL_COLUMNS = ("completed",)
+# Значения колонок вместо null (в старых данных поля бывают null, а колонки — NOT NULL)
+COLUMN_DEFAULTS = {"title": "", "description": "", "completed": 0, "coefficient": 1, "name": "", "count": 0}
+
+
+def _split_fields(fields, columns):
+    """Делит поля записи на колонки таблицы и остаток для extra"""
+    values = {}
+    extra = {}
+    for key, value in fields.items():
+        if key in columns:
+            if value is None:
+                value = COLUMN_DEFAULTS[key]
+            values[key] = int(value) if key in BOOL_COLUMNS else value
+        else:
+            extra[key] = value
+    return values, extra
+
+
+def _row_to_record(row, columns, extra):
+    """Собирает словарь записи из строки таблицы"""
+    record = {"id": row["id"]}
+    for key in columns:
+        record[key] = bool(row[key]) if key in BOOL_COLUMNS else row[key]
+    if extra:
+        record.update(json.loads(extra))
+    return record
+
+
+class SqliteStorage:
+    """Хранилище в SQLite: каждое изменение — одна-две строки UPDATE/INSERT/DELETE"""
+
+    def __init__(self, db_file=DB_FILE, json_file=DATA_FILE, shards_dir=SHARDS_DIR):
+        self.db_file = Path(db_file)
+        self.json_file = Path(json_file)
+        self.shards_dir = Path(shards_dir)
+        self._lock = threading.Lock()
+        self._conn = None
+        self._next_position = {"tasks": 0, "habits": 0}
+
+    def _connect(self):
+        if self._conn is None:
+            ensure_data_dir()
+            self._conn = sqlite3.connect(self.db_file, check_same_thread=False)
+            self._conn.row_factory = sqlite3.Row
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.executescript(SCHEMA)
+        return self._conn
+
+    def load(self):
+        conn = self._connect()
+        if conn.execute("PRAGMA user_version").fetchone()[0] < SCHEMA_VERSION:
+            self._migrate()
+
+        with self._lock:
+            subtasks_by_task = {}
+            for row in conn.execute("SELECT * FROM subtasks ORDER BY task_id, position"):
+                subtasks_by_task.setdefault(row["task_id"], []).append(
+                    _row_to_record(row, SUBTASK_COLUMNS, row["extra"])
+                )
+            tasks = []
+            for row in conn.execute("SELECT * FROM tasks ORDER BY position"):
+                task = _row_to_record(row, TASK_COLUMNS, row["extra"])
+                task["subtasks"] = subtasks_by_task.get(row["id"], [])
+                tasks.append(task)
+            habits = [
+                _row_to_record(row, HABIT_COLUMNS, row["extra"])
+                for row in conn.execute("SELECT * FROM habits ORDER BY position")
+            ]
+            data = {"tasks": tasks, "habits": habits, "theme": "light"}
+            for row in conn.execute("SELECT key, value FROM settings"):
+                data[row["key"]] = json.loads(row["value"])
+            self._next_position["tasks"] = self._max_position("tasks") + 1
+            self._next_position["habits"] = self._max_position("habits") + 1
+        return data
+
+    def _max_position(self, table):
+        row = self._conn.execute(f"SELECT MAX(position) FROM {table}").fetchone()
+        return row[0] if row[0] is not None else -1
+
+    def _migrate(self):
+        """Перенос данных прежнего хранилища: данные и отметка о завершении — одной транзакцией.
+
+        Если перенос прервался, отметки нет, и он повторяется при следующем запуске.
+        """
+        conn = self._conn
+        with self._lock, conn:
+            # Заполненная база без отметки — перенос уже прошёл (базы, созданные до отметки)
+            if not self._has_rows():
+                data = self._legacy_data()
+                if data is not None:
+                    self._write_all(data)
+            conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+    def _legacy_data(self):
+        """Данные прежнего хранилища: разделы data/shards (режим по умолчанию), иначе app_data.json.
+
+        При хранении по разделам app_data.json — устаревшая копия до их появления.
+        """
+        shards = ShardedStorage(self.shards_dir)
+        if shards.exists():
+            return shards.load()
+        if self.json_file.exists():
+            return load_data()
+        return None
+
+    def _has_rows(self):
+        return any(
+            self._conn.execute(f"SELECT 1 FROM {table} LIMIT 1").fetchone()
+            for table in ("tasks", "habits", "settings")
+        )
+
+    def write(self, data, changes):
+        with self._lock:
+            conn = self._connect()
+            try:
+                with conn:
+                    if changes is None:
+                        self._write_all(data)
+                    else:
+                        for change in changes:
+                            self._apply(change)
+            except sqlite3.Error:
+                return False
+        return True
+
+    def _write_all(self, data):
+        """Полная перезапись всех таблиц (используется при миграции и запросе снимка)"""
+        conn = self._conn
+        conn.execute("DELETE FROM tasks")
+        conn.execute("DELETE FROM subtasks")
+        conn.execute("DELETE FROM habits")
+        conn.execute("DELETE FROM settings")
+        for position, task in enumerate(data.get("tasks", [])):
+            self._insert_task(task, position)
+        for position, habit in enumerate(data.get("habits", [])):
+            self._insert_habit(habit, position)
+        for key, value in data.items():
+            if key not in ("tasks", "habits"):
+                self._set(key, value)
+        self._next_position["tasks"] = len(data.get("tasks", []))
+        self._next_position["habits"] = len(data.get("habits", []))
+
+    def _insert_task(self, task, position):
+        fields = {k: v for k, v in task.items() if k not in ("id", "subtasks")}
+        values, extra = _split_fields(fields, TASK_COLUMNS)
+        self._conn.execute(
+            "INSERT OR IGNORE INTO tasks (id, position, title, description, completed, coefficient, extra)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (
+                task["id"], position,
+                values.get("title", ""), values.get("description", ""),
+                values.get("completed", 0), values.get("coefficient", 1),
+                json.dumps(extra, ensure_ascii=False) if extra else None,
+            ),
+        )
+        for sub_position, subtask in enumerate(task.get("subtasks", [])):
+            self._insert_subtask(task["id"], subtask, sub_position)
+
+    def _insert_subtask(self, task_id, subtask, position=None):
+        if position is None:
+            row = self._conn.execute(
+                "SELECT MAX(position) FROM subtasks WHERE task_id = ?", (task_id,)
+            ).fetchone()
+            position = row[0] + 1 if row[0] is not None else 0
+        fields = {k: v for k, v in subtask.items() if k != "id"}
+        values, extra = _split_fields(fields, SUBTASK_COLUMNS)
+        self._conn.execute(
+            "INSERT OR IGNORE INTO subtasks (id, task_id, position, title, completed, extra)"
+            " VALUES (?, ?, ?, ?, ?, ?)",
+            (
+                subtask["id"], task_id, position,
+                values.get("title", ""), values.get("completed", 0),
+                json.dumps(extra, ensure_ascii=False) if extra else None,
+            ),
+        )
+
+    def _insert_habit(self, habit, position):
+        fields = {k: v for k, v in habit.items() if k != "id"}
+        values, extra = _split_fields(fields, HABIT_COLUMNS)
+        self._conn.execute(
+            "INSERT OR IGNORE INTO habits (id, position, name, count, extra) VALUES (?, ?, ?, ?, ?)",
+            (
+                habit["id"], position, values.get("name", ""), values.get("count", 0),
+                json.dumps(extra, ensure_ascii=False) if extra else None,
+            ),
+        )
+
+    def _update(self, table, columns, key_sql, key_args, fields):
+        """UPDATE одной строки: колонки напрямую, прочие поля — слиянием в extra"""
+        values, extra = _split_fields(fields, columns)
+        if values:
+            assignments = ", ".join(f"{name} = ?" for name in values)
+            self._conn.execute(
+                f"UPDATE {table} SET {assignments} WHERE {key_sql}",
+                (*values.values(), *key_args),
+            )
+        if extra:
+            row = self._conn.execute(
+                f"SELECT extra FROM {table} WHERE {key_sql}", key_args
+            ).fetchone()
+            if row is None:
+                return
+            merged = json.loads(row["extra"]) if row["extra"] else {}
+            merged.update(extra)
+            self._conn.execute(
+                f"UPDATE {table} SET extra = ? WHERE {key_sql}",
+                (json.dumps(merged, ensure_ascii=False), *key_args),
+            )
+
+    def _set(self, key, value):
+        self._conn.execute(
+            "INSERT OR REPLACE INTO settings (key, value) VALUES (?, ?)",
+            (key, json.dumps(value, ensure_ascii=False)),
+        )
+
+    def _make_room(self, table, before, task_id=None):
+        """Освобождает позицию записи before (сдвигает её и следующие); None — места нет"""
+        if before is None:
+            return None
+        scope, args = ("task_id = ? AND ", (task_id,)) if task_id is not None else ("", ())
+        row = self._conn.execute(
+            f"SELECT position FROM {table} WHERE {scope}id = ?", (*args, before)
+        ).fetchone()
+        if row is None:
+            return None
+        self._conn.execute(
+            f"UPDATE {table} SET position = position + 1 WHERE {scope}position >= ?", (*args, row[0])
+        )
+        if table in self._next_position:
+            # Последняя запись тоже сдвинулась — следующая новая встанет после неё
+            self._next_position[table] += 1
+        return row[0]
+
+    def _apply(self, change):
+        """Переводит запись изменения в один-два SQL-запроса"""
+        op = change["op"]
+        conn = self._conn
+        if op == "set":
+            self._set(change["key"], change["value"])
+        elif op == "task_added":
+            position = self._make_room("tasks", change.get("before"))
+            if position is None:
+                position = self._next_position["tasks"]
+                self._next_position["tasks"] += 1
+            self._insert_task(change["task"], position)
+        elif op == "task_updated":
+            fields = dict(change["fields"])
+            subtasks = fields.pop("subtasks", None)
+            self._update("tasks", TASK_COLUMNS, "id = ?", (change["id"],), fields)
+            if subtasks is not None:
+                conn.execute("DELETE FROM subtasks WHERE task_id = ?", (change["id"],))
+                for position, subtask in enumerate(subtasks):
+                    self._insert_subtask(change["id"], subtask, position)
+        elif op == "task_removed":
+            conn.execute("DELETE FROM tasks WHERE id = ?", (change["id"],))
+            conn.execute("DELETE FROM subtasks WHERE task_id = ?", (change["id"],))
+        elif op == "subtask_added":
+            position = self._make_room("subtasks", change.get("before"), change["task_id"])
+            self._insert_subtask(change["task_id"], change["subtask"], position)
+        elif op == "subtask_updated":
+            self._update(
+                "subtasks", SUBTASK_COLUMNS, "task_id = ? AND id = ?",
+                (change["task_id"], change["id"]), change["fields"],
+            )
+        elif op == "subtask_removed":
+            conn.execute(
+                "DELETE FROM subtasks WHERE task_id = ? AND id = ?", (change["task_id"], change["id"])
+            )
+        elif op == "habit_added":
+            position = self._make_room("habits", change.get("before"))
+            if position is None:
+                position = self._next_position["habits"]
+                self._next_position["habits"] += 1
+            self._insert_habit(change["habit"], position)
+        elif op == "habit_updated":
+            self._update("habits", HABIT_COLUMNS, "id = ?", (change["id"],), change["fields"])
+        elif op == "habit_checked_in":
+            row = conn.execute(
+                "SELECT count, extra FROM habits WHERE id = ?", (change["id"],)
+            ).fetchone()
+            if row is None or row["count"] >= change["count"]:
+                return
+            extra = json.loads(row["extra"]) if row["extra"] else {}
+            bisect.insort(extra.setdefault("days", []), change["day"])
+            conn.execute(
+                "UPDATE habits SET count = ?, extra = ? WHERE id = ?",
+                (change["count"], json.dumps(extra, ensure_ascii=False), change["id"]),
+            )
+        elif op == "habit_removed":
+            conn.execute("DELETE FROM habits WHERE id = ?", (change["id"],))
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
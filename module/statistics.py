@@ -0,0 +1,178 @@
+"""
+Модуль статистики привычек и задач
+"""
+import flet as ft
+
+from module.analytics import Analytics
+from module.data_manager import (
+    DATA_REPLACED, HABIT_ADDED, HABIT_EVENTS, HABIT_REMOVED, HABIT_UPDATED, TASK_EVENTS, TASKS_LOADED,
+)
+from module.habit_stats import today_ordinal
+from module.perf import timed
+from module.ui import update_controls
+
+PERIODS = {"30": "30 дней", "90": "90 дней", "365": "Год"}
+WEEKDAY_NAMES = ["Пн", "Вт", "Ср", "Чт", "Пт", "Сб", "Вс"]
+
+CELL_SIZE = 12
+BAR_HEIGHT = 60
+STRIP_WIDTH = 600
+
+
+def create_statistics_page(page, data_manager):
+    """Создает страницу статистики (тепловая карта, скользящие доли, дни недели, корреляции)"""
+    analytics = Analytics(data_manager)
+    state = {"visible": True, "dirty": False}
+
+    habit_dropdown = ft.Dropdown(label="Привычка", width=300)
+    period_dropdown = ft.Dropdown(
+        label="Период",
+        width=150,
+        value="90",
+        options=[ft.dropdown.Option(key=k, text=v) for k, v in PERIODS.items()],
+    )
+
+    heatmap_row = ft.Row(spacing=2, scroll=ft.ScrollMode.AUTO)
+    heat_cells = []  # столбцы-недели по 7 клеток; переиспользуются при том же размере
+    rates_text = ft.Text("", size=14)
+    rolling_row = ft.Row(spacing=1, vertical_alignment=ft.CrossAxisAlignment.END, height=BAR_HEIGHT)
+    weekday_row = ft.Row(spacing=10, vertical_alignment=ft.CrossAxisAlignment.END)
+    correlations_column = ft.Column(spacing=5)
+
+    def day_range():
+        end = today_ordinal()
+        return end - int(period_dropdown.value or "90") + 1, end
+
+    def refresh_habit_options():
+        """Список привычек для выбора"""
+        habits = data_manager.get_data().get("habits", [])
+        habit_dropdown.options = [
+            ft.dropdown.Option(key=h["id"], text=h.get("name", "")) for h in habits
+        ]
+        if data_manager.get_habit(habit_dropdown.value) is None:
+            habit_dropdown.value = habits[0]["id"] if habits else None
+
+    def render_heatmap(habit_id, start, end):
+        grid = analytics.heatmap(habit_id, start, end)
+        weeks = grid.shape[1]
+        if len(heat_cells) != weeks:
+            heat_cells.clear()
+            for _ in range(weeks):
+                heat_cells.append([
+                    ft.Container(width=CELL_SIZE, height=CELL_SIZE, border_radius=2)
+                    for _ in range(7)
+                ])
+            heatmap_row.controls = [ft.Column(cells, spacing=2) for cells in heat_cells]
+        for week, cells in enumerate(heat_cells):
+            for weekday, cell in enumerate(cells):
+                value = grid[weekday, week]
+                cell.bgcolor = (
+                    ft.Colors.GREEN_400 if value == 1
+                    else ft.Colors.GREY_300 if value == 0
+                    else ft.Colors.TRANSPARENT
+                )
+
+    def render_rates(habit_id, start, end):
+        weekly = analytics.rolling_rate(habit_id, start, end, 7)
+        monthly = analytics.rolling_rate(habit_id, start, end, 30)
+        rates_text.value = f"За 7 дней: {weekly[-1]:.0%} · За 30 дней: {monthly[-1]:.0%}"
+        width = max(1, STRIP_WIDTH // len(weekly) - 1)
+        rolling_row.controls = [
+            ft.Container(width=width, height=max(1, rate * BAR_HEIGHT), bgcolor=ft.Colors.BLUE_300)
+            for rate in weekly
+        ]
+
+    def render_weekdays(habit_id, start, end):
+        profile = analytics.weekday_profile(habit_id, start, end)
+        weekday_row.controls = [
+            ft.Column([
+                ft.Container(width=24, height=max(1, rate * BAR_HEIGHT), bgcolor=ft.Colors.ORANGE_300),
+                ft.Text(name, size=12),
+                ft.Text(f"{rate:.0%}", size=10),
+            ], spacing=2, horizontal_alignment=ft.CrossAxisAlignment.CENTER)
+            for name, rate in zip(WEEKDAY_NAMES, profile)
+        ]
+
+    def render_correlations(start, end):
+        correlations = analytics.task_correlations(start, end)
+        rows = []
+        for habit in data_manager.get_data().get("habits", []):
+            r = correlations.get(habit["id"])
+            rows.append(ft.Text(
+                f"{habit.get('name', '')}: " + ("недостаточно данных" if r is None else f"{r:+.2f}"),
+                size=14,
+            ))
+        correlations_column.controls = rows or [ft.Text("Нет привычек", size=14)]
+
+    @timed("statistics.render")
+    def render():
+        """Перерисовывает все блоки (результаты берутся из кэша аналитики)"""
+        state["dirty"] = False
+        start, end = day_range()
+        habit_id = habit_dropdown.value
+        if habit_id:
+            render_heatmap(habit_id, start, end)
+            render_rates(habit_id, start, end)
+            render_weekdays(habit_id, start, end)
+        else:
+            heat_cells.clear()
+            heatmap_row.controls = []
+            rates_text.value = "Нет привычек"
+            rolling_row.controls = []
+            weekday_row.controls = []
+        render_correlations(start, end)
+        update_controls(heatmap_row, rates_text, rolling_row, weekday_row, correlations_column)
+
+    habit_dropdown.on_select = lambda e: render()
+    period_dropdown.on_select = lambda e: render()
+
+    def on_data_events(events):
+        """Сбрасывает затронутые результаты; перерисовка — сразу или при показе вкладки"""
+        analytics.apply_events(events)
+        if any(e.type in (HABIT_ADDED, HABIT_REMOVED, HABIT_UPDATED, DATA_REPLACED) for e in events):
+            refresh_habit_options()
+            update_controls(habit_dropdown)
+        if state["visible"]:
+            render()
+        else:
+            state["dirty"] = True
+
+    unsubscribe = data_manager.subscribe(
+        on_data_events, *HABIT_EVENTS, *TASK_EVENTS, TASKS_LOADED, DATA_REPLACED
+    )
+
+    def on_activate(changes):
+        state["visible"] = True
+        if state["dirty"]:
+            render()
+
+    def on_deactivate():
+        state["visible"] = False
+
+    refresh_habit_options()
+    render()
+
+    def section(title, *controls):
+        return ft.Card(
+            content=ft.Container(
+                content=ft.Column([ft.Text(title, size=18, weight=ft.FontWeight.BOLD), *controls], spacing=10),
+                padding=20
+            )
+        )
+
+    view = ft.Container(
+        content=ft.Column([
+            ft.Text("Статистика", size=28, weight=ft.FontWeight.BOLD),
+            ft.Row([habit_dropdown, period_dropdown], spacing=10),
+            section("Календарь", heatmap_row),
+            section("Доля выполнения (скользящее окно 7 дней)", rates_text, rolling_row),
+            section("По дням недели", weekday_row),
+            section("Связь с выполненными задачами", correlations_column),
+        ], spacing=15, scroll=ft.ScrollMode.AUTO, expand=True),
+        padding=20,
+        expand=True
+    )
+    view.on_activate = on_activate
+    view.on_deactivate = on_deactivate
+    view.on_dispose = unsubscribe
+    return view
@@ -1,19 +1,41 @@
 """
 Модуль To-do list
 """
+import csv
 import flet as ft
-import uuid
+import threading
+import time
+
+from module.data_manager import DATA_REPLACED, TASK_ADDED, TASK_EVENTS, TASKS_LOADED, changed_task_ids
+from module.perf import timed
+from module.search_index import SearchIndex
+from module.services import COEFFICIENTS, TaskService
+from module.ui import update_controls
+from module.virtual_list import VirtualList
+
+# Запросы короче этого (1–2 буквы) ищутся дольше всего и обычно сразу дописываются:
+# поиск по ним ждёт паузу в наборе (секунды)
+SHORT_QUERY_LENGTH = 3
+SHORT_QUERY_DELAY = 0.25
 
 
 def create_todo_list_page(page, data_manager):
     """Создает страницу To-do list"""
+    tasks = TaskService(data_manager)
     
-    # Контейнер для списка задач (левый)
-    tasks_list = ft.Column(
-        scroll=ft.ScrollMode.AUTO,
-        spacing=10,
-        expand=True
-    )
+    # Режим выбора: отмеченные задачи для пакетных действий
+    selection = {"active": False, "ids": set()}
+    
+    def build_card(task_id):
+        """Строит карточку, когда задача попадает в видимое окно списка"""
+        task = tasks.get(task_id)
+        card = create_task_card(task, tasks, page, show_task_details, selection, on_select)
+        card.signature = task_signature(task)
+        return card
+    
+    # Список задач (левый): карточки строятся лениво, только около видимой области
+    virtual_tasks = VirtualList(build_card, spacing=10, expand=True)
+    tasks_list = virtual_tasks.control
     
     # Правый контейнер (пока пустой)
     right_container = ft.Container(
@@ -22,6 +44,19 @@ def create_todo_list_page(page, data_manager):
         expand=True
     )
     
+    # Поиск по названиям, описаниям и подзадачам: индекс строится в фоне
+    search_index = SearchIndex(tasks.get)
+    search_state = {"query": ""}
+    # RLock: события задач могут прийти, пока поток поиска держит блокировку
+    search_lock = threading.RLock()
+    search_field = ft.TextField(
+        hint_text="Поиск",
+        prefix_icon=ft.Icons.SEARCH,
+        on_change=lambda e: on_search_change(e.control.value)
+    )
+    # Сколько найдено, если в списке показана только часть результатов
+    search_info = ft.Text("", size=12, color=ft.Colors.GREY_600, visible=False)
+    
     # Поле ввода новой задачи
     task_input = ft.TextField(
         hint_text="напишите что-нибудь",
@@ -31,34 +66,16 @@ def create_todo_list_page(page, data_manager):
     
     def add_task(title):
         """Добавляет новую задачу"""
-        if not title or not title.strip():
+        if tasks.create(title) is None:
             return
         
-        task_id = str(uuid.uuid4())
-        new_task = {
-            "id": task_id,
-            "title": title.strip(),
-            "description": "",
-            "completed": False,
-            "coefficient": 1,
-            "subtasks": []
-        }
-        
-        # Добавляем напрямую в менеджер данных
-        tasks = data_manager.get_data().get("tasks", [])
-        tasks.append(new_task)
-        data_manager.data["tasks"] = tasks
-        data_manager.save()
-        
         task_input.value = ""
-        refresh_tasks_list()
-        page.update()
+        update_controls(task_input)
     
     def show_task_details(task_id):
         """Показывает детали задачи в правом контейнере"""
         # Загружаем актуальные данные задачи
-        tasks = data_manager.get_data().get("tasks", [])
-        task = next((t for t in tasks if t["id"] == task_id), None)
+        task = tasks.get(task_id)
         
         if task:
             # Название задачи
@@ -73,10 +90,8 @@ def create_todo_list_page(page, data_manager):
                 value=task.get("coefficient", 1),
                 label="Коэффициент приоритета",
                 options=[
-                    ft.dropdown.Option(1, "1 - Срочно и важно"),
-                    ft.dropdown.Option(2, "2 - Не срочно, но важно"),
-                    ft.dropdown.Option(3, "3 - Срочно, но не важно"),
-                    ft.dropdown.Option(4, "4 - Не срочно и не важно"),
+                    ft.dropdown.Option(value, f"{value} - {text}")
+                    for value, text in COEFFICIENTS.items()
                 ],
                 width=250
             )
@@ -84,8 +99,7 @@ def create_todo_list_page(page, data_manager):
             # Кнопка сохранения коэффициента
             def save_coefficient_click(e):
                 """Сохраняет выбранный коэффициент"""
-                coefficient_value = int(coefficient_dropdown.value) if coefficient_dropdown.value else 1
-                update_task_coefficient(task_id, coefficient_value, data_manager)
+                tasks.set_coefficient(task_id, coefficient_dropdown.value)
                 # Обновляем отображение для подтверждения сохранения
                 show_task_details(task_id)
             
@@ -105,7 +119,7 @@ def create_todo_list_page(page, data_manager):
                 min_lines=10,
                 max_lines=20,
                 expand=True,
-                on_blur=lambda e: update_task_description(task_id, e.control.value, data_manager)
+                on_blur=lambda e: tasks.set_description(task_id, e.control.value)
             )
             
             right_container.content = ft.Column([
@@ -121,46 +135,269 @@ def create_todo_list_page(page, data_manager):
         else:
             right_container.content = ft.Column([], spacing=15, expand=True)
         
-        page.update()
-    
-    def update_task_description(task_id, description, data_manager):
-        """Обновляет описание задачи"""
-        tasks = data_manager.get_data().get("tasks", [])
-        for task in tasks:
-            if task["id"] == task_id:
-                task["description"] = description
-                break
-        data_manager.data["tasks"] = tasks
-        data_manager.save()
-    
-    def update_task_coefficient(task_id, coefficient, data_manager):
-        """Обновляет коэффициент приоритета задачи"""
-        # Обновляем коэффициент напрямую в data_manager.data
-        tasks = data_manager.get_data().get("tasks", [])
-        # tasks = data_manager.data.get("tasks", [])
-        for task in tasks:
-            if task.get("id") == task_id:
-                task["coefficient"] = coefficient
-                break
-        # Сохраняем данные в файл
-        data_manager.data["tasks"] = tasks
-        data_manager.save()
-    
-    def refresh_tasks_list():
-        """Обновляет список задач"""
-        tasks_list.controls.clear()
+        update_controls(right_container)
+    
+    def current_keys():
+        """Ключи списка: результаты поиска или все задачи"""
+        if search_state["query"] and search_index.ready.is_set():
+            found = search_index.search_page(search_state["query"])
+            if found is not None:
+                found, total = found
+                show_search_info(len(found), total)
+                return found
+        show_search_info(0, 0)
+        return tasks.ids()
+    
+    def show_search_info(shown, total):
+        """Показывает, что список поиска обрезан (выбор «Все» берёт все найденные)"""
+        visible = total > shown
+        if visible:
+            search_info.value = f"Показаны первые {shown} из {total} найденных"
+        if visible or search_info.visible:
+            search_info.visible = visible
+            update_controls(search_info)
+    
+    def on_search_change(query):
+        if 0 < len(query.strip()) < SHORT_QUERY_LENGTH:
+            time.sleep(SHORT_QUERY_DELAY)
+        search_tasks(query)
+    
+    @timed("todo.search_tasks")
+    def search_tasks(query):
+        """Фильтрует список по запросу (обработчик идёт не в цикле событий Flet)"""
+        with search_lock:
+            if query != search_field.value:
+                # Пока ждали, запрос уже сменился — его обработает следующий вызов
+                return
+            search_state["query"] = query.strip()
+            refresh_tasks_list()
+    
+    def on_search_index_ready():
+        if search_state["query"]:
+            with search_lock:
+                refresh_tasks_list()
+    
+    @timed("todo.refresh_tasks_list")
+    def refresh_tasks_list(changed_ids=None, before=None):
+        """Сверяет список карточек с задачами по id.
         
-        # Загружаем задачи из менеджера
-        tasks = data_manager.get_data().get("tasks", [])
+        changed_ids — id изменённых задач: создаются, обновляются или удаляются
+        только их карточки. Без него сверяется весь список, но обновляются
+        только уже построенные карточки изменившихся задач.
+        before — id добавленной задачи -> id задачи, перед которой она стоит.
+        """
+        if changed_ids is not None and not search_state["query"]:
+            patch_tasks(changed_ids, before or {})
+            return
+        
+        new_ids = current_keys()
+        changed_cards = patch_cards(
+            task_id for task_id, _ in list(virtual_tasks.cached_items())
+        )
         
-        for task in tasks:
-            task_card = create_task_card(task, data_manager, refresh_tasks_list, page, show_task_details)
-            tasks_list.controls.append(task_card)
+        if new_ids != virtual_tasks.keys:
+            # Состав или порядок изменился — окно перестраивается по новым ключам
+            virtual_tasks.set_keys(new_ids)
+        else:
+            update_controls(*changed_cards)
+    
+    def patch_cards(task_ids):
+        """Обновляет построенные карточки, если их задачи изменились"""
+        changed_cards = []
+        for task_id in task_ids:
+            card = virtual_tasks.cached(task_id)
+            task = tasks.get(task_id)
+            if card is None or task is None:
+                continue
+            signature = task_signature(task)
+            if card.signature != signature:
+                card.refresh_card(task)
+                card.signature = signature
+                if virtual_tasks.is_shown(task_id):
+                    changed_cards.append(card)
+        return changed_cards
+    
+    def patch_tasks(changed_ids, before):
+        """Применяет изменения только для указанных задач"""
+        changed = []
+        added = []
+        removed = []
+        for task_id in changed_ids:
+            if tasks.get(task_id) is None:
+                removed.append(task_id)
+            elif task_id not in virtual_tasks:
+                # Новые задачи добавляются в конец списка
+                added.append(task_id)
+            else:
+                changed.append(task_id)
+        if len(removed) == 1:
+            virtual_tasks.remove(removed[0])
+        elif removed:
+            # Удаление пачкой (архивирование) — одна перестройка окна
+            removed = set(removed)
+            virtual_tasks.set_keys([key for key in virtual_tasks.keys if key not in removed])
+        if any(task_id in before for task_id in added):
+            # Задачи вернулись на прежние места: одна — вставкой, несколько — одной перестройкой
+            if len(added) == 1:
+                virtual_tasks.insert(added[0], before[added[0]])
+            else:
+                virtual_tasks.set_keys(tasks.ids())
+        elif len(added) == 1:
+            virtual_tasks.append(added[0])
+        elif added:
+            # Порция задач (потоковая загрузка, импорт) — одним обновлением
+            virtual_tasks.extend(added)
+        update_controls(*patch_cards(changed))
     
     def add_task_click(e):
         """Обработчик кнопки добавления задачи"""
         add_task(task_input.value)
     
+    # Пакетные действия над выбранными задачами
+    selected_text = ft.Text("", size=14)
+    bulk_status = ft.Text("", size=12)
+    bulk_coefficient = ft.Dropdown(
+        label="Приоритет",
+        width=220,
+        options=[ft.dropdown.Option(value, f"{value} - {text}") for value, text in COEFFICIENTS.items()],
+    )
+    
+    def render_selection():
+        selected_text.value = f"Выбрано: {len(selection['ids'])}"
+        update_controls(selected_text, bulk_status)
+    
+    def sync_selection_cards():
+        """Показывает или прячет отметки выбора на уже построенных карточках (одним обновлением)"""
+        shown = []
+        for task_id, card in list(virtual_tasks.cached_items()):
+            card.set_selection(selection["active"], task_id in selection["ids"])
+            if virtual_tasks.is_shown(task_id):
+                shown.append(card)
+        update_controls(*shown)
+    
+    def on_select(task_id, selected):
+        if selected:
+            selection["ids"].add(task_id)
+        else:
+            selection["ids"].discard(task_id)
+        render_selection()
+    
+    def toggle_selection_mode(e):
+        selection["active"] = not selection["active"]
+        selection["ids"].clear()
+        bulk_bar.visible = selection["active"]
+        bulk_status.value = ""
+        sync_selection_cards()
+        render_selection()
+        update_controls(bulk_bar)
+    
+    def select_all_click(e):
+        """Выбирает все задачи списка (с учётом поиска, включая не показанные результаты)"""
+        with search_lock:
+            found = None
+            if search_state["query"] and search_index.ready.is_set():
+                found = search_index.matches(search_state["query"])
+            selection["ids"] = set(tasks.ids() if found is None else found)
+        sync_selection_cards()
+        render_selection()
+    
+    def run_bulk(action, done_text):
+        """Пакетное действие: одна транзакция DataManager — одна запись и одно обновление списка"""
+        if not selection["ids"]:
+            bulk_status.value = "Ничего не выбрано"
+        else:
+            count = action(list(selection["ids"]))
+            # Удалённые задачи выпадают из выбора
+            selection["ids"] = {task_id for task_id in selection["ids"] if tasks.get(task_id) is not None}
+            bulk_status.value = f"{done_text}: {count}"
+        render_selection()
+    
+    def set_bulk_coefficient(e):
+        if bulk_coefficient.value:
+            run_bulk(lambda ids: tasks.set_coefficient_many(ids, bulk_coefficient.value), "Приоритет изменён")
+    
+    bulk_coefficient.on_select = set_bulk_coefficient
+    
+    # Импорт задач из файла: разбор идёт в фоновом потоке, прогресс — по пачкам
+    import_state = {"running": False, "cancel": False}
+    import_progress = ft.ProgressBar(value=0, expand=True)
+    import_status = ft.Text("", size=12)
+    
+    def show_import_progress(fraction, imported):
+        import_progress.value = fraction
+        import_status.value = f"Импортировано: {imported}"
+        update_controls(import_progress, import_status)
+    
+    def run_import(path):
+        from module.importer import import_tasks
+        try:
+            result = import_tasks(data_manager, path, progress=show_import_progress,
+                                  cancel=lambda: import_state["cancel"])
+        except (ValueError, IOError, csv.Error) as error:
+            import_status.value = f"Ошибка импорта: {error}"
+        else:
+            text = f"Импортировано: {result['imported']}"
+            if result["skipped"]:
+                text += f", пропущено: {result['skipped']} ({result['errors'][0]})"
+            if result.get("cancelled"):
+                text += " — импорт прерван"
+            import_status.value = text
+        import_state["running"] = False
+        import_progress.visible = False
+        import_cancel.visible = False
+        update_controls(import_bar)
+    
+    async def import_click(e):
+        if import_state["running"]:
+            return
+        files = await ft.FilePicker().pick_files(
+            dialog_title="Импорт задач",
+            allowed_extensions=["csv", "md", "markdown", "txt", "json"],
+            file_type=ft.FilePickerFileType.CUSTOM,
+        )
+        if not files or not files[0].path:
+            return
+        import_state.update(running=True, cancel=False)
+        import_progress.value = 0
+        import_progress.visible = True
+        import_cancel.visible = True
+        import_status.value = f"Импорт: {files[0].name}"
+        import_bar.visible = True
+        update_controls(import_bar)
+        page.run_thread(run_import, files[0].path)
+    
+    def cancel_import(e):
+        import_state["cancel"] = True
+    
+    import_button = ft.IconButton(
+        icon=ft.Icons.UPLOAD_FILE,
+        tooltip="Импорт задач (CSV, Markdown, JSON)",
+        on_click=import_click
+    )
+    import_cancel = ft.TextButton("Отмена", icon=ft.Icons.CLOSE, on_click=cancel_import)
+    import_bar = ft.Row([import_progress, import_status, import_cancel], spacing=10, visible=False)
+    
+    selection_button = ft.IconButton(
+        icon=ft.Icons.CHECKLIST,
+        tooltip="Выбрать несколько задач",
+        on_click=toggle_selection_mode
+    )
+    
+    bulk_bar = ft.Row([
+        selected_text,
+        ft.TextButton("Все", icon=ft.Icons.SELECT_ALL, on_click=select_all_click),
+        ft.TextButton("Выполнить", icon=ft.Icons.DONE_ALL,
+                      on_click=lambda e: run_bulk(lambda ids: tasks.set_completed_many(ids, True), "Выполнено")),
+        ft.TextButton("Снять отметку", icon=ft.Icons.REMOVE_DONE,
+                      on_click=lambda e: run_bulk(lambda ids: tasks.set_completed_many(ids, False), "Снята отметка")),
+        bulk_coefficient,
+        ft.TextButton("Очистить подзадачи", icon=ft.Icons.CLEANING_SERVICES,
+                      on_click=lambda e: run_bulk(tasks.clear_completed_subtasks, "Удалено подзадач")),
+        ft.TextButton("Удалить", icon=ft.Icons.DELETE_SWEEP,
+                      on_click=lambda e: run_bulk(tasks.delete_many, "Удалено")),
+        bulk_status,
+    ], spacing=5, wrap=True, visible=False)
+    
     # Кнопка добавления задачи
     add_button = ft.ElevatedButton(
         "Добавить",
@@ -168,10 +405,31 @@ def create_todo_list_page(page, data_manager):
         on_click=add_task_click
     )
     
-    # Инициализация списка задач
+    def on_task_events(events):
+        """Применяет события изменения задач к поисковому индексу и карточкам"""
+        changed_ids = None
+        if not any(e.type == DATA_REPLACED for e in events):
+            changed_ids = changed_task_ids([e.change for e in events])
+        # Список и запрос меняются под той же блокировкой, что и в search_tasks
+        with search_lock:
+            if changed_ids is None:
+                page.run_thread(search_index.build, list(data_manager.get_data().get("tasks", [])),
+                                on_search_index_ready)
+            else:
+                for task_id in changed_ids:
+                    search_index.refresh(task_id)
+            # Отменённое удаление возвращает задачи на прежние места
+            before = {e.change["task"]["id"]: e.change["before"]
+                      for e in events if e.type == TASK_ADDED and "before" in e.change}
+            refresh_tasks_list(changed_ids, before)
+    
+    # Инициализация списка задач и подписка на изменения задач
     refresh_tasks_list()
+    page.run_thread(search_index.build, list(data_manager.get_data().get("tasks", [])),
+                    on_search_index_ready)
+    unsubscribe = data_manager.subscribe(on_task_events, *TASK_EVENTS, TASKS_LOADED, DATA_REPLACED)
     
-    return ft.Container(
+    view = ft.Container(
         content=ft.Row([
             # Левый контейнер - ввод и список задач
             ft.Container(
@@ -182,6 +440,16 @@ def create_todo_list_page(page, data_manager):
                         add_button
                     ], spacing=10),
                     
+                    # Поиск, режим выбора и импорт
+                    ft.Row([
+                        ft.Container(content=search_field, expand=True),
+                        selection_button,
+                        import_button
+                    ], spacing=10),
+                    search_info,
+                    bulk_bar,
+                    import_bar,
+                    
                     # Список задач
                     tasks_list
                 ], spacing=15, expand=True),
@@ -195,12 +463,40 @@ def create_todo_list_page(page, data_manager):
         ], spacing=0, expand=True),
         expand=True
     )
+    view.on_dispose = unsubscribe
+    return view
+
 
+def task_signature(task):
+    """Отображаемое состояние задачи — по нему видно, нужно ли обновлять карточку"""
+    return (
+        task.get("title", ""),
+        task.get("completed", False),
+        tuple((st["id"], st.get("title", ""), st.get("completed", False)) for st in task.get("subtasks", []))
+    )
 
-def create_task_card(task, data_manager, refresh_callback, page, show_details_callback):
-    """Создает карточку задачи"""
+
+def create_task_card(task, tasks, page, show_details_callback, selection=None, on_select=None):
+    """Создает карточку задачи.
+    
+    Карточка не перестраивает список сама: изменения приходят через шину событий
+    DataManager, и страница вызывает refresh_card только для затронутых задач.
+    selection — состояние режима выбора страницы ({"active", "ids"}), on_select(task_id, selected).
+    """
     task_id = task["id"]
     
+    # Отметка для пакетных действий (видна только в режиме выбора)
+    select_checkbox = ft.Checkbox(visible=False, tooltip="Выбрать")
+    if on_select is not None:
+        select_checkbox.on_change = lambda e: on_select(task_id, e.control.value)
+    
+    def set_selection(active, selected):
+        select_checkbox.visible = active
+        select_checkbox.value = selected
+    
+    if selection is not None:
+        set_selection(selection["active"], task_id in selection["ids"])
+    
     # Чекбокс выполнения с увеличенным размером и зеленым цветом при True
     completed_checkbox = ft.Checkbox(
         value=task.get("completed", False),
@@ -211,7 +507,7 @@ def create_task_card(task, data_manager, refresh_callback, page, show_details_ca
     
     def on_checkbox_change(e):
         completed_checkbox.fill_color = ft.Colors.GREEN_600 if e.control.value else None
-        toggle_task_completion(task_id, e.control.value, data_manager, refresh_callback, page)
+        tasks.set_completed(task_id, e.control.value)
     
     completed_checkbox.on_change = on_checkbox_change
     
@@ -226,12 +522,7 @@ def create_task_card(task, data_manager, refresh_callback, page, show_details_ca
     # Кнопка удаления задачи
     def delete_task_click(e):
         """Удаляет задачу"""
-        tasks = data_manager.get_data().get("tasks", [])
-        tasks = [t for t in tasks if t["id"] != task_id]
-        data_manager.data["tasks"] = tasks
-        data_manager.save()
-        refresh_callback()
-        page.update()
+        tasks.delete(task_id)
     
     delete_btn = ft.IconButton(
         icon=ft.Icons.DELETE,
@@ -239,50 +530,44 @@ def create_task_card(task, data_manager, refresh_callback, page, show_details_ca
         on_click=delete_task_click
     )
     
-    # Контейнер для подзадач
+    # Контейнер для подзадач и строки подзадач по id
     subtasks_container = ft.Column(spacing=5)
+    subtask_rows = {}
     
     def load_subtasks():
-        """Загружает подзадачи"""
-        subtasks_container.controls.clear()
-        tasks = data_manager.get_data().get("tasks", [])
-        current_task = next((t for t in tasks if t["id"] == task_id), None)
-        if current_task:
-            subtasks = current_task.get("subtasks", [])
+        """Загружает подзадачи: строки переиспользуются, если набор подзадач не изменился"""
+        current_task = tasks.get(task_id)
+        subtasks = current_task.get("subtasks", []) if current_task else []
+        if [st["id"] for st in subtasks] == list(subtask_rows):
             for subtask in subtasks:
-                subtask_row = create_subtask_row(
-                    task_id,
-                    subtask,
-                    data_manager,
-                    load_subtasks,
-                    page
-                )
-                subtasks_container.controls.append(subtask_row)
+                subtask_rows[subtask["id"]].patch_row(subtask)
+            return
+        rows = {}
+        for subtask in subtasks:
+            row = subtask_rows.get(subtask["id"])
+            if row is None:
+                row = create_subtask_row(task_id, subtask, tasks, page)
+            else:
+                row.patch_row(subtask)
+            rows[subtask["id"]] = row
+        subtask_rows.clear()
+        subtask_rows.update(rows)
+        subtasks_container.controls = list(rows.values())
     
     def add_subtask_click(e):
         """Добавляет новую подзадачу"""
-        subtask_id = str(uuid.uuid4())
-        new_subtask = {
-            "id": subtask_id,
-            "title": "",
-            "completed": False
-        }
-        
-        tasks = data_manager.get_data().get("tasks", [])
-        for t in tasks:
-            if t["id"] == task_id:
-                if "subtasks" not in t:
-                    t["subtasks"] = []
-                t["subtasks"].append(new_subtask)
-                break
-        
-        data_manager.data["tasks"] = tasks
-        data_manager.save()
-        load_subtasks()
-        page.update()
+        tasks.add_subtask(task_id)
     
     load_subtasks()
     
+    def refresh_card(current_task):
+        """Переносит изменения задачи в уже построенную карточку"""
+        completed = current_task.get("completed", False)
+        completed_checkbox.value = completed
+        completed_checkbox.fill_color = ft.Colors.GREEN_600 if completed else None
+        title_field.value = current_task.get("title", "")
+        load_subtasks()
+    
     # Кнопка добавления подзадачи
     add_subtask_btn = ft.TextButton(
         "Добавить подзадачу",
@@ -295,11 +580,12 @@ def create_task_card(task, data_manager, refresh_callback, page, show_details_ca
         """Обработчик клика на задачу - показывает детали в правом контейнере"""
         show_details_callback(task_id)
     
-    return ft.Card(
+    card = ft.Card(
         content=ft.Container(
             content=ft.Column([
                 # Заголовок и чекбокс
                 ft.Row([
+                    select_checkbox,
                     completed_checkbox,
                     ft.Container(
                         content=title_field,
@@ -326,51 +612,26 @@ def create_task_card(task, data_manager, refresh_callback, page, show_details_ca
         ),
         margin=ft.Margin(0, 0, 0, 10)
     )
+    card.refresh_card = refresh_card
+    card.set_selection = set_selection
+    return card
 
 
-def create_subtask_row(task_id, subtask, data_manager, refresh_callback, page):
+def create_subtask_row(task_id, subtask, tasks, page):
     """Создает строку подзадачи"""
     subtask_id = subtask["id"]
     
     def toggle_subtask(e):
         """Переключает состояние подзадачи"""
-        tasks = data_manager.get_data().get("tasks", [])
-        for task in tasks:
-            if task["id"] == task_id:
-                for st in task.get("subtasks", []):
-                    if st["id"] == subtask_id:
-                        st["completed"] = e.control.value
-                        break
-                break
-        data_manager.data["tasks"] = tasks
-        data_manager.save()
-        refresh_callback()
-        page.update()
+        tasks.set_subtask_completed(task_id, subtask_id, e.control.value)
     
     def update_subtask_title(e):
         """Обновляет название подзадачи"""
-        tasks = data_manager.get_data().get("tasks", [])
-        for task in tasks:
-            if task["id"] == task_id:
-                for st in task.get("subtasks", []):
-                    if st["id"] == subtask_id:
-                        st["title"] = e.control.value
-                        break
-                break
-        data_manager.data["tasks"] = tasks
-        data_manager.save()
+        tasks.rename_subtask(task_id, subtask_id, e.control.value)
     
     def delete_subtask(e):
         """Удаляет подзадачу"""
-        tasks = data_manager.get_data().get("tasks", [])
-        for task in tasks:
-            if task["id"] == task_id:
-                task["subtasks"] = [st for st in task.get("subtasks", []) if st["id"] != subtask_id]
-                break
-        data_manager.data["tasks"] = tasks
-        data_manager.save()
-        refresh_callback()
-        page.update()
+        tasks.delete_subtask(task_id, subtask_id)
     
     # Чекбокс с увеличенным размером и зеленым цветом при True
     checkbox_value = subtask.get("completed", False)
@@ -387,14 +648,23 @@ def create_subtask_row(task_id, subtask, data_manager, refresh_callback, page):
     
     subtask_checkbox.on_change = on_subtask_checkbox_change
     
-    return ft.Row([
+    title_field = ft.TextField(
+        value=subtask.get("title", ""),
+        hint_text="Название подзадачи",
+        expand=True,
+        on_blur=update_subtask_title
+    )
+    
+    def patch_row(current_subtask):
+        """Переносит изменения подзадачи в строку без её пересоздания"""
+        completed = current_subtask.get("completed", False)
+        subtask_checkbox.value = completed
+        subtask_checkbox.fill_color = ft.Colors.GREEN_600 if completed else None
+        title_field.value = current_subtask.get("title", "")
+    
+    row = ft.Row([
         subtask_checkbox,
-        ft.TextField(
-            value=subtask.get("title", ""),
-            hint_text="Название подзадачи",
-            expand=True,
-            on_blur=update_subtask_title
-        ),
+        title_field,
         ft.IconButton(
             icon=ft.Icons.DELETE,
             icon_size=16,
@@ -402,16 +672,6 @@ def create_subtask_row(task_id, subtask, data_manager, refresh_callback, page):
             on_click=delete_subtask
         )
     ], spacing=5, vertical_alignment=ft.CrossAxisAlignment.CENTER)
+    row.patch_row = patch_row
+    return row
 
-
-def toggle_task_completion(task_id, completed, data_manager, refresh_callback, page):
-    """Переключает состояние выполнения задачи"""
-    tasks = data_manager.get_data().get("tasks", [])
-    for task in tasks:
-        if task["id"] == task_id:
-            task["completed"] = completed
-            break
-    data_manager.data["tasks"] = tasks
-    data_manager.save()
-    refresh_callback()
-    page.update()
@@ -0,0 +1,20 @@
+"""
+Общие помощники для работы с контролами Flet
+"""
+from module.perf import timed
+
+
+@timed("update_controls")
+def update_controls(*controls):
+    """Обновляет только переданные контролы (если они сейчас на странице)"""
+    for control in controls:
+        try:
+            page = control.page
+        except RuntimeError:
+            # Контрол ещё не добавлен на страницу — отрисуется при монтировании
+            continue
+        get_control = getattr(page, "get_control", None)
+        if get_control is not None and get_control(control._i) is not control:
+            # Контрол снят со страницы (скрытая вкладка) — отрисуется при повторном показе
+            continue
+        control.update()
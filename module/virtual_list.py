@@ -0,0 +1,238 @@
+"""
+Виртуализированный список: строит элементы только для видимого окна
+"""
+from collections import OrderedDict
+
+import flet as ft
+
+from module.perf import timed
+from module.ui import update_controls
+
+# После скольких вставок и удалений карта мест пересчитывается заново
+MAX_POSITION_DRIFT = 256
+
+
+class VirtualList:
+    """Список по ключам, в котором построены только элементы около видимой области.
+
+    Элементы вне окна заменены двумя «распорками» оценочной высоты, поэтому полоса
+    прокрутки отражает весь список. Построенные элементы хранятся в ограниченном
+    LRU-кэше и переиспользуются при возврате к ним.
+    """
+
+    def __init__(self, build_item, item_height=120, page_size=30, max_window=150,
+                 cache_size=300, **list_view_kwargs):
+        self.build_item = build_item
+        self.item_height = item_height
+        self.page_size = page_size
+        self.max_window = max_window
+        self.cache_size = max(cache_size, max_window)
+        self.keys = []
+        # Ключ -> место в keys. После вставок и удалений места не пересчитываются сразу:
+        # ключ сдвигается не больше чем на число правок (_drift), начиная с _stale_from
+        self._positions = {}
+        self._stale_from = 0
+        self._drift = 0
+        self.start = 0
+        self.end = 0
+        self.cache = OrderedDict()
+        self.built_count = 0
+        self._shown_keys = set()
+        self._top_spacer = ft.Container(height=0)
+        self._bottom_spacer = ft.Container(height=0)
+        self.control = ft.ListView(
+            controls=[self._top_spacer, self._bottom_spacer],
+            on_scroll=self._on_scroll,
+            scroll_interval=100,
+            **list_view_kwargs
+        )
+
+    # Данные
+
+    def set_keys(self, keys):
+        """Задаёт полный упорядоченный список ключей (переданный список не копируется)"""
+        self.keys = keys if isinstance(keys, list) else list(keys)
+        self._positions = live = {key: index for index, key in enumerate(self.keys)}
+        self._stale_from = len(self.keys)
+        self._drift = 0
+        for key in [k for k in self.cache if k not in live]:
+            del self.cache[key]
+        self.end = min(len(self.keys), max(self.end, self.start + self.page_size))
+        self.start = max(0, min(self.start, self.end))
+        self._render()
+
+    def append(self, key):
+        """Добавляет ключ в конец; окно расширяется, если было у конца списка"""
+        at_end = self.end == len(self.keys)
+        self._positions[key] = len(self.keys)
+        self.keys.append(key)
+        if at_end:
+            self.end += 1
+            if self.end - self.start > self.max_window:
+                self.start = self.end - self.max_window
+            self._render()
+        else:
+            self._update_spacers()
+
+    def extend(self, keys):
+        """Добавляет ключи в конец одним обновлением"""
+        keys = [key for key in keys if key not in self._positions]
+        if not keys:
+            return
+        at_end = self.end == len(self.keys)
+        self._positions.update((key, index) for index, key in enumerate(keys, len(self.keys)))
+        self.keys.extend(keys)
+        if at_end and self.end - self.start < self.page_size:
+            # Окно у конца и ещё не заполнено — дорисовываем до размера страницы
+            self.end = min(len(self.keys), self.start + self.page_size)
+            self._render()
+        else:
+            self._update_spacers()
+            update_controls(self._bottom_spacer)
+
+    def insert(self, key, before):
+        """Вставляет ключ перед ключом before (если его нет — в конец)"""
+        if key in self._positions:
+            return
+        if before not in self._positions:
+            self.append(key)
+            return
+        index = self._index(before)
+        self.keys.insert(index, key)
+        self._positions[key] = index
+        self._moved(index)
+        if index < self.start:
+            self.start += 1
+            self.end += 1
+        elif index < self.end:
+            self.end += 1
+        self._render()
+
+    def remove(self, key):
+        """Удаляет ключ из списка"""
+        if key not in self._positions:
+            return
+        index = self._index(key)
+        del self.keys[index]
+        del self._positions[key]
+        self._moved(index)
+        self.cache.pop(key, None)
+        if index < self.start:
+            self.start -= 1
+            self.end -= 1
+        elif index < self.end:
+            self.end -= 1
+        self._render()
+
+    def _moved(self, index):
+        """Ключи с места index сдвинулись на одну позицию"""
+        self._stale_from = min(self._stale_from, index)
+        self._drift += 1
+        if self._drift > MAX_POSITION_DRIFT:
+            positions = self._positions
+            keys = self.keys
+            for position in range(self._stale_from, len(keys)):
+                positions[keys[position]] = position
+            self._stale_from = len(keys)
+            self._drift = 0
+
+    def _index(self, key):
+        """Место ключа: ищется только в пределах сдвига от записанного места"""
+        keys = self.keys
+        index = self._positions[key]
+        if index < self._stale_from:
+            return index
+        drift = self._drift
+        index = keys.index(key, max(self._stale_from, index - drift), min(len(keys), index + drift + 1))
+        self._positions[key] = index
+        return index
+
+    def __contains__(self, key):
+        return key in self._positions
+
+    def __len__(self):
+        return len(self.keys)
+
+    def cached(self, key):
+        """Построенный элемент для ключа или None"""
+        return self.cache.get(key)
+
+    def cached_items(self):
+        return self.cache.items()
+
+    def is_shown(self, key):
+        return key in self._shown_keys
+
+    # Отрисовка
+
+    def _item(self, key):
+        item = self.cache.get(key)
+        if item is None:
+            item = self.build_item(key)
+            self.built_count += 1
+            self.cache[key] = item
+        else:
+            self.cache.move_to_end(key)
+        return item
+
+    def _evict(self):
+        """Выкидывает давно не показанные элементы сверх размера кэша"""
+        for key in list(self.cache):
+            if len(self.cache) <= self.cache_size:
+                break
+            if key not in self._shown_keys:
+                del self.cache[key]
+
+    def _update_spacers(self):
+        self._top_spacer.height = self.start * self.item_height
+        self._bottom_spacer.height = (len(self.keys) - self.end) * self.item_height
+
+    @timed("virtual_list.render")
+    def _render(self):
+        window_keys = self.keys[self.start:self.end]
+        self._shown_keys = set(window_keys)
+        items = [self._item(key) for key in window_keys]
+        self._evict()
+        self._update_spacers()
+        self.control.controls = [self._top_spacer, *items, self._bottom_spacer]
+        update_controls(self.control)
+
+    def _move_window(self, first_index, viewport_items):
+        """Ставит окно вокруг элемента first_index с запасом в страницу с каждой стороны"""
+        start = max(0, first_index - self.page_size)
+        end = min(len(self.keys), first_index + viewport_items + self.page_size)
+        if end - start > self.max_window:
+            end = start + self.max_window
+        if (start, end) != (self.start, self.end):
+            self.start, self.end = start, end
+            self._render()
+
+    def _on_scroll(self, e):
+        if not self.keys:
+            return
+        viewport = e.viewport_dimension or 0
+        view_top = e.pixels
+        view_bottom = view_top + viewport
+        window_top = self._top_spacer.height or 0
+        window_bottom = e.max_scroll_extent + viewport - (self._bottom_spacer.height or 0)
+        margin = viewport
+        viewport_items = max(1, int(viewport // self.item_height) + 1)
+
+        if view_top >= window_bottom or view_bottom <= window_top:
+            # Прыжок (перетаскивание полосы прокрутки) в область распорки
+            if view_top >= window_bottom:
+                first = self.end + int((view_top - window_bottom) // self.item_height)
+            else:
+                first = max(0, self.start - int((window_top - view_top) // self.item_height) - viewport_items)
+            self._move_window(min(first, len(self.keys) - 1), viewport_items)
+        elif view_bottom > window_bottom - margin and self.end < len(self.keys):
+            # Подходим к нижнему краю окна — достраиваем следующую страницу
+            self.end = min(len(self.keys), self.end + self.page_size)
+            if self.end - self.start > self.max_window:
+                self.start = self.end - self.max_window
+            self._render()
+        elif view_top < window_top + margin and self.start > 0:
+            self.start = max(0, self.start - self.page_size)
+            if self.end - self.start > self.max_window:
+                self.end = self.start + self.max_window
+            self._render()
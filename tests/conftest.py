@@ -0,0 +1,38 @@
+"""
+Общие фикстуры тестов: каждый тест работает в своей временной папке (data/ — относительный путь)
+"""
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from module.data_manager import DataManager, create_storage, decode_snapshot, encode_snapshot  # noqa: E402
+
+STORAGE_MODES = ("json", "journal", "shards", "sqlite")
+
+
+@pytest.fixture(autouse=True)
+def workdir(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+def open_manager(mode):
+    """DataManager над хранилищем mode без фоновой паузы записи"""
+    return DataManager(save_delay=0.01, storage=create_storage(mode))
+
+
+def plain(data):
+    """Данные в виде обычных словарей и списков (как после записи в JSON)"""
+    return decode_snapshot(encode_snapshot(data, "json"))
+
+
+def make_task(task_id, title=None, **fields):
+    task = {
+        "id": task_id, "title": title or f"Задача {task_id}", "description": "",
+        "completed": False, "coefficient": 1, "subtasks": [],
+    }
+    task.update(fields)
+    return task
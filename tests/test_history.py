@@ -0,0 +1,115 @@
+"""
+Отмена и повтор: порядок задач после пакетного удаления, группы и слияние правок
+"""
+import pytest
+
+from conftest import STORAGE_MODES, make_task, open_manager
+
+
+def task_ids(dm):
+    return [task["id"] for task in dm.data["tasks"]]
+
+
+@pytest.fixture
+def dm():
+    manager = open_manager("json")
+    manager.add_tasks([make_task(str(i)) for i in range(10)])
+    manager.history.clear()
+    yield manager
+    manager.close()
+
+
+def test_bulk_delete_undo_redo_order(dm):
+    original = task_ids(dm)
+    dm.delete_tasks(["7", "1", "4", "missing", "8"])
+    assert task_ids(dm) == ["0", "2", "3", "5", "6", "9"]
+    assert len(dm.history.undo_stack) == 1
+
+    dm.history.undo()
+    assert task_ids(dm) == original
+    assert all(dm.get_task(task_id) is not None for task_id in original)
+
+    dm.history.redo()
+    assert task_ids(dm) == ["0", "2", "3", "5", "6", "9"]
+    assert dm.get_task("4") is None
+
+    dm.history.undo()
+    assert task_ids(dm) == original
+    assert not dm.history.can_undo() and dm.history.can_redo()
+
+
+def test_separate_deletes_undo_in_reverse_order(dm):
+    dm.delete_task("3")
+    dm.delete_tasks(["0", "9"])
+    dm.delete_task("5")
+    dm.history.undo()
+    assert task_ids(dm) == ["1", "2", "4", "5", "6", "7", "8"]
+    dm.history.undo()
+    assert task_ids(dm) == ["0", "1", "2", "4", "5", "6", "7", "8", "9"]
+    dm.history.undo()
+    assert task_ids(dm) == [str(i) for i in range(10)]
+    dm.history.redo()
+    dm.history.redo()
+    assert task_ids(dm) == ["1", "2", "4", "5", "6", "7", "8"]
+
+
+@pytest.mark.parametrize("mode", STORAGE_MODES)
+def test_undone_bulk_delete_is_saved_in_place(mode):
+    dm = open_manager(mode)
+    dm.add_tasks([make_task(str(i)) for i in range(10)])
+    dm.delete_tasks(["0", "5", "9"])
+    dm.history.undo()
+    dm.close()
+    dm = open_manager(mode)
+    try:
+        assert task_ids(dm) == [str(i) for i in range(10)]
+    finally:
+        dm.close()
+
+
+def test_transaction_is_one_step(dm):
+    with dm.transaction():
+        dm.update_task("0", title="новое")
+        dm.delete_task("1")
+        dm.add_task(make_task("new"))
+    assert len(dm.history.undo_stack) == 1
+    dm.history.undo()
+    assert task_ids(dm) == [str(i) for i in range(10)]
+    assert dm.get_task("0")["title"] == "Задача 0"
+    dm.history.redo()
+    assert task_ids(dm)[-1] == "new" and "1" not in task_ids(dm)
+    assert dm.get_task("0")["title"] == "новое"
+
+
+def test_group_undo_runs_backwards(dm):
+    # Вторая задача удаляется с того же места, что и первая: вернуть их можно только с конца
+    with dm.transaction():
+        dm.delete_task("3")
+        dm.delete_task("4")
+        dm.delete_tasks(["2", "5"])
+    assert task_ids(dm) == ["0", "1", "6", "7", "8", "9"]
+    dm.history.undo()
+    assert task_ids(dm) == [str(i) for i in range(10)]
+    dm.history.redo()
+    assert task_ids(dm) == ["0", "1", "6", "7", "8", "9"]
+
+
+def test_edits_of_one_field_coalesce(dm):
+    for title in ("а", "аб", "абв"):
+        dm.update_task("2", title=title)
+    dm.update_task("2", description="описание")
+    assert len(dm.history.undo_stack) == 2
+    dm.history.undo()
+    dm.history.undo()
+    assert dm.get_task("2")["title"] == "Задача 2"
+    dm.history.redo()
+    assert dm.get_task("2")["title"] == "абв"
+
+
+def test_new_action_clears_redo(dm):
+    dm.delete_task("0")
+    dm.history.undo()
+    assert dm.history.can_redo()
+    dm.update_task("1", title="другое")
+    assert not dm.history.can_redo()
+    assert dm.history.redo() is None
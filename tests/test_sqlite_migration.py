@@ -0,0 +1,108 @@
+"""
+Перенос данных в SQLite: одна транзакция с отметкой в PRAGMA user_version
+"""
+import sqlite3
+
+import pytest
+
+from conftest import make_task, open_manager
+from module.data_manager import DATA_FILE, save_data
+from module.sqlite_storage import DB_FILE, SCHEMA_VERSION, SqliteStorage
+
+
+def legacy_snapshot(count=50):
+    save_data({
+        "theme": "dark",
+        "habits": [{"id": "h", "name": "Зарядка", "count": 0}],
+        "tasks": [make_task(str(i)) for i in range(count)],
+    }, "json")
+
+
+def user_version():
+    with sqlite3.connect(DB_FILE) as conn:
+        return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def test_interrupted_migration_is_rerun(monkeypatch):
+    legacy_snapshot()
+    inserted = []
+    original = SqliteStorage._insert_task
+
+    def failing_insert(self, task, position):
+        if len(inserted) == 25:
+            raise sqlite3.OperationalError("disk I/O error")
+        inserted.append(task["id"])
+        original(self, task, position)
+
+    monkeypatch.setattr(SqliteStorage, "_insert_task", failing_insert)
+    storage = SqliteStorage()
+    with pytest.raises(sqlite3.OperationalError):
+        storage.load()
+    storage.close()
+    # Транзакция откатилась: ни половины задач, ни отметки о завершении
+    assert user_version() == 0
+    with sqlite3.connect(DB_FILE) as conn:
+        assert conn.execute("SELECT COUNT(*) FROM tasks").fetchone()[0] == 0
+
+    monkeypatch.setattr(SqliteStorage, "_insert_task", original)
+    storage = SqliteStorage()
+    data = storage.load()
+    storage.close()
+    assert [t["id"] for t in data["tasks"]] == [str(i) for i in range(50)]
+    assert data["theme"] == "dark" and data["habits"][0]["name"] == "Зарядка"
+    assert user_version() == SCHEMA_VERSION
+
+
+def test_finished_migration_is_not_repeated():
+    legacy_snapshot(3)
+    dm = open_manager("sqlite")
+    dm.delete_task("0")
+    dm.close()
+    # Снимок остался на диске, но база уже перенесена — правки не затираются
+    assert DATA_FILE.exists()
+    dm = open_manager("sqlite")
+    try:
+        assert [t["id"] for t in dm.data["tasks"]] == ["1", "2"]
+    finally:
+        dm.close()
+
+
+def test_filled_database_without_marker_is_kept():
+    legacy_snapshot(3)
+    dm = open_manager("sqlite")
+    dm.add_task(make_task("new"))
+    dm.close()
+    # База из версии без отметки
+    with sqlite3.connect(DB_FILE) as conn:
+        conn.execute("PRAGMA user_version = 0")
+    storage = SqliteStorage()
+    data = storage.load()
+    storage.close()
+    assert [t["id"] for t in data["tasks"]] == ["0", "1", "2", "new"]
+    assert user_version() == SCHEMA_VERSION
+
+
+def test_null_legacy_values_are_normalized():
+    save_data({"theme": "light", "habits": [{"id": "h", "name": None, "count": None}], "tasks": [
+        {"id": "a", "title": None, "description": None, "completed": None, "coefficient": None,
+         "subtasks": [{"id": "s", "title": None, "completed": None}]},
+    ]}, "json")
+    dm = open_manager("sqlite")
+    task = dm.data["tasks"][0]
+    assert (task["title"], task["description"], task["completed"], task["coefficient"]) == ("", "", False, 1)
+    assert dm.data["habits"][0]["name"] == "" and dm.data["habits"][0]["count"] == 0
+    # Null в последующих правках тоже не нарушает NOT NULL
+    dm.update_task("a", title=None, coefficient=None)
+    dm.close()
+    assert dm.save_queue.stats()["write_errors"] == 0
+
+
+def test_migrates_live_shards_not_stale_snapshot():
+    legacy_snapshot(1)
+    dm = open_manager("shards")
+    dm.add_task(make_task("fresh"))
+    dm.close()
+    storage = SqliteStorage()
+    data = storage.load()
+    storage.close()
+    assert [t["id"] for t in data["tasks"]] == ["0", "fresh"]
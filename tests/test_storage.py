@@ -0,0 +1,82 @@
+"""
+Хранилища: данные переживают перезапуск в каждом режиме, оборванный журнал восстанавливается
+"""
+import pytest
+
+from conftest import STORAGE_MODES, make_task, open_manager, plain
+from module.data_manager import JOURNAL_FILE, JournalStorage
+
+
+def fill(dm):
+    """Набор правок всех видов: задачи, подзадачи, привычки, настройки"""
+    dm.add_task(make_task("a", subtasks=[{"id": "s1", "title": "раз", "completed": False}]))
+    dm.add_task(make_task("b", coefficient=3))
+    dm.add_task(make_task("c"))
+    dm.update_task("a", title="Задача A", completed=True)
+    dm.add_subtask("b", {"id": "s2", "title": "два", "completed": False})
+    dm.update_subtask("b", "s2", completed=True)
+    dm.delete_task("c")
+    dm.add_habit({"id": "h", "name": "Зарядка", "count": 0})
+    dm.check_in_habit("h", 739000)
+    dm.set_value("theme", "dark")
+
+
+@pytest.mark.parametrize("mode", STORAGE_MODES)
+def test_round_trip(mode):
+    dm = open_manager(mode)
+    fill(dm)
+    expected = plain(dm.data)
+    dm.close()
+
+    reopened = open_manager(mode)
+    try:
+        assert plain(reopened.data) == expected
+        assert [t["id"] for t in reopened.data["tasks"]] == ["a", "b"]
+    finally:
+        reopened.close()
+
+
+@pytest.mark.parametrize("mode", STORAGE_MODES)
+def test_round_trip_keeps_restored_position(mode):
+    dm = open_manager(mode)
+    for task_id in "abcd":
+        dm.add_task(make_task(task_id))
+    dm.delete_task("b")
+    dm.history.undo()
+    dm.close()
+
+    reopened = open_manager(mode)
+    try:
+        assert [t["id"] for t in reopened.data["tasks"]] == list("abcd")
+    finally:
+        reopened.close()
+
+
+@pytest.mark.parametrize("tail", [
+    b'0000abcd {"op":"set","key":"theme","val',  # запись оборвана посередине
+    b'deadbeef {"op":"set","key":"theme","value":"light"}\n',  # неверная контрольная сумма
+])
+def test_journal_drops_torn_tail(tail):
+    dm = open_manager("journal")
+    fill(dm)
+    expected = plain(dm.data)
+    dm.close()
+    size = JOURNAL_FILE.stat().st_size
+    with open(JOURNAL_FILE, "ab") as f:
+        f.write(tail)
+
+    storage = JournalStorage()
+    assert plain(storage.load()) == expected
+    assert storage.dropped_records == 1
+    # Обрывок отрезан: новые записи не склеиваются с ним
+    assert JOURNAL_FILE.stat().st_size == size
+
+    dm = open_manager("journal")
+    dm.add_task(make_task("d"))
+    dm.close()
+    reopened = open_manager("journal")
+    try:
+        assert [t["id"] for t in reopened.data["tasks"]] == ["a", "b", "d"]
+        assert reopened.storage.dropped_records == 0
+    finally:
+        reopened.close()